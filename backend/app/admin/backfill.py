@@ -0,0 +1,81 @@
+"""
+Rebuild the donation aggregates from history: the daily rollups
+(``donation_daily_stats``) and the NGO and staff pickup totals
+(``ngo_pickup_stats``, ``staff_pickup_stats``).
+
+The API keeps them up to date as donations are created and closed; run this
+once after applying migrations 007/008, or to repair drift. It empties the
+aggregates, then reads all donations, archived ones included, in chunks
+(ordered by id) and records a
+"created" event for each, plus "completed"/"declined" for closed ones.
+Donations written while it runs may be counted twice, so run it before
+taking traffic or during a quiet period.
+
+Usage (from the backend directory):
+
+    python -m app.admin.backfill
+    python -m app.admin.backfill --chunk-size 500
+"""
+import argparse
+import logging
+import time
+from typing import List, Optional
+
+from app.database import supabase
+
+logger = logging.getLogger("app.admin.backfill")
+
+DONATION_COLUMNS = (
+    "id, status, assigned_ngo_id, completed_by_staff_id, volume_servings, points, "
+    "created_at, completed_at, updated_at"
+)
+
+
+def donation_events(donation: dict) -> List[dict]:
+    """Rollup events a donation has produced so far"""
+    events = [{"event": "created", "donation": donation}]
+    if donation["status"] in ("completed", "declined"):
+        events.append({"event": donation["status"], "donation": donation})
+    return events
+
+
+def backfill_aggregates(chunk_size: int = 1000) -> int:
+    """Rebuild the aggregates; returns the number of donations read"""
+    supabase.table("donation_daily_stats").delete().gte("day", "0001-01-01").execute()
+    supabase.table("ngo_pickup_stats").delete().gte("completed_pickups", 0).execute()
+    supabase.table("staff_pickup_stats").delete().gte("completed_pickups", 0).execute()
+
+    processed = 0
+    last_id = None
+    while True:
+        query = supabase.table("all_donations").select(DONATION_COLUMNS).order("id").limit(chunk_size)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        chunk = query.execute().data
+        if not chunk:
+            break
+
+        supabase.rpc("record_donation_events", {
+            "events": [event for donation in chunk for event in donation_events(donation)]
+        }).execute()
+        processed += len(chunk)
+        last_id = chunk[-1]["id"]
+        logger.info("Backfilled %d donations", processed)
+        if len(chunk) < chunk_size:
+            break
+    return processed
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Donations read per query")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    started = time.perf_counter()
+    processed = backfill_aggregates(args.chunk_size)
+    logger.info("Rebuilt donation aggregates from %d donations in %.1fs", processed, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
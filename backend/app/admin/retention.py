@@ -0,0 +1,163 @@
+"""
+Activity log retention.
+
+``activity_log`` is partitioned by month (migration 011). This job creates
+the partitions for the coming ``activity_log_partitions_ahead`` months and
+drops the partitions older than ``activity_log_retention_months``. Entries
+of months without a partition go to ``activity_log_default`` until the job
+creates one, so inserts keep working if it does not run. With
+``activity_log_export_dir`` set, each partition is first written to
+``activity_log-YYYY-MM.ndjson.gz`` in that directory; a month whose export
+file already exists is not exported again. Exporting and dropping a month
+holds a lock file next to the export, so workers sharing the directory
+handle each month once.
+
+Each API worker runs the job every ``activity_log_retention_interval``
+seconds (started from the app lifespan). When exporting on several hosts,
+set ``ACTIVITY_LOG_RETENTION_ENABLED=false`` and run it from cron on one:
+
+    python -m app.admin.retention
+"""
+import gzip
+import json
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager, suppress
+from datetime import date, datetime, timezone
+from typing import Iterator, Optional
+
+from app.config import get_settings
+from app.database import supabase, supabase_admin
+
+settings = get_settings()
+logger = logging.getLogger("app.retention")
+
+EXPORT_CHUNK_SIZE = 1000
+
+# Export locks older than this are taken to be left by a dead process
+STALE_LOCK_SECONDS = 3600
+
+
+def add_months(month: date, months: int) -> date:
+    """First day of the month ``months`` after ``month``"""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _acquire_lock(path: str) -> bool:
+    for _ in range(2):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) < STALE_LOCK_SECONDS:
+                    return False
+                # Left behind by a process that died mid-export
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            continue
+        with os.fdopen(fd, "w") as lock:
+            lock.write(str(os.getpid()))
+        return True
+    return False
+
+
+@contextmanager
+def month_lock(month: date, directory: str) -> Iterator[bool]:
+    """Lock on exporting and dropping ``month`` across processes; yields whether it was acquired"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"activity_log-{month:%Y-%m}.lock")
+    acquired = _acquire_lock(path)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with suppress(FileNotFoundError):
+                os.remove(path)
+
+
+def export_month(month: date, directory: str) -> Optional[str]:
+    """
+    Write one month of the log to gzipped NDJSON; returns the path, None if
+    already exported. Callers hold ``month_lock`` for the month.
+    """
+    path = os.path.join(directory, f"activity_log-{month:%Y-%m}.ndjson.gz")
+    if os.path.exists(path):
+        return None
+
+    os.makedirs(directory, exist_ok=True)
+    start = datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+    end = datetime.combine(add_months(month, 1), datetime.min.time(), tzinfo=timezone.utc)
+    fd, partial = tempfile.mkstemp(dir=directory, prefix=f"activity_log-{month:%Y-%m}.", suffix=".partial")
+    exported = 0
+    last_id = None
+    try:
+        with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as output:
+            while True:
+                query = supabase.table("activity_log").select("*").gte(
+                    "created_at", start.isoformat()
+                ).lt("created_at", end.isoformat()).order("id").limit(EXPORT_CHUNK_SIZE)
+                if last_id is not None:
+                    query = query.gt("id", last_id)
+                rows = query.execute().data
+                for row in rows:
+                    output.write(json.dumps(row, default=str) + "\n")
+                exported += len(rows)
+                if len(rows) < EXPORT_CHUNK_SIZE:
+                    break
+                last_id = rows[-1]["id"]
+        os.replace(partial, path)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.remove(partial)
+        raise
+    logger.info("Exported %d activity log entries of %s to %s", exported, f"{month:%Y-%m}", path)
+    return path
+
+
+def _drop_partition(partition: dict, month: date) -> bool:
+    dropped = supabase_admin.rpc("drop_activity_log_partition", {"month_param": month.isoformat()}).execute().data
+    if dropped:
+        logger.info("Dropped activity log partition %s", partition["partition_name"])
+    return bool(dropped)
+
+
+def enforce_activity_log_retention() -> int:
+    """Create upcoming partitions and drop expired ones; returns how many were dropped"""
+    # Partition DDL is only granted to the service role
+    supabase_admin.rpc("ensure_activity_log_partitions", {
+        "months_ahead_param": settings.activity_log_partitions_ahead,
+    }).execute()
+    if settings.activity_log_retention_months <= 0:
+        return 0
+
+    this_month = datetime.now(timezone.utc).date().replace(day=1)
+    cutoff = add_months(this_month, -settings.activity_log_retention_months)
+    partitions = supabase.rpc("list_activity_log_partitions", {}).execute().data
+
+    dropped = 0
+    directory = settings.activity_log_export_dir
+    for partition in partitions:
+        month = date.fromisoformat(str(partition["month"]))
+        if month >= cutoff:
+            continue
+        if not directory:
+            dropped += _drop_partition(partition, month)
+            continue
+        # Only one worker exports and drops a month; the partition goes only
+        # once its export file is complete (written now or by an earlier run)
+        with month_lock(month, directory) as locked:
+            if not locked:
+                logger.info("Activity log %s is being exported by another process", f"{month:%Y-%m}")
+                continue
+            export_month(month, directory)
+            dropped += _drop_partition(partition, month)
+    return dropped
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    print(f"Dropped {enforce_activity_log_retention()} activity log partitions")
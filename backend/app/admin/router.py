@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, Query
-from typing import List
+from typing import List, Optional
+from datetime import date, datetime, timedelta
 from app.models. schemas import (
-    PlatformStats, ActivityLogResponse, UserStats, UserRole
+    PlatformStats, ActivityLogResponse, AnalyticsResponse, UserStats, UserRole
 )
-from app.admin.service import get_platform_stats, get_activity_log, get_user_stats
+from app.admin.service import get_platform_stats, get_activity_log, get_analytics, get_user_stats
 from app.auth.dependencies import get_current_active_user, require_role
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
@@ -29,6 +30,24 @@ async def get_activity(
     return {"activities": activities}
 
 
+@router.get("/analytics", response_model=AnalyticsResponse)
+async def get_donation_analytics(
+    start: Optional[date] = Query(None, description="First day (UTC), defaults to 29 days before end"),
+    end: Optional[date] = Query(None, description="Last day (UTC), defaults to today"),
+    ngo_id: Optional[str] = Query(None, description="Only this NGO's donations"),
+    current_user: dict = Depends(require_role([UserRole.admin]))
+):
+    """
+    Get donations created, completed and declined, servings delivered and
+    points awarded per day (Admin only).
+    
+    Served from daily rollups, so any range of up to a year is cheap.
+    """
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=29)
+    return await get_analytics(start, end, ngo_id)
+
+
 # User stats endpoint (for donors to see their own stats)
 @router.get("/users/me/stats", response_model=UserStats, tags=["Users"])
 async def get_my_stats(
@@ -1,34 +1,56 @@
-from typing import List
-from app.database import supabase
+from typing import List, Optional
+from datetime import date, timedelta
+from fastapi import HTTPException, status
+from app.database import supabase_read
+from app.cache import SingleFlightCache
+from app.donations.service import status_counts
+from app.leaderboard.service import get_donor_rank
+from app.config import get_settings
+
+settings = get_settings()
+
+# Longest date range served by the analytics endpoint
+MAX_ANALYTICS_DAYS = 366
+
+ROLLUP_COLUMNS = [
+    "donations_created", "donations_completed", "donations_declined",
+    "servings_delivered", "points_awarded",
+]
+
+# Platform stats scan whole tables; share one computation between dashboards
+platform_stats_cache = SingleFlightCache(
+    "platform_stats", settings.platform_stats_cache_ttl, settings.cache_max_stale
+)
 
 
 async def get_platform_stats() -> dict:
     """Get platform-wide statistics"""
-    # Get donation counts
-    donations = supabase.table("donations").select("status, points").execute()
-    
-    total_donations = len(donations.data)
-    active_donations = len([d for d in donations.data if d["status"] == "active"])
-    completed_donations = len([d for d in donations.data if d["status"] == "completed"])
-    declined_donations = len([d for d in donations.data if d["status"] == "declined"])
+    return await platform_stats_cache.get_or_refresh("platform", _compute_platform_stats)
+
+
+def _compute_platform_stats() -> dict:
+    """Compute platform-wide statistics from the database"""
+    # Get lifetime donation counts (archive included), grouped by status
+    by_status = supabase_read.rpc("donation_status_counts", {"include_archived_param": True}).execute().data
+    counts = status_counts(by_status)
     
     # Calculate total points awarded (from completed donations)
-    points_awarded = sum(d["points"] for d in donations.data if d["status"] == "completed")
+    points_awarded = sum(row["points"] for row in by_status if row["status"] == "completed")
     
     # Get user counts
-    users = supabase.table("users").select("role").execute()
+    users = supabase_read.table("users").select("role").execute()
     total_donors = len([u for u in users.data if u["role"] == "donor"])
     total_staff = len([u for u in users.data if u["role"] == "staff"])
     
     # Get NGO count
-    ngos = supabase.table("ngos").select("id", count="exact").execute()
+    ngos = supabase_read.table("ngos").select("id", count="exact").execute()
     total_ngos = ngos.count if ngos.count else 0
     
     return {
-        "total_donations":  total_donations,
-        "active_donations": active_donations,
-        "completed_donations": completed_donations,
-        "declined_donations": declined_donations,
+        "total_donations":  counts["all"],
+        "active_donations": counts["active"],
+        "completed_donations": counts["completed"],
+        "declined_donations": counts["declined"],
         "total_donors": total_donors,
         "total_ngos": total_ngos,
         "total_staff": total_staff,
@@ -36,13 +58,50 @@ async def get_platform_stats() -> dict:
     }
 
 
+async def get_analytics(start: date, end: date, ngo_id: Optional[str] = None) -> dict:
+    """
+    Daily donation activity between ``start`` and ``end`` (inclusive, UTC days),
+    read from the ``donation_daily_stats`` rollups. Days without activity are
+    included with zero counts.
+    """
+    if end < start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end must not be before start"
+        )
+    if (end - start).days >= MAX_ANALYTICS_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Date range is limited to {MAX_ANALYTICS_DAYS} days"
+        )
+    
+    rows = (await supabase_read.rpc("donation_stats_by_day", {
+        "start_day_param": start.isoformat(),
+        "end_day_param": end.isoformat(),
+        "ngo_id_param": ngo_id,
+    }).execute_async()).data
+    by_day = {str(row["day"]): row for row in rows}
+    
+    days = []
+    totals = dict.fromkeys(ROLLUP_COLUMNS, 0)
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        row = by_day.get(day.isoformat(), {})
+        counts = {column: int(row.get(column) or 0) for column in ROLLUP_COLUMNS}
+        for column, value in counts.items():
+            totals[column] += value
+        days.append({"day": day, **counts})
+    
+    return {"start": start, "end": end, "ngo_id": ngo_id, "days": days, "totals": totals}
+
+
 async def get_activity_log(limit: int = 10, page: int = 1) -> List[dict]:
     """Get recent platform activity"""
     offset = (page - 1) * limit
     
-    response = supabase.table("activity_log").select("*").order(
+    response = await supabase_read.table("activity_log").select("*").order(
         "created_at", desc=True
-    ).range(offset, offset + limit - 1).execute()
+    ).range(offset, offset + limit - 1).execute_async()
     
     return response.data
 
@@ -50,9 +109,9 @@ async def get_activity_log(limit: int = 10, page: int = 1) -> List[dict]:
 async def get_user_stats(user_id: str) -> dict:
     """Get statistics for a specific user (donor)"""
     # Get user data
-    user_response = supabase.table("users").select(
+    user_response = await supabase_read.table("users").select(
         "points, total_donations, active_donations, created_at"
-    ).eq("id", user_id).execute()
+    ).eq("id", user_id).execute_async()
     
     if not user_response.data:
         return None
@@ -60,19 +119,13 @@ async def get_user_stats(user_id: str) -> dict:
     user = user_response.data[0]
     
     # Get completed donations count
-    donations = supabase.table("donations").select("status").eq("donor_id", user_id).execute()
-    completed_donations = len([d for d in donations.data if d["status"] == "completed"])
-    
-    # Calculate rank
-    all_donors = supabase.table("users").select("id, points").eq(
-        "role", "donor"
-    ).order("points", desc=True).execute()
+    by_status = (await supabase_read.rpc("donation_status_counts", {
+        "donor_id_param": user_id,
+        "include_archived_param": True,
+    }).execute_async()).data
+    completed_donations = status_counts(by_status)["completed"]
     
-    rank = 1
-    for idx, donor in enumerate(all_donors.data):
-        if donor["id"] == user_id: 
-            rank = idx + 1
-            break
+    rank = await get_donor_rank(user["points"])
     
     return {
         "total_donations": user["total_donations"],
@@ -0,0 +1,273 @@
+"""
+Admission control and load shedding.
+
+Requests are sorted into route classes, each with its own concurrency limit
+and bounded wait queue, under a worker-wide concurrency cap. When a slot
+frees up, waiting requests are admitted in priority order (donation writes,
+then reads, then admin analytics, then auth), so a spike of bcrypt logins or
+full-scan analytics cannot starve donation creation. Requests that find
+their class queue full, or wait longer than ``admission_max_wait``, are
+rejected at once with 503 and ``Retry-After``.
+
+``POST /api/auth/login`` is additionally rate limited per client with a
+token bucket (429 with ``Retry-After``). Behind a load balancer, list it in
+``trusted_proxies`` so clients are told apart by ``X-Forwarded-For``.
+"""
+import asyncio
+import heapq
+import ipaddress
+import itertools
+import json
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Union
+
+from app.config import get_settings
+from app.metrics import REGISTRY
+
+settings = get_settings()
+
+admission_in_flight = REGISTRY.gauge(
+    "app_admission_in_flight", "Requests admitted and being served per route class", ("route_class",)
+)
+admission_queue_depth = REGISTRY.gauge(
+    "app_admission_queue_depth", "Requests waiting for admission per route class", ("route_class",)
+)
+admission_rejections = REGISTRY.counter(
+    "app_admission_rejections_total", "Requests shed by admission control",
+    ("route_class", "reason"),
+)
+
+
+@dataclass(frozen=True)
+class RouteClass:
+    """Admission settings shared by a group of routes"""
+    name: str
+    # Lower is admitted first
+    priority: int
+    limit: int
+    queue_size: int
+
+
+ROUTE_CLASSES = {
+    "write": RouteClass("write", 0, settings.admission_write_limit, settings.admission_queue_size),
+    "read": RouteClass("read", 1, settings.admission_read_limit, settings.admission_queue_size),
+    "analytics": RouteClass("analytics", 2, settings.admission_analytics_limit, settings.admission_queue_size),
+    "auth": RouteClass("auth", 3, settings.admission_auth_limit, settings.admission_queue_size),
+}
+
+
+def classify(method: str, path: str) -> Optional[RouteClass]:
+    """Route class of a request, or None for routes never shed (health, metrics, docs, preflights)"""
+    if not path.startswith("/api/") or method == "OPTIONS":
+        return None
+    if path in ("/api/auth/login", "/api/auth/register"):
+        return ROUTE_CLASSES["auth"]
+    if path.startswith("/api/admin/"):
+        return ROUTE_CLASSES["analytics"]
+    if method in ("GET", "HEAD"):
+        return ROUTE_CLASSES["read"]
+    return ROUTE_CLASSES["write"]
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class AdmissionController:
+    """
+    Priority-ordered concurrency limiter for one worker's event loop.
+
+    Not thread-safe: acquire/release must be called from the event loop.
+    """
+
+    def __init__(self, max_concurrency: int, max_wait: float):
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self.active = 0
+        self.active_by_class: Dict[str, int] = {name: 0 for name in ROUTE_CLASSES}
+        self.waiting_by_class: Dict[str, int] = {name: 0 for name in ROUTE_CLASSES}
+        self._queue: List[Tuple[int, int, asyncio.Future, RouteClass]] = []
+        self._sequence = itertools.count()
+
+    def _has_capacity(self, route_class: RouteClass) -> bool:
+        return (self.active < self.max_concurrency
+                and self.active_by_class[route_class.name] < route_class.limit)
+
+    def _admit(self, route_class: RouteClass):
+        self.active += 1
+        self.active_by_class[route_class.name] += 1
+        admission_in_flight.labels(route_class.name).inc()
+
+    def _set_waiting(self, route_class: RouteClass, delta: int):
+        self.waiting_by_class[route_class.name] += delta
+        admission_queue_depth.labels(route_class.name).set(self.waiting_by_class[route_class.name])
+
+    async def acquire(self, route_class: RouteClass):
+        """Wait for a slot; raises AdmissionRejected when shed"""
+        if not self._queue and self._has_capacity(route_class):
+            self._admit(route_class)
+            return
+        if self.waiting_by_class[route_class.name] >= route_class.queue_size:
+            raise AdmissionRejected("queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (route_class.priority, next(self._sequence), future, route_class))
+        self._set_waiting(route_class, 1)
+        # Admits this request right away if nothing ahead of it can run
+        self._dispatch()
+        try:
+            await asyncio.wait_for(future, self.max_wait)
+        except asyncio.TimeoutError:
+            raise AdmissionRejected("timeout")
+        except asyncio.CancelledError:
+            # Client went away; hand back a slot granted in the meantime
+            if future.done() and not future.cancelled():
+                self.release(route_class)
+            raise
+        finally:
+            self._set_waiting(route_class, -1)
+
+    def release(self, route_class: RouteClass):
+        self.active -= 1
+        self.active_by_class[route_class.name] -= 1
+        admission_in_flight.labels(route_class.name).dec()
+        self._dispatch()
+
+    def _dispatch(self):
+        """Admit waiting requests in priority order while capacity remains"""
+        blocked = []
+        while self._queue and self.active < self.max_concurrency:
+            entry = heapq.heappop(self._queue)
+            _, _, future, route_class = entry
+            if future.done():
+                continue
+            if self.active_by_class[route_class.name] >= route_class.limit:
+                blocked.append(entry)
+                continue
+            self._admit(route_class)
+            future.set_result(None)
+        for entry in blocked:
+            heapq.heappush(self._queue, entry)
+
+
+class TokenBucketLimiter:
+    """Per-client token buckets: ``burst`` requests at once, refilled at ``rate`` per second"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        # client -> (tokens, last update)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._next_purge = 0.0
+
+    def acquire(self, client: str) -> float:
+        """Take a token; returns 0 on success, else seconds until one is available"""
+        now = time.monotonic()
+        self._purge(now)
+        tokens, updated = self._buckets.get(client, (float(self.burst), now))
+        tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            self._buckets[client] = (tokens - 1, now)
+            return 0.0
+        self._buckets[client] = (tokens, now)
+        return (1 - tokens) / self.rate
+
+    def _purge(self, now: float):
+        # Buckets that have refilled completely carry no state worth keeping
+        if now < self._next_purge:
+            return
+        full_after = self.burst / self.rate
+        self._buckets = {
+            client: bucket for client, bucket in self._buckets.items()
+            if now - bucket[1] < full_after
+        }
+        self._next_purge = now + 60.0
+
+
+def _parse_networks(value: str) -> List[Union[ipaddress.IPv4Network, ipaddress.IPv6Network]]:
+    return [ipaddress.ip_network(entry.strip(), strict=False) for entry in value.split(",") if entry.strip()]
+
+
+TRUSTED_PROXIES = _parse_networks(settings.trusted_proxies)
+
+
+def _is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+
+def _client_key(scope) -> str:
+    """
+    Address of the client: the peer, or, when the peer is a trusted proxy,
+    the last X-Forwarded-For hop not added by a trusted proxy (earlier hops
+    can be forged by the client)
+    """
+    client = scope.get("client")
+    address = client[0] if client else "unknown"
+    if not _is_trusted_proxy(address):
+        return address
+    forwarded = [
+        value.decode("latin-1") for name, value in scope.get("headers", []) if name == b"x-forwarded-for"
+    ]
+    hops = [hop.strip() for header in forwarded for hop in header.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else address
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying admission control and the login rate limit"""
+
+    def __init__(self, app):
+        self.app = app
+        self.controller = AdmissionController(settings.admission_max_concurrency, settings.admission_max_wait)
+        self.login_limiter = TokenBucketLimiter(settings.login_rate_per_minute / 60.0, settings.login_rate_burst)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route_class = classify(scope["method"], scope["path"])
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] == "POST" and scope["path"] == "/api/auth/login":
+            wait = self.login_limiter.acquire(_client_key(scope))
+            if wait:
+                admission_rejections.labels(route_class.name, "rate_limited").inc()
+                await self._reject(send, 429, "Too many login attempts, try again later", wait)
+                return
+
+        try:
+            await self.controller.acquire(route_class)
+        except AdmissionRejected as rejected:
+            admission_rejections.labels(route_class.name, rejected.reason).inc()
+            await self._reject(send, 503, "Server is busy, try again later", settings.admission_retry_after)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(route_class)
+
+    @staticmethod
+    async def _reject(send, status_code: int, detail: str, retry_after: float):
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
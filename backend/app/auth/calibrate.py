@@ -0,0 +1,85 @@
+"""
+Password hashing cost calibration.
+
+Times password verification on this machine for increasing costs of a
+scheme and prints the ``PASSWORD_<SCHEME>_ROUNDS`` setting whose verify
+time is closest to the target. Run it on the production hardware:
+
+    python -m app.auth.calibrate --target-ms 250
+    python -m app.auth.calibrate --scheme argon2 --target-ms 100
+
+Users' existing hashes move to the new cost as they log in.
+"""
+import argparse
+import statistics
+import time
+from typing import Iterator, List, Optional, Tuple
+
+from app.auth.service import SCHEME_ROUNDS, build_password_context, password_schemes
+
+SAMPLE_PASSWORD = "Calibration-Passw0rd"
+
+# Lowest cost tried per scheme; bcrypt rounds grow by one (twice the work),
+# the others double
+MINIMUM_ROUNDS = {"bcrypt": 4, "pbkdf2_sha256": 1000, "argon2": 1}
+
+
+def verify_seconds(scheme: str, rounds: int, samples: int = 3) -> float:
+    """Median time to verify a password hashed with ``scheme`` at ``rounds``"""
+    context = build_password_context([scheme], {scheme: rounds})
+    hashed = context.hash(SAMPLE_PASSWORD)
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        context.verify(SAMPLE_PASSWORD, hashed)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def _candidate_rounds(scheme: str) -> Iterator[int]:
+    rounds = MINIMUM_ROUNDS[scheme]
+    while True:
+        yield rounds
+        rounds = rounds + 1 if scheme == "bcrypt" else rounds * 2
+
+
+def calibrate(scheme: str, target: float, samples: int = 3) -> Tuple[int, float, List[Tuple[int, float]]]:
+    """
+    Rounds whose verify time is closest to ``target`` seconds, that time,
+    and every (rounds, seconds) measured.
+    """
+    measured = []
+    for rounds in _candidate_rounds(scheme):
+        seconds = verify_seconds(scheme, rounds, samples)
+        measured.append((rounds, seconds))
+        if seconds >= target or (scheme == "bcrypt" and rounds == 31):
+            break
+
+    if scheme != "bcrypt" and len(measured) > 1:
+        # Work grows linearly with rounds: interpolate between the last two
+        (low, low_seconds), (high, high_seconds) = measured[-2], measured[-1]
+        estimate = round(low + (high - low) * (target - low_seconds) / max(high_seconds - low_seconds, 1e-9))
+        if low < estimate < high:
+            measured.append((estimate, verify_seconds(scheme, estimate, samples)))
+
+    rounds, seconds = min(measured, key=lambda entry: abs(entry[1] - target))
+    return rounds, seconds, measured
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scheme", choices=list(SCHEME_ROUNDS), default=None,
+                        help="Scheme to calibrate (default: first of PASSWORD_SCHEMES)")
+    parser.add_argument("--target-ms", type=float, default=250.0, help="Desired verify time in milliseconds")
+    parser.add_argument("--samples", type=int, default=3, help="Verifications timed per cost")
+    args = parser.parse_args(argv)
+
+    scheme = args.scheme or password_schemes()[0]
+    rounds, seconds, measured = calibrate(scheme, args.target_ms / 1000, args.samples)
+    for tried, tried_seconds in sorted(measured):
+        print(f"{scheme} rounds={tried:<8} verify {tried_seconds * 1000:8.1f} ms")
+    print(f"\n{SCHEME_ROUNDS[scheme].upper()}={rounds}  # {seconds * 1000:.1f} ms per verify")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from app.config import get_settings
-from app. database import supabase
+from app. database import supabase, set_request_user
 from app. models.schemas import UserRole, TokenData, UserResponse
 from typing import List
 
@@ -37,12 +37,14 @@ async def get_current_user(
         raise credentials_exception
     
     # Fetch user from database
-    response = supabase.table("users").select("*").eq("id", user_id).execute()
+    response = await supabase.table("users").select("*").eq("id", user_id).execute_async()
     
     if not response.data:
         raise credentials_exception
     
     user = response.data[0]
+    # Lets reads after this user's own writes be routed to the primary
+    set_request_user(user["id"])
     return user
 
 
@@ -65,7 +65,7 @@ async def update_current_user_profile(
     
     if update_data: 
         update_data["updated_at"] = "now()"
-        supabase.table("users").update(update_data).eq("id", current_user["id"]).execute()
+        await supabase.table("users").update(update_data).eq("id", current_user["id"]).execute_async()
     
     user = await get_user_by_id(current_user["id"])
     return user
\ No newline at end of file
@@ -1,14 +1,56 @@
+import asyncio
+import logging
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import List, Optional
 from jose import jwt
 from passlib.context import CryptContext
+from postgrest import APIError
+from fastapi.concurrency import run_in_threadpool
 from app.config import get_settings
 from app.database import supabase, supabase_admin
+from app.instrumentation import detach_from_request
+from app.leaderboard.service import leaderboard_cache
 from app.models.schemas import UserCreate, UserLogin, UserRole
 from fastapi import HTTPException, status
 
 settings = get_settings()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger("app.auth")
+
+# Cost setting of each supported scheme (passlib "rounds": log2 of the
+# iterations for bcrypt, iterations for pbkdf2_sha256, time cost for argon2)
+SCHEME_ROUNDS = {
+    "bcrypt": "password_bcrypt_rounds",
+    "pbkdf2_sha256": "password_pbkdf2_sha256_rounds",
+    "argon2": "password_argon2_rounds",
+}
+
+
+def password_schemes() -> List[str]:
+    schemes = [scheme.strip() for scheme in settings.password_schemes.split(",") if scheme.strip()]
+    unknown = [scheme for scheme in schemes if scheme not in SCHEME_ROUNDS]
+    if not schemes or unknown:
+        raise ValueError(f"PASSWORD_SCHEMES must list schemes among: {', '.join(SCHEME_ROUNDS)}")
+    return schemes
+
+
+def build_password_context(schemes: List[str], rounds: Optional[dict] = None) -> CryptContext:
+    """
+    Context hashing with ``schemes[0]`` and verifying all of ``schemes``.
+    
+    Each scheme's rounds are pinned (default, minimum and maximum alike), so
+    ``needs_update`` is true for a hash of another scheme or another cost.
+    """
+    rounds = rounds or {scheme: getattr(settings, SCHEME_ROUNDS[scheme]) for scheme in schemes}
+    options = {}
+    for scheme in schemes:
+        for option in ("default_rounds", "min_rounds", "max_rounds"):
+            options[f"{scheme}__{option}"] = rounds[scheme]
+    return CryptContext(schemes=schemes, deprecated="auto", **options)
+
+
+pwd_context = build_password_context(password_schemes())
+# Rehashes started by logins, kept referenced until they finish
+_rehash_tasks = set()
 
 
 def verify_password(plain_password:  str, hashed_password: str) -> bool:
@@ -19,6 +61,39 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def _rehash_password(user_id: str, old_hash: str, password: str):
+    new_hash = get_password_hash(password)
+    # Only replaces the hash that was verified, not a password changed meanwhile
+    supabase.table("users").update({"password_hash": new_hash}).eq("id", user_id).eq(
+        "password_hash", old_hash
+    ).execute()
+
+
+async def _rehash_in_background(user_id: str, old_hash: str, password: str):
+    # Not part of the login request's database calls or latency
+    detach_from_request()
+    try:
+        await run_in_threadpool(_rehash_password, user_id, old_hash, password)
+    except Exception:
+        logger.exception("Rehashing the password of user %s failed", user_id)
+
+
+def schedule_rehash(user: dict, password: str):
+    """Upgrade an outdated password hash after the login has been answered"""
+    if not pwd_context.needs_update(user["password_hash"]):
+        return
+    task = asyncio.ensure_future(_rehash_in_background(user["id"], user["password_hash"], password))
+    _rehash_tasks.add(task)
+    task.add_done_callback(_rehash_tasks.discard)
+
+
+def _with_ngo_name(user: dict) -> dict:
+    """Replace the embedded ``ngos`` row of a user with ``ngo_name`` (staff only)"""
+    ngo = user.pop("ngos", None)
+    user["ngo_name"] = ngo["name"] if ngo and user["role"] == "staff" else None
+    return user
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -54,45 +129,37 @@ async def register_user(user_data: UserCreate) -> dict:
             detail="Password must be at least 8 characters with uppercase, lowercase, and numbers"
         )
     
-    # Check if email already exists
-    existing = supabase.table("users").select("id").eq("email", user_data.email).execute()
-    if existing.data:
+    if user_data.role == UserRole.staff and not user_data.ngo_id:
         raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="Email already registered"
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Staff registration requires an NGO ID"
         )
     
-    # If staff, verify NGO exists
-    ngo_name = None
-    if user_data.role == UserRole.staff:
-        if not user_data.ngo_id:
+    # bcrypt is CPU-bound; keep it off the event loop
+    hashed_password = await run_in_threadpool(get_password_hash, user_data.password)
+    
+    # Insert, NGO staff count and activity entry in one transaction; the
+    # unique email and the NGO foreign key are checked by the database
+    try:
+        response = await supabase.rpc("register_user_tx", {
+            "email_param": user_data.email,
+            "full_name_param": user_data.full_name,
+            "password_hash_param": hashed_password,
+            "role_param": user_data.role.value,
+            "ngo_id_param": user_data.ngo_id if user_data.role == UserRole.staff else None,
+        }).execute_async()
+    except APIError as exc:
+        if exc.code == "23505":
             raise HTTPException(
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail="Staff registration requires an NGO ID"
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Email already registered"
             )
-        ngo_response = supabase.table("ngos").select("id, name").eq("id", user_data.ngo_id).execute()
-        if not ngo_response.data:
+        if exc.code == "23503":
             raise HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
                 detail="Invalid NGO ID"
             )
-        ngo_name = ngo_response.data[0]["name"]
-    
-    # Create user
-    hashed_password = get_password_hash(user_data.password)
-    
-    user_dict = {
-        "email": user_data.email,
-        "full_name": user_data. full_name,
-        "password_hash": hashed_password,
-        "role": user_data. role.value,
-        "ngo_id": user_data. ngo_id if user_data.role == UserRole.staff else None,
-        "points": 0,
-        "total_donations": 0,
-        "active_donations": 0,
-    }
-    
-    response = supabase.table("users").insert(user_dict).execute()
+        raise
     
     if not response.data:
         raise HTTPException(
@@ -100,34 +167,23 @@ async def register_user(user_data: UserCreate) -> dict:
             detail="Failed to create user"
         )
     
-    user = response.data[0]
-    
-    # Update NGO staff count if staff
-    if user_data.role == UserRole.staff:
-        supabase.rpc("increment_ngo_staff_count", {"ngo_id_param": user_data.ngo_id}).execute()
-    
-    # Log activity
-    supabase.table("activity_log").insert({
-        "action": "user_registered",
-        "description": f"New {user_data.role.value} signup",
-        "user_id":  user["id"],
-        "user_name": user["full_name"]
-    }).execute()
+    user = response.data
+    if user["role"] == UserRole.donor.value:
+        # New donors are ranked from their first dashboard load
+        leaderboard_cache.invalidate()
     
     # Create token
     token = create_access_token(
         data={"sub": user["id"], "role": user["role"]}
     )
     
-    user["ngo_name"] = ngo_name
-    
     return {"user": user, "token": token}
 
 
 async def login_user(login_data: UserLogin) -> dict:
     """Authenticate user and return token"""
-    # Find user by email
-    response = supabase.table("users").select("*").eq("email", login_data.email).execute()
+    # Find user by email, with the NGO name embedded through users.ngo_id
+    response = await supabase.table("users").select("*, ngos(name)").eq("email", login_data.email).execute_async()
     
     if not response.data:
         raise HTTPException(
@@ -138,18 +194,13 @@ async def login_user(login_data: UserLogin) -> dict:
     user = response.data[0]
     
     # Verify password
-    if not verify_password(login_data.password, user["password_hash"]):
+    if not await run_in_threadpool(verify_password, login_data.password, user["password_hash"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
         )
     
-    # Get NGO name if staff
-    ngo_name = None
-    if user["role"] == "staff" and user["ngo_id"]:
-        ngo_response = supabase.table("ngos").select("name").eq("id", user["ngo_id"]).execute()
-        if ngo_response.data:
-            ngo_name = ngo_response.data[0]["name"]
+    schedule_rehash(user, login_data.password)
     
     # Create token with extended expiry if remember_me
     expires_delta = timedelta(days=7) if login_data.remember_me else None
@@ -160,14 +211,13 @@ async def login_user(login_data: UserLogin) -> dict:
     
     # Remove password hash from response
     user.pop("password_hash", None)
-    user["ngo_name"] = ngo_name
     
-    return {"user": user, "token": token}
+    return {"user": _with_ngo_name(user), "token": token}
 
 
 async def get_user_by_id(user_id: str) -> dict:
     """Get user by ID"""
-    response = supabase.table("users").select("*").eq("id", user_id).execute()
+    response = await supabase.table("users").select("*, ngos(name)").eq("id", user_id).execute_async()
     
     if not response.data:
         raise HTTPException(
@@ -178,10 +228,4 @@ async def get_user_by_id(user_id: str) -> dict:
     user = response.data[0]
     user. pop("password_hash", None)
     
-    # Get NGO name if staff
-    if user["role"] == "staff" and user["ngo_id"]:
-        ngo_response = supabase.table("ngos").select("name").eq("id", user["ngo_id"]).execute()
-        if ngo_response.data:
-            user["ngo_name"] = ngo_response.data[0]["name"]
-    
-    return user
\ No newline at end of file
+    return _with_ngo_name(user)
\ No newline at end of file
@@ -0,0 +1,120 @@
+"""
+Per-process TTL caches for hot read paths.
+
+Lookups are counted in the ``app_cache_requests_total`` metric so hit ratios
+can be monitored per cache.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.instrumentation import detach_from_request
+from app.metrics import record_cache
+
+logger = logging.getLogger("app.cache")
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Small dict-backed cache whose entries expire after ``ttl`` seconds"""
+
+    def __init__(self, name: str, ttl: float):
+        self.name = name
+        self.ttl = ttl
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            record_cache(self.name, False)
+            return default
+        record_cache(self.name, True)
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop one entry, or every entry when no key is given"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+
+class SingleFlightCache(TTLCache):
+    """
+    TTL cache for expensive computations shared by concurrent requests.
+    
+    Concurrent misses for a key await one in-flight load instead of each
+    running the computation. Once an entry expires it is still served for up
+    to ``max_stale`` seconds while a single background refresh runs
+    (stale-while-revalidate), so the database sees at most one computation per
+    key per ``ttl`` regardless of the number of clients.
+    """
+
+    def __init__(self, name: str, ttl: float, max_stale: float):
+        super().__init__(name, ttl)
+        self.max_stale = max_stale
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        # Bumped on invalidation so loads started earlier are not stored
+        self._generation = 0
+
+    async def get_or_refresh(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Cached value for ``key``, computing it with the sync ``loader`` when needed"""
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None and entry[0] >= now:
+            record_cache(self.name, True)
+            return entry[1]
+        if entry is not None and now - entry[0] < self.max_stale:
+            record_cache(self.name, True)
+            self._refresh(key, loader)
+            return entry[1]
+        record_cache(self.name, False)
+        return await asyncio.shield(self._refresh(key, loader))
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        self._generation += 1
+        super().invalidate(key)
+        # Loads already running may have read old data; let new callers start fresh ones
+        if key is None:
+            self._inflight.clear()
+        else:
+            self._inflight.pop(key, None)
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any]) -> asyncio.Future:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader))
+            task.add_done_callback(self._log_failure)
+            self._inflight[key] = task
+        return task
+
+    async def _load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        # The load serves many requests, don't bill it to the one that started it
+        detach_from_request()
+        generation = self._generation
+        try:
+            value = await run_in_threadpool(loader)
+            if generation == self._generation:
+                self.set(key, value)
+            return value
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+
+    def _log_failure(self, task: asyncio.Future):
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Refreshing %s cache failed: %r", self.name, task.exception())
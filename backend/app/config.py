@@ -25,20 +25,139 @@ def _find_env_file() -> str:
 class Settings(BaseSettings):
     """Application settings loaded from environment variables"""
     
-    # Supabase Configuration
-    supabase_url:  str
-    supabase_key: str
-    supabase_service_key: str
+    # Supabase Configuration (required unless database_backend is "memory")
+    supabase_url:  str = ""
+    supabase_key: str = ""
+    supabase_service_key: str = ""
+    
+    # Optional read replica (PostgREST endpoint) for read-only queries;
+    # a user's reads stay on the primary for read_your_writes_window
+    # seconds after their own writes
+    supabase_read_url: str = ""
+    supabase_read_key: str = ""
+    read_your_writes_window: float = 5.0
+    
+    # Database backend: "supabase" or "memory" (offline, for tests/benchmarks)
+    database_backend: str = "supabase"
+    memory_seed_data: bool = True
+    # Fault injection for the memory backend: added latency per call
+    # (seconds) and share of calls failing with a connection error
+    memory_latency: float = 0.0
+    memory_failure_rate: float = 0.0
+    
+    # Database call resilience: timeout per call, total time for database
+    # calls per request (0 disables), retries of failed reads with jittered
+    # backoff, and a circuit breaker opening after consecutive failures
+    db_call_timeout: float = 5.0
+    db_request_deadline: float = 10.0
+    db_read_retries: int = 2
+    db_retry_backoff: float = 0.05
+    db_breaker_failure_threshold: int = 5
+    db_breaker_reset_timeout: float = 10.0
     
     # JWT Configuration
     jwt_secret_key: str
     jwt_algorithm: str = "HS256"
     access_token_expire_minutes: int = 1440  # 24 hours default
     
+    # Password hashing: new hashes use the first of password_schemes (comma
+    # separated passlib schemes, e.g. "argon2,bcrypt"; argon2 needs
+    # argon2-cffi) at that scheme's cost below. Hashes of the other schemes,
+    # or at another cost, still verify and are rehashed on the next login.
+    # `python -m app.auth.calibrate` suggests a cost for this machine.
+    password_schemes: str = "bcrypt"
+    password_bcrypt_rounds: int = 12
+    password_pbkdf2_sha256_rounds: int = 29000
+    password_argon2_rounds: int = 2
+    
     # Application Settings
     app_name: str = "Food Donation API"
     debug: bool = False
     
+    # Database call instrumentation: requests issuing more than
+    # db_query_budget calls are flagged (0 disables); strict mode refuses
+    # the call that would exceed it
+    db_query_budget: int = 10
+    db_query_budget_strict: bool = False
+    
+    # Metrics: set metrics_dir to a directory shared by all workers to
+    # aggregate their metrics at /metrics
+    metrics_enabled: bool = True
+    metrics_dir: Optional[str] = None
+    metrics_flush_interval: float = 5.0
+    
+    # Cache lifetimes (seconds) for hot read paths
+    ngo_cache_ttl: float = 60.0
+    leaderboard_cache_ttl: float = 30.0
+    platform_stats_cache_ttl: float = 30.0
+    # Expired leaderboard/stats entries are still served this long while
+    # a single background refresh runs
+    cache_max_stale: float = 300.0
+    
+    # Map clustering: zoom levels up to map_cluster_max_zoom are served as
+    # grid clusters, map_cluster_cells_per_tile cells per tile side,
+    # cached per tile for map_cluster_cache_ttl seconds
+    map_cluster_max_zoom: int = 13
+    map_cluster_cells_per_tile: int = 8
+    map_cluster_max_tiles: int = 64
+    map_cluster_cache_ttl: float = 30.0
+    
+    # Pending donation expiry: every donation_expiry_interval seconds,
+    # pending donations older than their priority's age (hours, 0 keeps
+    # them) are declined, donation_expiry_batch_size per database call
+    donation_expiry_enabled: bool = True
+    donation_expiry_interval: float = 300.0
+    donation_expiry_batch_size: int = 500
+    donation_expiry_hours_high: float = 6.0
+    donation_expiry_hours_medium: float = 24.0
+    donation_expiry_hours_low: float = 48.0
+    
+    # Donation archive: every donation_archive_interval seconds, completed
+    # and declined donations created more than donation_archive_after_days
+    # ago move to donations_archive, donation_archive_batch_size per call
+    donation_archive_enabled: bool = True
+    donation_archive_interval: float = 3600.0
+    donation_archive_after_days: float = 90.0
+    donation_archive_batch_size: int = 1000
+    
+    # Activity log retention: monthly partitions are created
+    # activity_log_partitions_ahead months ahead, and those older than
+    # activity_log_retention_months (0 keeps everything) are dropped, first
+    # exported to gzipped NDJSON in activity_log_export_dir if set
+    activity_log_retention_enabled: bool = True
+    activity_log_retention_interval: float = 86400.0
+    activity_log_retention_months: int = 12
+    activity_log_partitions_ahead: int = 2
+    activity_log_export_dir: Optional[str] = None
+    
+    # Idempotency-Key store: "memory" (per worker) or "database" (shared
+    # by all workers); keys are remembered for idempotency_ttl seconds. In the
+    # database a key stays claimed by an unfinished request for
+    # idempotency_lease seconds, after which a retry may take it over
+    idempotency_backend: str = "memory"
+    idempotency_ttl: float = 86400.0
+    idempotency_lease: float = 60.0
+    
+    # Admission control: concurrent requests per worker, overall and per
+    # route class; requests wait at most admission_max_wait seconds in a
+    # queue of admission_queue_size per class before being shed with 503
+    admission_control_enabled: bool = True
+    admission_max_concurrency: int = 64
+    admission_write_limit: int = 48
+    admission_read_limit: int = 48
+    admission_analytics_limit: int = 4
+    admission_auth_limit: int = 8
+    admission_queue_size: int = 100
+    admission_max_wait: float = 5.0
+    admission_retry_after: float = 1.0
+    # Login attempts per client IP: login_rate_burst at once, refilled at
+    # login_rate_per_minute
+    login_rate_per_minute: float = 10.0
+    login_rate_burst: int = 5
+    # Load balancers/proxies (comma separated IPs or CIDRs) whose
+    # X-Forwarded-For is trusted to name the client for the login limit
+    trusted_proxies: str = ""
+    
     # Optional:  API versioning
     api_v1_prefix: str = "/api"
     
@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends, Query
+from app.models.schemas import DonorDashboard, UserRole
+from app.dashboard.service import get_donor_dashboard
+from app.auth.dependencies import require_role
+
+router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
+
+
+@router.get("/donor", response_model=DonorDashboard)
+async def donor_dashboard(
+    recent: int = Query(5, ge=0, le=20, description="Number of recent donations"),
+    top: int = Query(5, ge=0, le=20, description="Number of leaderboard entries"),
+    current_user: dict = Depends(require_role([UserRole.donor]))
+):
+    """
+    Get the donor home screen in one request (Donor only).
+    
+    Combines the profile (`/api/auth/me`), stats and rank
+    (`/api/admin/users/me/stats`), donation counts and most recent donations
+    (`/api/donations`) and the top of the leaderboard (`/api/leaderboard`).
+    """
+    dashboard = await get_donor_dashboard(current_user, recent_limit=recent, leaderboard_limit=top)
+    return dashboard
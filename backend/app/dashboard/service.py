@@ -0,0 +1,56 @@
+import asyncio
+from fastapi.concurrency import run_in_threadpool
+from app.database import supabase_read
+from app.donations.service import status_counts
+from app.leaderboard.service import get_donor_rank, get_leaderboard
+
+
+def _load_donation_statuses(donor_id: str) -> list:
+    return supabase_read.rpc("donation_status_counts", {
+        "donor_id_param": donor_id,
+        "include_archived_param": True,
+    }).execute().data
+
+
+def _load_recent_donations(donor_id: str, limit: int) -> list:
+    return supabase_read.table("all_donations").select("*").eq(
+        "donor_id", donor_id
+    ).order("created_at", desc=True).limit(limit).execute().data
+
+
+async def get_donor_dashboard(user: dict, recent_limit: int = 5, leaderboard_limit: int = 5) -> dict:
+    """
+    Everything the donor home screen shows, in one call.
+    
+    ``user`` is the authenticated user row, which already holds the profile
+    and donation totals. The status counts and recent donations are two
+    queries run concurrently; the rank and top donors come from the cached
+    leaderboard, with the rank counted in the database for a donor missing
+    from it.
+    """
+    statuses, recent, leaderboard = await asyncio.gather(
+        run_in_threadpool(_load_donation_statuses, user["id"]),
+        run_in_threadpool(_load_recent_donations, user["id"], recent_limit),
+        get_leaderboard(limit=leaderboard_limit, current_user_id=user["id"]),
+    )
+    
+    counts = status_counts(statuses)
+    current_entry = leaderboard["current_user"]
+    # Donors who joined after the cached leaderboard was loaded are not in it
+    rank = current_entry["rank"] if current_entry else await get_donor_rank(user["points"])
+    profile = {key: value for key, value in user.items() if key != "password_hash"}
+    
+    return {
+        "profile": profile,
+        "stats": {
+            "total_donations": user["total_donations"],
+            "active_donations": user["active_donations"],
+            "completed_donations": counts["completed"],
+            "points": user["points"],
+            "rank": rank,
+            "joined_at": user["created_at"],
+        },
+        "counts": counts,
+        "recent_donations": recent,
+        "leaderboard": leaderboard["leaderboard"],
+    }
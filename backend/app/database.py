@@ -1,19 +1,200 @@
-from supabase import create_client, Client
+import math
+import time
+from contextvars import ContextVar
+from typing import Any, Optional
+from fastapi import Request
+from supabase import create_client, Client, ClientOptions
 from app.config import get_settings
+from app.memory_database import InMemoryClient, seed_defaults
+from app.instrumentation import InstrumentedClient
 
 settings = get_settings()
 
+# Shared by the anon and admin clients when running on the in-memory backend
+_memory_client = None
+
+
+def get_memory_client() -> InMemoryClient:
+    """Get the process-wide in-memory client, seeding it on first use"""
+    global _memory_client
+    if _memory_client is None:
+        _memory_client = InMemoryClient()
+        _memory_client.store.latency = settings.memory_latency
+        _memory_client.store.failure_rate = settings.memory_failure_rate
+        if settings.memory_seed_data:
+            seed_defaults(_memory_client)
+    return _memory_client
+
+
+def _client_options() -> ClientOptions:
+    # Bounds each HTTP phase (connect, read, ...); call_with_policy bounds the
+    # call as a whole by db_call_timeout or the rest of the request deadline
+    return ClientOptions(postgrest_client_timeout=settings.db_call_timeout)
+
 
 def get_supabase_client() -> Client:
     """Get Supabase client with anon key for user operations"""
-    return create_client(settings.supabase_url, settings.supabase_key)
+    if settings.database_backend == "memory":
+        return get_memory_client()
+    return create_client(settings.supabase_url, settings.supabase_key, _client_options())
 
 
 def get_supabase_admin_client() -> Client:
     """Get Supabase client with service role key for admin operations"""
-    return create_client(settings.supabase_url, settings.supabase_service_key)
+    if settings.database_backend == "memory":
+        return get_memory_client()
+    return create_client(settings.supabase_url, settings.supabase_service_key, _client_options())
+
+
+def get_supabase_read_client() -> Client:
+    """Get Supabase client for the read replica (the primary if none is configured)"""
+    if settings.database_backend == "memory" or not settings.supabase_read_url:
+        return supabase.client
+    return create_client(
+        settings.supabase_read_url, settings.supabase_read_key or settings.supabase_key, _client_options()
+    )
+
+
+# =====================================================
+# READ-YOUR-WRITES STICKINESS
+# =====================================================
+
+# The time of a client's last write travels with the client, in a cookie
+# (or, for clients without cookies, a header they echo back), so whichever
+# worker serves its next request knows to read from the primary
+LAST_WRITE_COOKIE = "last_write"
+LAST_WRITE_HEADER = "X-Last-Write"
+
+
+class WriteMarker:
+    """Last write (Unix time) seen for the client of the current request"""
+
+    __slots__ = ("last_write", "wrote")
+
+    def __init__(self, last_write: Optional[float] = None):
+        self.last_write = last_write
+        self.wrote = False
+
+
+# User the current request is authenticated as (set by get_current_user)
+_request_user: ContextVar[Optional[str]] = ContextVar("request_user", default=None)
+_write_marker: ContextVar[Optional[WriteMarker]] = ContextVar("write_marker", default=None)
+
+
+def set_request_user(user_id: Optional[str]):
+    _request_user.set(user_id)
+
+
+def _parse_last_write(value: Optional[str]) -> Optional[float]:
+    try:
+        last_write = float(value)
+    except (TypeError, ValueError):
+        return None
+    return last_write if math.isfinite(last_write) else None
+
+
+def _note_write():
+    """Pin the client's reads to the primary for a while after a write"""
+    marker = _write_marker.get()
+    if marker is None or not settings.supabase_read_url:
+        return
+    marker.last_write = time.time()
+    marker.wrote = True
+
+
+def _reads_from_primary() -> bool:
+    marker = _write_marker.get()
+    if marker is None or marker.last_write is None or _request_user.get() is None:
+        return False
+    # Tolerates clock skew between workers either way; a forged marker only
+    # moves the client's own reads to the primary
+    now = time.time()
+    return now - settings.read_your_writes_window < marker.last_write < now + settings.read_your_writes_window
+
+
+async def track_writes(request: Request, call_next):
+    """HTTP middleware reading the client's last-write marker and renewing it after a write"""
+    if not settings.supabase_read_url:
+        return await call_next(request)
+    marker = WriteMarker(_parse_last_write(
+        request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(LAST_WRITE_COOKIE)
+    ))
+    token = _write_marker.set(marker)
+    try:
+        response = await call_next(request)
+    finally:
+        _write_marker.reset(token)
+    if marker.wrote:
+        value = f"{marker.last_write:.3f}"
+        response.headers[LAST_WRITE_HEADER] = value
+        response.set_cookie(
+            LAST_WRITE_COOKIE, value, max_age=math.ceil(settings.read_your_writes_window),
+            httponly=True, samesite="lax", secure=request.url.scheme == "https",
+        )
+    return response
+
+
+class ReadRoutingClient:
+    """
+    Client for read-only queries.
+    
+    Queries go to the read replica, except for authenticated clients whose
+    last-write marker is within ``read_your_writes_window`` seconds, whose
+    reads go to the primary so they see their own changes despite
+    replication lag. While the
+    replica's circuit breaker is open, reads fall back to the primary.
+    """
+
+    def __init__(self, primary: InstrumentedClient, replica: InstrumentedClient):
+        self.primary = primary
+        self.replica = replica
+
+    def _route(self) -> InstrumentedClient:
+        if _reads_from_primary() or self.replica.breaker.state == "open":
+            return self.primary
+        return self.replica
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._route(), name)
+
+    def table(self, table_name: str):
+        return self._route().table(table_name)
+
+    def from_(self, table_name: str):
+        return self.table(table_name)
+
+    def rpc(self, fn: str, params: Optional[dict] = None, **kwargs):
+        return self._route().rpc(fn, params, **kwargs)
+
+
+# Singleton instances, created on first use (queries are timed and
+# attributed to the current request). Services use supabase_read for
+# read-only queries that tolerate replication lag, supabase for the rest.
+supabase:  Client = InstrumentedClient(get_supabase_client, "primary", on_write=_note_write)
+supabase_admin: Client = InstrumentedClient(get_supabase_admin_client, "primary_admin", on_write=_note_write)
+supabase_read: Client = ReadRoutingClient(supabase, InstrumentedClient(get_supabase_read_client, "replica"))
+
+
+def connect():
+    """Create the clients now instead of on the first request"""
+    supabase.client
+    supabase_admin.client
+    supabase_read.replica.client
+
 
+def ping_database() -> dict:
+    """Run a minimal query and report whether the database answered and how fast"""
+    started = time.perf_counter()
+    try:
+        supabase.table("ngos").select("id").limit(1).execute()
+    except Exception as exc:
+        return {
+            "reachable": False,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+            "error": str(exc) or exc.__class__.__name__,
+        }
+    return {
+        "reachable": True,
+        "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
 
-# Singleton instances
-supabase:  Client = get_supabase_client()
-supabase_admin: Client = get_supabase_admin_client()
\ No newline at end of file
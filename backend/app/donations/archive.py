@@ -0,0 +1,57 @@
+"""
+Archival of old closed donations.
+
+Completed and declined donations created more than
+``donation_archive_after_days`` ago are moved from ``donations`` to
+``donations_archive`` in batches by the ``archive_donations`` database
+function, so the hot table (and its indexes) stays proportional to current
+activity. History reads go through the ``all_donations`` view, which spans
+both tables.
+
+Each API worker runs the archival every ``donation_archive_interval``
+seconds (started from the app lifespan). With
+``DONATION_ARCHIVE_ENABLED=false`` run it from cron instead:
+
+    python -m app.donations.archive
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+
+from app.config import get_settings
+from app.database import supabase
+from app.metrics import REGISTRY
+
+settings = get_settings()
+logger = logging.getLogger("app.archive")
+
+# Batches per run, so one run cannot hold a worker thread for long
+MAX_BATCHES_PER_RUN = 20
+
+donations_archived_total = REGISTRY.counter(
+    "app_donations_archived_total", "Closed donations moved to the archive"
+).labels()
+
+
+def archive_old_donations() -> int:
+    """Move old closed donations to the archive, batch by batch; returns how many"""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=settings.donation_archive_after_days)
+
+    total = 0
+    for _ in range(MAX_BATCHES_PER_RUN):
+        moved = supabase.rpc("archive_donations", {
+            "cutoff_param": cutoff.isoformat(),
+            "batch_size_param": settings.donation_archive_batch_size,
+        }).execute().data or 0
+        total += moved
+        if moved < settings.donation_archive_batch_size:
+            break
+
+    if total:
+        donations_archived_total.inc(total)
+        logger.info("Archived %d closed donations", total)
+    return total
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    print(f"Archived {archive_old_donations()} closed donations")
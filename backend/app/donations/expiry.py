@@ -0,0 +1,83 @@
+"""
+Expiry of stale pending donations.
+
+Perishable food that no staff member accepted in time is declined
+automatically: pending donations older than their priority's threshold
+(``donation_expiry_hours_<priority>``) are declined in batches by the
+``expire_pending_donations`` database function, which also adjusts donor
+and NGO counters and writes one activity entry per batch.
+
+Each API worker runs the expiry every ``donation_expiry_interval`` seconds
+(started from the app lifespan); concurrent runs skip each other's rows.
+With ``DONATION_EXPIRY_ENABLED=false`` run it from cron instead:
+
+    python -m app.donations.expiry
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from app.config import get_settings
+from app.database import supabase
+from app.metrics import REGISTRY
+from app.donations.service import map_cluster_cache
+from app.ngos.service import ngo_cache
+
+settings = get_settings()
+logger = logging.getLogger("app.expiry")
+
+EXPIRY_REASON = "Expired: not picked up in time"
+
+# Batches per run, so one run cannot hold a worker thread for long
+MAX_BATCHES_PER_RUN = 20
+
+donations_expired_total = REGISTRY.counter(
+    "app_donations_expired_total", "Pending donations declined by the expiry job"
+).labels()
+
+
+def expiry_cutoffs(now: Optional[datetime] = None) -> Dict[str, Optional[str]]:
+    """Creation time before which pending donations expire, per priority (None: never)"""
+    now = now or datetime.now(timezone.utc)
+    hours = {
+        "high": settings.donation_expiry_hours_high,
+        "medium": settings.donation_expiry_hours_medium,
+        "low": settings.donation_expiry_hours_low,
+    }
+    return {
+        priority: (now - timedelta(hours=age)).isoformat() if age > 0 else None
+        for priority, age in hours.items()
+    }
+
+
+def expire_stale_donations() -> int:
+    """Decline every stale pending donation, batch by batch; returns how many"""
+    cutoffs = expiry_cutoffs()
+    if not any(cutoffs.values()):
+        return 0
+
+    total = 0
+    for _ in range(MAX_BATCHES_PER_RUN):
+        expired = supabase.rpc("expire_pending_donations", {
+            "high_cutoff_param": cutoffs["high"],
+            "medium_cutoff_param": cutoffs["medium"],
+            "low_cutoff_param": cutoffs["low"],
+            "batch_size_param": settings.donation_expiry_batch_size,
+            "reason_param": EXPIRY_REASON,
+        }).execute().data or 0
+        total += expired
+        if expired < settings.donation_expiry_batch_size:
+            break
+
+    if total:
+        # Expired donations leave the map and the load of their NGOs
+        map_cluster_cache.invalidate()
+        ngo_cache.invalidate()
+        donations_expired_total.inc(total)
+        logger.info("Expired %d stale pending donations", total)
+    return total
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    print(f"Expired {expire_stale_donations()} stale pending donations")
@@ -1,20 +1,45 @@
-from fastapi import APIRouter, Depends, Query, UploadFile, File, Form, status
+from fastapi import APIRouter, Depends, Query, UploadFile, File, Form, Header, HTTPException, Response, status
 from typing import Optional
 from app.models.schemas import (
-    DonationCreate, DonationResponse, DonationListResponse,
-    DonationStatusUpdate, UserRole
+    DonationCreate, DonationResponse, DonationListResponse, PickupQueueResponse,
+    DonationStatusUpdate, BulkStatusUpdate, BulkStatusUpdateResponse, UserRole
 )
 from app.donations.service import (
-    create_donation, get_donations, get_donation_by_id,
-    get_donations_for_map, update_donation_status
+    create_donation, get_donations, get_donation_by_id, get_donations_for_map,
+    get_map_clusters, get_pickup_queue, update_donation_status, bulk_update_donation_status
 )
 from app.auth.dependencies import get_current_active_user, require_role
+from app.config import get_settings
+from app.idempotency import run_idempotent
 
+settings = get_settings()
 router = APIRouter(prefix="/donations", tags=["Donations"])
 
 
+def donation_etag(donation: dict) -> str:
+    """ETag of a donation, derived from its row version"""
+    return f'"{donation.get("version", 1)}"'
+
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """Expected donation version from an If-Match header (None for absent or *)"""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    tag = if_match.split(",")[0].strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    try:
+        return int(tag.strip('"'))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="If-Match must be an ETag returned by this API"
+        )
+
+
 @router.post("", response_model=DonationResponse, status_code=status.HTTP_201_CREATED)
 async def create_new_donation(
+    response: Response,
     address: str = Form(...),
     latitude: float = Form(...),
     longitude: float = Form(...),
@@ -22,6 +47,7 @@ async def create_new_donation(
     priority: str = Form(...),
     description: Optional[str] = Form(None),
     image:  Optional[UploadFile] = File(None),
+    idempotency_key: Optional[str] = Header(None),
     current_user: dict = Depends(require_role([UserRole.donor]))
 ):
     """
@@ -33,6 +59,10 @@ async def create_new_donation(
     - **priority**: high, medium, or low
     - **description**: Optional description of the food
     - **image**:  Optional food image (PNG/JPG, max 10MB)
+    
+    Send an **Idempotency-Key** header to make retries safe: a repeated
+    request with the same key returns the first response instead of
+    creating another donation.
     """
     from app.models.schemas import Volume, Priority
     
@@ -52,7 +82,14 @@ async def create_new_donation(
         # For now, just skip image handling
         pass
     
-    donation = await create_donation(donation_data, current_user["id"], image_url)
+    donation = await run_idempotent(
+        idempotency_key,
+        current_user["id"],
+        "create_donation",
+        donation_data,
+        lambda: create_donation(donation_data, current_user["id"], image_url),
+        response
+    )
     return donation
 
 
@@ -86,30 +123,102 @@ async def list_donations(
     return result
 
 
+def parse_bbox(bbox: Optional[str]) -> tuple:
+    """Viewport from a "min_lng,min_lat,max_lng,max_lat" query parameter (whole world if absent)"""
+    if bbox is None:
+        return (-180.0, -90.0, 180.0, 90.0)
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(part) for part in bbox.split(","))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="bbox must be min_lng,min_lat,max_lng,max_lat"
+        )
+    if min_lng > max_lng or min_lat > max_lat:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="bbox minimums must not exceed maximums"
+        )
+    return (min_lng, min_lat, max_lng, max_lat)
+
+
 @router.get("/map")
 async def get_map_donations(
+    zoom: Optional[int] = Query(None, ge=0, le=22, description="Map zoom level, enables clustering"),
+    bbox: Optional[str] = Query(None, description="Viewport: min_lng,min_lat,max_lng,max_lat"),
     current_user: dict = Depends(require_role([UserRole.staff, UserRole.admin]))
 ):
     """
     Get donations with coordinates for map view (Staff/Admin only).
     
-    Returns active and pending donations with location data.
+    Returns active and pending donations with location data. When **zoom**
+    is at most the clustering threshold (13 by default), donations in the
+    **bbox** viewport are instead returned as grid `clusters`, each with its
+    centroid, donation count, total servings and highest priority.
     """
+    if zoom is not None and zoom <= settings.map_cluster_max_zoom:
+        return await get_map_clusters(zoom, parse_bbox(bbox))
     donations = await get_donations_for_map(current_user. get("ngo_id"))
     return {"donations": donations}
 
 
+@router.get("/queue", response_model=PickupQueueResponse)
+async def get_queue(
+    limit: int = Query(50, ge=1, le=200, description="Maximum donations returned"),
+    cursor: Optional[str] = Query(None, description="Only changes after this cursor"),
+    page: Optional[str] = Query(None, description="Next page of the queue, from next_page"),
+    current_user: dict = Depends(require_role([UserRole.staff]))
+):
+    """
+    Get the pickup queue of your NGO (Staff only).
+    
+    Returns the pending donations assigned to your NGO, high priority first
+    and oldest first within a priority. While **has_more** is true, pass
+    **next_page** back as **page** for the following donations.
+    
+    To refresh, pass the returned **cursor** back: only donations changed
+    after it are returned, with the ids of those no longer pending in
+    **removed**. Keep requesting with each new cursor while **has_more** is
+    true.
+    """
+    queue = await get_pickup_queue(current_user.get("ngo_id"), limit=limit, cursor=cursor, page=page)
+    return queue
+
+
+@router.patch("/status", response_model=BulkStatusUpdateResponse)
+async def bulk_update_status(
+    bulk_update: BulkStatusUpdate,
+    current_user: dict = Depends(require_role([UserRole.staff]))
+):
+    """
+    Update the status of many donations at once (Staff only).
+    
+    Accepts up to 100 `{donation_id, status, decline_reason, version}` items
+    with the same transition rules as the single update. Items succeed or fail
+    independently; each result carries the status code the single update
+    would have returned (200, 400, 404, 409 or 412).
+    """
+    result = await bulk_update_donation_status(
+        bulk_update.updates,
+        current_user["id"],
+        current_user["full_name"]
+    )
+    return result
+
+
 @router. get("/{donation_id}", response_model=DonationResponse)
 async def get_donation(
     donation_id: str,
+    response: Response,
     current_user: dict = Depends(get_current_active_user)
 ):
-    """Get a single donation by ID."""
+    """Get a single donation by ID. The ETag header can be sent back as If-Match on status updates."""
     donation = await get_donation_by_id(
         donation_id,
         current_user["id"],
         current_user["role"]
     )
+    response.headers["ETag"] = donation_etag(donation)
     return donation
 
 
@@ -117,6 +226,9 @@ async def get_donation(
 async def update_status(
     donation_id: str,
     status_update: DonationStatusUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None),
     current_user: dict = Depends(require_role([UserRole.staff]))
 ):
     """
@@ -127,11 +239,27 @@ async def update_status(
     - pending → declined (decline donation)
     - active → completed (pickup completed)
     - active → declined (cancel pickup)
+    
+    Returns 409 if the donation's current status does not allow the
+    transition (e.g. another staff member got there first), and 412 if an
+    **If-Match** ETag is sent and the donation has changed since. With an
+    **Idempotency-Key** header, a retried request returns the first
+    response instead of failing with 409.
     """
-    donation = await update_donation_status(
-        donation_id,
-        status_update,
+    expected_version = parse_if_match(if_match)
+    donation = await run_idempotent(
+        idempotency_key,
         current_user["id"],
-        current_user["full_name"]
+        "update_donation_status",
+        {"donation_id": donation_id, "update": status_update, "version": expected_version},
+        lambda: update_donation_status(
+            donation_id,
+            status_update,
+            current_user["id"],
+            current_user["full_name"],
+            expected_version=expected_version
+        ),
+        response
     )
+    response.headers["ETag"] = donation_etag(donation)
     return donation
\ No newline at end of file
@@ -1,12 +1,25 @@
-from typing import Optional, List
+import base64
+import math
+import uuid
+from typing import Optional, List, Tuple
 from datetime import datetime, timedelta
 from fastapi import HTTPException, status, UploadFile
-from app.database import supabase
+from postgrest import APIError
+from app.database import supabase, supabase_read
+from app.leaderboard.service import leaderboard_cache
+from app.ngos.service import ngo_cache
+from app.cache import TTLCache
+from app.config import get_settings
 from app. models.schemas import (
-    DonationCreate, DonationStatus, DonationStatusUpdate, 
-    Volume, Priority, UserRole
+    DonationCreate, DonationStatusUpdate, 
+    BulkStatusUpdateItem, Volume, Priority, UserRole
 )
 
+settings = get_settings()
+
+# Map clusters per (zoom, tile x, tile y), dropped on every donation write
+map_cluster_cache = TTLCache("map_clusters", settings.map_cluster_cache_ttl)
+
 
 def calculate_points(volume: Volume, priority: Priority) -> int:
     """Calculate points based on volume and priority"""
@@ -26,71 +39,55 @@ async def create_donation(
     donor_id: str,
     image_url: Optional[str] = None
 ) -> dict:
-    """Create a new donation"""
-    # Get donor info
-    donor_response = supabase.table("users").select("full_name").eq("id", donor_id).execute()
-    if not donor_response.data:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Donor not found"
-        )
-    
-    donor_name = donor_response.data[0]["full_name"]
+    """
+    Create a new donation.
     
+    The insert and its side effects (donor and NGO counters, daily rollup,
+    activity entry) run in one transaction (``create_donation_tx``), so a
+    failure leaves nothing behind.
+    """
     # Calculate points and servings
     points = calculate_points(donation_data.volume, donation_data.priority)
     servings = calculate_servings(donation_data.volume)
     
-    # Find nearest NGO (simple implementation - can be enhanced with distance calculation)
-    ngos_response = supabase.table("ngos").select("id").limit(1).execute()
-    assigned_ngo_id = ngos_response.data[0]["id"] if ngos_response.data else None
-    
-    donation_dict = {
-        "donor_id": donor_id,
-        "donor_name": donor_name,
-        "image_url": image_url,
-        "address": donation_data.address,
-        "latitude": donation_data.latitude,
-        "longitude": donation_data. longitude,
-        "volume": donation_data.volume. value,
-        "volume_servings": servings,
-        "priority": donation_data.priority. value,
-        "status": DonationStatus.pending.value,
-        "points":  points,
-        "description": donation_data.description,
-        "assigned_ngo_id": assigned_ngo_id,
-    }
-    
-    response = supabase.table("donations").insert(donation_dict).execute()
-    
-    if not response.data:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to create donation"
-        )
-    
-    donation = response.data[0]
-    
-    # Update donor's active donations count
-    supabase. rpc("increment_user_active_donations", {"user_id_param": donor_id}).execute()
-    
-    # Update NGO's active pickups if assigned
-    if assigned_ngo_id:
-        supabase. rpc("increment_ngo_active_pickups", {"ngo_id_param": assigned_ngo_id}).execute()
-    
-    # Log activity
-    supabase.table("activity_log").insert({
-        "action":  "donation_created",
-        "description": "New donation created",
-        "user_id": donor_id,
-        "user_name": donor_name,
-        "target_id": donation["id"],
-        "target_type": "donation"
-    }).execute()
+    try:
+        response = await supabase.rpc("create_donation_tx", {
+            "donor_id_param": donor_id,
+            "address_param": donation_data.address,
+            "latitude_param": donation_data.latitude,
+            "longitude_param": donation_data.longitude,
+            "volume_param": donation_data.volume.value,
+            "volume_servings_param": servings,
+            "priority_param": donation_data.priority.value,
+            "points_param": points,
+            "description_param": donation_data.description,
+            "image_url_param": image_url,
+        }).execute_async()
+    except APIError as exc:
+        if exc.code == "P0002":
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Donor not found"
+            )
+        raise
+    
+    donation = response.data
+    map_cluster_cache.invalidate()
+    if donation["assigned_ngo_id"]:
+        ngo_cache.invalidate()
     
     return donation
 
 
+def status_counts(rows: List[dict]) -> dict:
+    """Number of donations per status (plus "all") from ``donation_status_counts`` rows"""
+    counts = {"all": 0, "pending": 0, "active": 0, "completed": 0, "declined": 0}
+    for row in rows:
+        counts[row["status"]] += row["donations"]
+        counts["all"] += row["donations"]
+    return counts
+
+
 async def get_donations(
     user_id: str,
     user_role: str,
@@ -101,8 +98,15 @@ async def get_donations(
     page: int = 1,
     limit: int = 20
 ) -> dict:
-    """Get donations list based on user role and filters"""
-    query = supabase.table("donations").select("*", count="exact")
+    """
+    Get donations list based on user role and filters.
+    
+    Lists that can include closed donations (donor history, admin views)
+    read the ``all_donations`` view, which also covers archived ones. The
+    status counts come from ``donation_status_counts``.
+    """
+    history = user_role != "staff" and status_filter not in ("pending", "active")
+    query = supabase_read.table("all_donations" if history else "donations").select("*", count="exact")
     
     # Role-based filtering
     if user_role == "donor":
@@ -126,31 +130,15 @@ async def get_donations(
     offset = (page - 1) * limit
     query = query.range(offset, offset + limit - 1)
     
-    response = query.execute()
+    response = await query.execute_async()
     
-    # Get counts for donor
-    counts = {}
-    if user_role == "donor": 
-        count_query = supabase.table("donations").select("status", count="exact").eq("donor_id", user_id)
-        all_donations = supabase.table("donations").select("status").eq("donor_id", user_id).execute()
-        
-        counts = {
-            "all":  len(all_donations.data),
-            "pending": len([d for d in all_donations. data if d["status"] == "pending"]),
-            "active":  len([d for d in all_donations.data if d["status"] == "active"]),
-            "completed": len([d for d in all_donations.data if d["status"] == "completed"]),
-            "declined": len([d for d in all_donations.data if d["status"] == "declined"]),
-        }
-    else: 
-        # For staff/admin, get overall counts
-        all_donations = supabase.table("donations").select("status").execute()
-        counts = {
-            "all": len(all_donations.data),
-            "pending":  len([d for d in all_donations.data if d["status"] == "pending"]),
-            "active": len([d for d in all_donations.data if d["status"] == "active"]),
-            "completed": len([d for d in all_donations.data if d["status"] == "completed"]),
-            "declined": len([d for d in all_donations. data if d["status"] == "declined"]),
-        }
+    # Status counts, grouped in the database: archived donations are counted
+    # whenever the list reads them, and a donor's counts always cover their
+    # whole history; staff counts only the hot table
+    params = {"include_archived_param": history or user_role == "donor"}
+    if user_role == "donor":
+        params["donor_id_param"] = user_id
+    counts = status_counts((await supabase_read.rpc("donation_status_counts", params).execute_async()).data)
     
     total = response.count if response.count else 0
     
@@ -166,18 +154,25 @@ async def get_donations(
     }
 
 
+async def find_donation(donation_id: str, columns: str = "*") -> Optional[dict]:
+    """A donation by ID, looked up in the archive if it is not in the hot table"""
+    for table in ("donations", "donations_archive"):
+        response = await supabase.table(table).select(columns).eq("id", donation_id).execute_async()
+        if response.data:
+            return response.data[0]
+    return None
+
+
 async def get_donation_by_id(donation_id: str, user_id: str, user_role: str) -> dict:
     """Get a single donation by ID"""
-    response = supabase.table("donations").select("*").eq("id", donation_id).execute()
+    donation = await find_donation(donation_id)
     
-    if not response.data:
+    if donation is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Donation not found"
         )
     
-    donation = response.data[0]
-    
     # Check permission
     if user_role == "donor" and donation["donor_id"] != user_id:
         raise HTTPException(
@@ -190,43 +185,264 @@ async def get_donation_by_id(donation_id: str, user_id: str, user_role: str) ->
 
 async def get_donations_for_map(ngo_id: Optional[str] = None) -> List[dict]:
     """Get donations with coordinates for map view"""
-    query = supabase.table("donations").select("*").in_("status", ["active", "pending"])
+    query = supabase_read.table("donations").select("*").in_("status", ["active", "pending"])
     
-    response = query.execute()
+    response = await query.execute_async()
     
     return response.data
 
 
-async def update_donation_status(
-    donation_id: str,
-    status_update: DonationStatusUpdate,
-    staff_id: str,
-    staff_name: str
+# Cursor before every change: (updated_at, id) keyset start
+_QUEUE_START = ("1970-01-01T00:00:00+00:00", "00000000-0000-0000-0000-000000000000")
+
+
+def encode_queue_cursor(updated_at: str, donation_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{updated_at}|{donation_id}".encode()).decode()
+
+
+def decode_queue_cursor(cursor: str) -> Tuple[str, str]:
+    """(updated_at, id) of a cursor from ``encode_queue_cursor``; 400 if malformed"""
+    try:
+        updated_at, donation_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        datetime.fromisoformat(updated_at.replace("Z", "+00:00"))
+        return updated_at, str(uuid.UUID(donation_id))
+    except (ValueError, UnicodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def encode_queue_page(priority_rank: int, created_at: str, donation_id: str, cursor: str) -> str:
+    return base64.urlsafe_b64encode(f"{priority_rank}|{created_at}|{donation_id}|{cursor}".encode()).decode()
+
+
+def decode_queue_page(page: str) -> Tuple[int, str, str, str]:
+    """(priority_rank, created_at, id, change cursor) of a token from ``encode_queue_page``; 400 if malformed"""
+    try:
+        priority_rank, created_at, donation_id, cursor = base64.urlsafe_b64decode(
+            page.encode()
+        ).decode().split("|")
+        datetime.fromisoformat(created_at.replace("Z", "+00:00"))
+        decode_queue_cursor(cursor)
+        return int(priority_rank), created_at, str(uuid.UUID(donation_id)), cursor
+    except (ValueError, UnicodeError, HTTPException):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid page"
+        )
+
+
+def _queue_page(rows: List[dict], limit: int, cursor: str) -> dict:
+    page = rows[:limit]
+    last = page[-1] if len(rows) > limit else None
+    return {
+        "donations": page,
+        "removed": [],
+        "cursor": cursor,
+        "next_page": encode_queue_page(
+            last["priority_rank"], last["created_at"], last["id"], cursor
+        ) if last else None,
+        "has_more": last is not None,
+    }
+
+
+async def get_pickup_queue(
+    ngo_id: Optional[str],
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    page: Optional[str] = None
 ) -> dict:
-    """Update donation status (staff only)"""
-    # Get current donation
-    response = supabase.table("donations").select("*").eq("id", donation_id).execute()
+    """
+    Pending donations assigned to an NGO, highest priority and oldest first.
+    
+    The queue is read in pages: while ``has_more`` is true, ``next_page``
+    passed back as ``page`` returns the following donations, keyed on
+    (priority_rank, created_at, id) so pages neither skip nor repeat rows.
+    
+    Every response also carries a ``cursor``. Passed back, only donations
+    changed after it are returned: those still pending in ``donations`` and
+    those that left the queue in ``removed``. The cursor is an (updated_at,
+    id) keyset, so it advances even when a batch update gave many donations
+    the same ``updated_at``. All pages of one read carry the same cursor.
+    """
+    if not ngo_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Your account is not linked to an NGO"
+        )
+    if cursor is not None and page is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pass either cursor or page, not both"
+        )
     
-    if not response.data:
+    if page is not None:
+        priority_rank, created_at, donation_id, cursor = decode_queue_page(page)
+        rows = (await supabase_read.rpc("pickup_queue_page", {
+            "ngo_id_param": ngo_id,
+            "after_priority_rank_param": priority_rank,
+            "after_created_at_param": created_at,
+            "after_id_param": donation_id,
+            "limit_param": limit + 1,
+        }).execute_async()).data
+        return _queue_page(rows, limit, cursor)
+    
+    if cursor is None:
+        # Read the cursor first: changes made while the queue is read are
+        # sent again on the next refresh, where clients upsert them by id
+        latest = (await supabase_read.table("donations").select("updated_at, id").eq(
+            "assigned_ngo_id", ngo_id
+        ).order("updated_at", desc=True).order("id", desc=True).limit(1).execute_async()).data
+        rows = (await supabase_read.table("donations").select("*").eq("assigned_ngo_id", ngo_id).eq(
+            "status", "pending"
+        ).order("priority_rank").order("created_at").order("id").limit(limit + 1).execute_async()).data
+        start = (latest[0]["updated_at"], latest[0]["id"]) if latest else _QUEUE_START
+        return _queue_page(rows, limit, encode_queue_cursor(*start))
+    
+    after_updated_at, after_id = decode_queue_cursor(cursor)
+    changed = (await supabase_read.rpc("pickup_queue_changes", {
+        "ngo_id_param": ngo_id,
+        "after_updated_at_param": after_updated_at,
+        "after_id_param": after_id,
+        "limit_param": limit,
+    }).execute_async()).data
+    pending = sorted(
+        (row for row in changed if row["status"] == "pending"),
+        key=lambda row: (row["priority_rank"], row["created_at"])
+    )
+    return {
+        "donations": pending,
+        "removed": [row["id"] for row in changed if row["status"] != "pending"],
+        "cursor": encode_queue_cursor(changed[-1]["updated_at"], changed[-1]["id"]) if changed else cursor,
+        "has_more": len(changed) == limit,
+    }
+
+
+def _tile_range(low: float, high: float, tile_size: float) -> range:
+    return range(math.floor(low / tile_size), math.floor(high / tile_size) + 1)
+
+
+async def get_map_clusters(zoom: int, bbox: Tuple[float, float, float, float]) -> dict:
+    """
+    Open donations in the viewport ``bbox`` (min_lng, min_lat, max_lng, max_lat)
+    aggregated into grid cells for ``zoom``.
+    
+    The grid divides the map into tiles of 360 / 2^zoom degrees, each split
+    into ``map_cluster_cells_per_tile`` cells per side. Clusters are cached
+    per tile; tiles missing from the cache are computed together with one
+    grouping query over their bounding box.
+    """
+    tile_size = 360.0 / 2 ** zoom
+    cells_per_tile = settings.map_cluster_cells_per_tile
+    cell_size = tile_size / cells_per_tile
+    min_lng, min_lat, max_lng, max_lat = bbox
+    
+    xs = _tile_range(min_lng, max_lng, tile_size)
+    ys = _tile_range(min_lat, max_lat, tile_size)
+    if len(xs) * len(ys) > settings.map_cluster_max_tiles:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Viewport too large for this zoom level"
+        )
+    
+    tiles = {}
+    missing = []
+    for x in xs:
+        for y in ys:
+            clusters = map_cluster_cache.get((zoom, x, y))
+            if clusters is None:
+                missing.append((x, y))
+            else:
+                tiles[(x, y)] = clusters
+    
+    if missing:
+        missing_xs = [x for x, _ in missing]
+        missing_ys = [y for _, y in missing]
+        rows = (await supabase_read.rpc("cluster_donations", {
+            "cell_size_param": cell_size,
+            "min_lat_param": min(missing_ys) * tile_size,
+            "min_lng_param": min(missing_xs) * tile_size,
+            "max_lat_param": (max(missing_ys) + 1) * tile_size,
+            "max_lng_param": (max(missing_xs) + 1) * tile_size,
+        }).execute_async()).data
+        computed = {tile: [] for tile in missing}
+        for row in rows:
+            tile = (row["cell_x"] // cells_per_tile, row["cell_y"] // cells_per_tile)
+            if tile in computed:
+                computed[tile].append({
+                    "latitude": row["latitude"],
+                    "longitude": row["longitude"],
+                    "count": row["count"],
+                    "volume_servings": row["volume_servings"],
+                    "highest_priority": row["highest_priority"],
+                })
+        for (x, y), clusters in computed.items():
+            map_cluster_cache.set((zoom, x, y), clusters)
+        tiles.update(computed)
+    
+    return {
+        "zoom": zoom,
+        "cell_size": cell_size,
+        "clusters": [cluster for clusters in tiles.values() for cluster in clusters],
+    }
+
+
+# Statuses a donation can move to, keyed by its current status
+VALID_TRANSITIONS = {
+    "pending": ["active", "declined"],
+    "active": ["completed", "declined"],
+}
+
+
+def allowed_predecessors(new_status: str) -> List[str]:
+    """Statuses from which a donation may move to ``new_status``"""
+    return [current for current, targets in VALID_TRANSITIONS.items() if new_status in targets]
+
+
+async def _raise_transition_failure(donation_id: str, new_status: str, expected_version: Optional[int]):
+    """Explain why a conditional status update matched no row"""
+    current = await find_donation(donation_id, "status, version")
+    
+    if current is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Donation not found"
         )
     
-    donation = response.data[0]
-    current_status = donation["status"]
-    new_status = status_update.status. value
+    if expected_version is not None and current["version"] != expected_version:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Donation was modified since it was fetched"
+        )
     
-    # Validate status transition
-    valid_transitions = {
-        "pending":  ["active", "declined"],
-        "active": ["completed", "declined"],
-    }
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Cannot transition from {current['status']} to {new_status}"
+    )
+
+
+async def update_donation_status(
+    donation_id: str,
+    status_update: DonationStatusUpdate,
+    staff_id: str,
+    staff_name: str,
+    expected_version: Optional[int] = None
+) -> dict:
+    """
+    Update donation status (staff only).
     
-    if current_status not in valid_transitions or new_status not in valid_transitions. get(current_status, []):
+    The transition is a single conditional UPDATE that only matches while the
+    donation is in an allowed predecessor status (and, if given, still at
+    ``expected_version``), so concurrent updates cannot both succeed.
+    """
+    new_status = status_update.status.value
+    predecessors = allowed_predecessors(new_status)
+    
+    if not predecessors:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Cannot transition from {current_status} to {new_status}"
+            detail=f"Cannot transition a donation to {new_status}"
         )
     
     # Prepare update
@@ -242,43 +458,64 @@ async def update_donation_status(
         update_data["completed_at"] = datetime.utcnow().isoformat()
         update_data["completed_by_staff_id"] = staff_id
     
-    # Update donation
-    supabase.table("donations").update(update_data).eq("id", donation_id).execute()
+    # Update donation (compare-and-set on status and version)
+    query = supabase.table("donations").update(update_data).eq(
+        "id", donation_id
+    ).in_("status", predecessors)
+    if expected_version is not None:
+        query = query.eq("version", expected_version)
+    response = await query.execute_async()
+    
+    if not response.data:
+        await _raise_transition_failure(donation_id, new_status, expected_version)
+    
+    donation = response.data[0]
     
     # Handle side effects
     donor_id = donation["donor_id"]
     ngo_id = donation["assigned_ngo_id"]
     
+    # Closed donations leave the map, and change their NGO's load in the NGO list
+    if new_status in ("completed", "declined"):
+        map_cluster_cache.invalidate()
+        if ngo_id:
+            ngo_cache.invalidate()
+    
     if new_status == "completed":
         # Award points to donor
         points = donation["points"]
-        supabase.rpc("award_points_to_user", {
+        await supabase.rpc("award_points_to_user", {
             "user_id_param": donor_id,
             "points_param": points
-        }).execute()
+        }).execute_async()
         
         # Increment donor's total donations
-        supabase.rpc("increment_user_total_donations", {"user_id_param": donor_id}).execute()
+        await supabase.rpc("increment_user_total_donations", {"user_id_param": donor_id}).execute_async()
         
         # Update NGO stats
         if ngo_id:
-            supabase.rpc("complete_ngo_pickup", {"ngo_id_param": ngo_id}).execute()
+            await supabase.rpc("complete_ngo_pickup", {"ngo_id_param": ngo_id}).execute_async()
+        
+        # Points changed, rankings are stale
+        leaderboard_cache.invalidate()
     
     elif new_status == "declined": 
-        # Decrement donor's active donations
-        supabase.rpc("decrement_user_active_donations", {"user_id_param": donor_id}).execute()
-        
         # Update NGO stats
         if ngo_id:
-            supabase.rpc("decrement_ngo_active_pickups", {"ngo_id_param": ngo_id}).execute()
+            await supabase.rpc("decrement_ngo_active_pickups", {"ngo_id_param": ngo_id}).execute_async()
     
     elif new_status == "active": 
         # Just transition, no special handling needed
         pass
     
-    # Decrement active donations when no longer active
-    if current_status in ["pending", "active"] and new_status in ["completed", "declined"]: 
-        supabase.rpc("decrement_user_active_donations", {"user_id_param":  donor_id}).execute()
+    # Decrement active donations when no longer active (every predecessor is pending/active)
+    if new_status in ["completed", "declined"]: 
+        await supabase.rpc("decrement_user_active_donations", {"user_id_param":  donor_id}).execute_async()
+        
+        # Daily analytics rollups
+        await supabase.rpc("record_donation_events", {
+            "events": [{"event": new_status, "donation": donation}]
+        }).execute_async()
     
     # Log activity
     action = f"donation_{new_status}"
@@ -286,15 +523,90 @@ async def update_donation_status(
     if new_status == "completed":
         description = f"Donation completed!  Donor awarded {donation['points']} points."
     
-    supabase.table("activity_log").insert({
+    await supabase.table("activity_log").insert({
         "action": action,
         "description": description,
         "user_id": staff_id,
         "user_name": staff_name,
         "target_id": donation_id,
         "target_type":  "donation"
-    }).execute()
+    }).execute_async()
     
-    # Fetch and return updated donation
-    updated = supabase.table("donations").select("*").eq("id", donation_id).execute()
-    return updated.data[0]
\ No newline at end of file
+    return donation
+
+
+async def bulk_update_donation_status(
+    items: List[BulkStatusUpdateItem],
+    staff_id: str,
+    staff_name: str
+) -> dict:
+    """
+    Apply many status transitions in one database call.
+    
+    Transitions are validated here, then applied by the
+    ``bulk_update_donation_status`` database function, which updates each
+    donation conditionally (as the single update does), adjusts donor and NGO
+    counters once per donor/NGO, updates the daily rollups and writes the
+    activity entries.
+    """
+    results = {}
+    updates = []
+    
+    for index, item in enumerate(items):
+        new_status = item.status.value
+        if not allowed_predecessors(new_status):
+            results[index] = {
+                "donation_id": item.donation_id,
+                "status_code": status.HTTP_400_BAD_REQUEST,
+                "detail": f"Cannot transition a donation to {new_status}",
+            }
+        elif any(u["id"] == item.donation_id for u in updates):
+            results[index] = {
+                "donation_id": item.donation_id,
+                "status_code": status.HTTP_400_BAD_REQUEST,
+                "detail": "Donation appears more than once in the batch",
+            }
+        else:
+            updates.append({
+                "index": index,
+                "id": item.donation_id,
+                "status": new_status,
+                "decline_reason": item.decline_reason if new_status == "declined" else None,
+                "version": item.version,
+            })
+    
+    if updates:
+        response = await supabase.rpc("bulk_update_donation_status", {
+            "updates": [{k: v for k, v in u.items() if k != "index"} for u in updates],
+            "staff_id_param": staff_id,
+            "staff_name_param": staff_name,
+        }).execute_async()
+        
+        for update, outcome in zip(updates, response.data):
+            result = {"donation_id": update["id"]}
+            if outcome["result"] == "updated":
+                result.update(status_code=status.HTTP_200_OK, donation=outcome["donation"])
+            elif outcome["result"] == "not_found":
+                result.update(status_code=status.HTTP_404_NOT_FOUND, detail="Donation not found")
+            elif outcome["result"] == "version_mismatch":
+                result.update(
+                    status_code=status.HTTP_412_PRECONDITION_FAILED,
+                    detail="Donation was modified since it was fetched"
+                )
+            else:
+                result.update(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Cannot transition from {outcome['current_status']} to {update['status']}"
+                )
+            results[update["index"]] = result
+        
+        # Points changed, rankings are stale
+        if any(u["status"] == "completed" for u in updates):
+            leaderboard_cache.invalidate()
+        if any(u["status"] in ("completed", "declined") for u in updates):
+            map_cluster_cache.invalidate()
+            ngo_cache.invalidate()
+    
+    ordered = [results[index] for index in range(len(items))]
+    updated = sum(1 for r in ordered if r["status_code"] == status.HTTP_200_OK)
+    return {"results": ordered, "updated": updated, "failed": len(ordered) - updated}
@@ -0,0 +1,307 @@
+"""
+Idempotency-Key support for retried writes.
+
+The first request with a given key runs the operation and stores its
+response; replays with the same key (by the same user, with the same payload)
+get the stored response back without the operation running again. Keys
+expire after ``idempotency_ttl`` seconds.
+
+Two key stores are available, selected with ``idempotency_backend``:
+"memory" (per worker) and "database" (the ``idempotency_keys`` table, shared
+by all workers). In the database, a key whose request never finished (its
+worker died) can be claimed by a retry once ``idempotency_lease`` seconds
+have passed.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from postgrest import APIError
+
+from app.config import get_settings
+from app.database import supabase
+from app.instrumentation import WriteAttempts, track_write_attempts
+
+settings = get_settings()
+
+MAX_KEY_LENGTH = 255
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Replayed for keys whose request failed unexpectedly after it started writing
+PARTIAL_FAILURE = {
+    "status_code": status.HTTP_409_CONFLICT,
+    "detail": "A request with this Idempotency-Key failed after it may have made changes; "
+              "check the result before retrying with a new key",
+}
+
+
+class IdempotencyStore(ABC):
+    """Key store interface; records are ``{"fingerprint", "state", "response"}``"""
+
+    @abstractmethod
+    def reserve(self, key: str, fingerprint: str) -> Optional[dict]:
+        """Claim ``key``; returns None if claimed, else the existing record"""
+
+    @abstractmethod
+    def complete(self, key: str, response: Any):
+        """Store the response of the operation that claimed ``key``"""
+
+    @abstractmethod
+    def fail(self, key: str, error: dict):
+        """Store the error (``{"status_code", "detail"}``) of an operation that failed after writing"""
+
+    @abstractmethod
+    def release(self, key: str):
+        """Forget ``key`` so the operation can be retried (used on failure)"""
+
+
+class InMemoryIdempotencyStore(IdempotencyStore):
+    """Per-worker key store"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._records: Dict[str, Tuple[float, dict]] = {}
+        self._lock = threading.Lock()
+        self._next_purge = time.monotonic() + ttl
+
+    def _purge(self, now: float):
+        if now < self._next_purge:
+            return
+        self._records = {k: v for k, v in self._records.items() if v[0] > now}
+        self._next_purge = now + min(self.ttl, 60.0)
+
+    def reserve(self, key: str, fingerprint: str) -> Optional[dict]:
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            existing = self._records.get(key)
+            if existing is not None and existing[0] > now:
+                return dict(existing[1])
+            self._records[key] = (now + self.ttl, {
+                "fingerprint": fingerprint, "state": IN_PROGRESS, "response": None,
+            })
+            return None
+
+    def complete(self, key: str, response: Any):
+        with self._lock:
+            expires, record = self._records.get(key, (time.monotonic() + self.ttl, {}))
+            self._records[key] = (expires, {**record, "state": COMPLETED, "response": response})
+
+    def fail(self, key: str, error: dict):
+        with self._lock:
+            expires, record = self._records.get(key, (time.monotonic() + self.ttl, {}))
+            self._records[key] = (expires, {**record, "state": FAILED, "response": error})
+
+    def release(self, key: str):
+        with self._lock:
+            self._records.pop(key, None)
+
+
+# A timestamptz as PostgREST returns it, e.g. "2024-05-01T12:00:00.12345+00:00"
+_TIMESTAMPTZ = re.compile(
+    r"(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2}:\d{2})(?:\.(\d+))?(Z|[+-]\d{2}(?::?\d{2})?)?$"
+)
+
+
+def parse_timestamptz(value: str) -> datetime:
+    """
+    Parse a timestamptz into an aware UTC datetime (naive values are UTC).
+    
+    ``datetime.fromisoformat`` only accepts Postgres output (trimmed
+    fractions, "Z", "+05" offsets) from Python 3.11 on.
+    """
+    match = _TIMESTAMPTZ.match(value)
+    if match is None:
+        raise ValueError(f"Invalid timestamp: {value!r}")
+    day, clock, fraction, offset = match.groups()
+    moment = datetime.strptime(f"{day}T{clock}", "%Y-%m-%dT%H:%M:%S")
+    if fraction:
+        moment = moment.replace(microsecond=int(fraction[:6].ljust(6, "0")))
+    if offset and offset != "Z":
+        digits = offset[1:].replace(":", "")
+        shift = timedelta(hours=int(digits[:2]), minutes=int(digits[2:] or 0))
+        moment = moment - shift if offset[0] == "+" else moment + shift
+    return moment.replace(tzinfo=timezone.utc)
+
+
+class DatabaseIdempotencyStore(IdempotencyStore):
+    """
+    Key store in the ``idempotency_keys`` table, shared by all workers.
+    
+    A claimed key is leased for ``lease`` seconds; a retry with the same
+    payload finding it still in progress after that takes it over, so a key
+    is not stuck until it expires when the worker running its request dies.
+    """
+
+    def __init__(self, ttl: float, lease: float):
+        self.ttl = ttl
+        self.lease = lease
+        self._reservations = 0
+
+    def _purge_expired(self):
+        supabase.table("idempotency_keys").delete().lt(
+            "expires_at", datetime.now(timezone.utc).isoformat()
+        ).execute()
+
+    def _claim(self, now: datetime) -> dict:
+        return {
+            "locked_until": (now + timedelta(seconds=self.lease)).isoformat(),
+            "expires_at": (now + timedelta(seconds=self.ttl)).isoformat(),
+        }
+
+    def reserve(self, key: str, fingerprint: str) -> Optional[dict]:
+        self._reservations += 1
+        if self._reservations % 100 == 0:
+            self._purge_expired()
+
+        for _ in range(3):
+            now = datetime.now(timezone.utc)
+            try:
+                supabase.table("idempotency_keys").insert({
+                    "key": key,
+                    "fingerprint": fingerprint,
+                    "state": IN_PROGRESS,
+                    **self._claim(now),
+                }).execute()
+                return None
+            except APIError as exc:
+                if exc.code != "23505":
+                    raise
+            existing = supabase.table("idempotency_keys").select(
+                "fingerprint, state, response, expires_at, locked_until"
+            ).eq("key", key).execute()
+            if not existing.data:
+                continue
+            record = existing.data[0]
+            if parse_timestamptz(record["expires_at"]) <= now:
+                # Expired key: drop it and claim it again
+                supabase.table("idempotency_keys").delete().eq("key", key).execute()
+                continue
+            if (record["state"] == IN_PROGRESS and record["fingerprint"] == fingerprint
+                    and parse_timestamptz(record["locked_until"]) <= now):
+                # Lease ran out: take the key over unless another retry just did
+                taken = supabase.table("idempotency_keys").update(self._claim(now)).eq(
+                    "key", key
+                ).eq("state", IN_PROGRESS).lt("locked_until", now.isoformat()).execute()
+                if taken.data:
+                    return None
+                continue
+            return record
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Idempotency key is being reused concurrently"
+        )
+
+    def complete(self, key: str, response: Any):
+        supabase.table("idempotency_keys").update({
+            "state": COMPLETED, "response": response,
+        }).eq("key", key).execute()
+
+    def fail(self, key: str, error: dict):
+        supabase.table("idempotency_keys").update({
+            "state": FAILED, "response": error,
+        }).eq("key", key).execute()
+
+    def release(self, key: str):
+        supabase.table("idempotency_keys").delete().eq("key", key).execute()
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    if settings.idempotency_backend == "database":
+        return DatabaseIdempotencyStore(settings.idempotency_ttl, settings.idempotency_lease)
+    return InMemoryIdempotencyStore(settings.idempotency_ttl)
+
+
+idempotency_store: IdempotencyStore = get_idempotency_store()
+
+
+def request_fingerprint(payload: Any) -> str:
+    """Stable hash of a request payload, to reject key reuse with another payload"""
+    encoded = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+async def run_idempotent(
+    idempotency_key: Optional[str],
+    user_id: str,
+    operation_name: str,
+    payload: Any,
+    operation: Callable[[], Awaitable[Any]],
+    response: Response,
+) -> Any:
+    """
+    Run ``operation`` once per idempotency key.
+
+    Without a key the operation simply runs. With a key, a replay returns the
+    stored response (marked with an ``Idempotent-Replayed`` header); a replay
+    while the first request is still running gets 409, and reusing a key with
+    a different payload gets 422. An operation that fails before issuing any
+    write releases the key, so the client can retry with it; one that fails
+    after a write (which may have been applied) stores its error, and replays
+    get that error instead of running the operation again.
+    """
+    if idempotency_key is None:
+        return await operation()
+
+    if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters"
+        )
+
+    # Keys are scoped per user and operation
+    key = f"{user_id}:{operation_name}:{idempotency_key}"
+    fingerprint = request_fingerprint(payload)
+    existing = await run_in_threadpool(idempotency_store.reserve, key, fingerprint)
+
+    if existing is not None:
+        if existing["fingerprint"] != fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used with a different request"
+            )
+        if existing["state"] == IN_PROGRESS:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still being processed"
+            )
+        if existing["state"] == FAILED:
+            error = existing["response"]
+            raise HTTPException(
+                status_code=error["status_code"],
+                detail=error["detail"],
+                headers={"Idempotent-Replayed": "true"},
+            )
+        response.headers["Idempotent-Replayed"] = "true"
+        return existing["response"]
+
+    attempts = track_write_attempts()
+    try:
+        result = await operation()
+    except HTTPException as exc:
+        await _settle_failure(key, attempts, {"status_code": exc.status_code, "detail": exc.detail})
+        raise
+    except BaseException:
+        await _settle_failure(key, attempts, PARTIAL_FAILURE)
+        raise
+
+    await run_in_threadpool(idempotency_store.complete, key, jsonable_encoder(result))
+    return result
+
+
+async def _settle_failure(key: str, attempts: WriteAttempts, error: dict):
+    if attempts.count == 0:
+        await run_in_threadpool(idempotency_store.release, key)
+    else:
+        await run_in_threadpool(idempotency_store.fail, key, jsonable_encoder(error))
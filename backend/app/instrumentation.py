@@ -0,0 +1,269 @@
+"""
+Per-request database call instrumentation.
+
+Every query builder handed out by the clients in ``app.database`` is wrapped
+so that each ``.execute()`` (tables and RPCs alike) is timed and attributed to
+the current request through a context variable. Async code awaits
+``.execute_async()`` instead, which runs the blocking call (network I/O and
+retry backoff) in the threadpool. The HTTP middleware exposes
+the totals as a ``Server-Timing`` header, writes one structured log line per
+request and flags requests that exceed the configured query budget.
+"""
+import asyncio
+import json
+import logging
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import get_settings
+from app.resilience import call_with_policy, new_breaker, reset_deadline, start_deadline
+
+settings = get_settings()
+logger = logging.getLogger("app.db")
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """Raised in strict mode, before issuing a query that would exceed the budget"""
+
+
+class RequestDBStats:
+    """Database calls issued while serving one request"""
+
+    __slots__ = ("calls", "issued", "duration", "operations")
+
+    def __init__(self):
+        self.calls = 0
+        # Started, including those still running (calls counts finished ones)
+        self.issued = 0
+        self.duration = 0.0
+        # label -> [count, seconds]
+        self.operations: Dict[str, list] = {}
+
+    def record(self, label: str, seconds: float):
+        self.calls += 1
+        self.duration += seconds
+        entry = self.operations.get(label)
+        if entry is None:
+            self.operations[label] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def server_timing(self, total_seconds: float) -> str:
+        return (
+            f'db;dur={self.duration * 1000:.2f};desc="{self.calls} queries", '
+            f"app;dur={max(total_seconds - self.duration, 0) * 1000:.2f}"
+        )
+
+
+_request_stats: ContextVar[Optional[RequestDBStats]] = ContextVar("request_db_stats", default=None)
+
+
+def current_db_stats() -> Optional[RequestDBStats]:
+    """Stats of the request being served, or None outside a request"""
+    return _request_stats.get()
+
+
+def detach_from_request():
+    """Stop attributing queries in the current context (e.g. a background task) to a request"""
+    _request_stats.set(None)
+
+
+class WriteAttempts:
+    """Number of writes issued in a context, whether or not they succeeded"""
+
+    __slots__ = ("count",)
+
+    def __init__(self):
+        self.count = 0
+
+
+_write_attempts: ContextVar[Optional[WriteAttempts]] = ContextVar("write_attempts", default=None)
+
+
+def track_write_attempts() -> WriteAttempts:
+    """Start counting the writes issued in the current context"""
+    attempts = WriteAttempts()
+    _write_attempts.set(attempts)
+    return attempts
+
+
+def check_query_budget(label: str):
+    """Count a query about to be issued; in strict mode, refuse it if over budget"""
+    stats = _request_stats.get()
+    if stats is None:
+        return
+    stats.issued += 1
+    budget = settings.db_query_budget
+    if settings.db_query_budget_strict and budget and stats.issued > budget:
+        raise QueryBudgetExceeded(
+            f"Request would issue more than {budget} database calls ({label})"
+        )
+
+
+def record_query(label: str, seconds: float):
+    """Attribute one executed query to the current request"""
+    stats = _request_stats.get()
+    if stats is None:
+        return
+    stats.record(label, seconds)
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+WRITE_OPERATIONS = ("insert", "update", "upsert", "delete")
+
+# Database functions that only read (declared STABLE); any other RPC is
+# taken to modify data
+READ_ONLY_RPCS = frozenset({
+    "cluster_donations", "donation_stats_by_day", "donation_status_counts",
+    "list_activity_log_partitions", "list_ngos", "pickup_queue_changes",
+    "pickup_queue_page", "search_autocomplete", "search_entities",
+})
+
+
+def is_write(label: str) -> bool:
+    """Whether a query label denotes a write (a table write or a mutating RPC)"""
+    if label.startswith("rpc:"):
+        return label[len("rpc:"):] not in READ_ONLY_RPCS
+    return label.rsplit(":", 1)[-1] in WRITE_OPERATIONS
+
+
+class InstrumentedQuery:
+    """Proxy around a postgrest request builder that times ``execute()``"""
+
+    __slots__ = ("_builder", "_label", "_client")
+
+    def __init__(self, builder: Any, label: str, client: "InstrumentedClient"):
+        self._builder = builder
+        self._label = label
+        self._client = client
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            label = self._label
+            if name in ("select",) + WRITE_OPERATIONS and ":" not in label:
+                label = f"{label}:{name}"
+            # Builders that return themselves (the in-memory one) keep this proxy
+            if result is self._builder:
+                self._label = label
+                return self
+            if hasattr(result, "execute"):
+                return InstrumentedQuery(result, label, self._client)
+            return result
+
+        return call
+
+    def execute(self):
+        if settings.debug and _on_event_loop():
+            logger.warning("Blocking database call %s on the event loop; use execute_async()", self._label)
+        # Before anything is sent, so a refused query has no effects
+        check_query_budget(self._label)
+        client = self._client
+        write = is_write(self._label)
+        if write:
+            # Counted before the call: a write that fails may still have been applied
+            attempts = _write_attempts.get()
+            if attempts is not None:
+                attempts.count += 1
+        started = time.perf_counter()
+        try:
+            # Only plain reads are safe to retry
+            response = call_with_policy(
+                self._builder.execute, client.breaker, self._label.endswith(":select")
+            )
+        finally:
+            record_query(self._label, time.perf_counter() - started)
+        if client.on_write is not None and write:
+            client.on_write()
+        return response
+
+    async def execute_async(self):
+        """``execute()`` in the threadpool, for async code"""
+        return await run_in_threadpool(self.execute)
+
+
+class InstrumentedClient:
+    """
+    Proxy around a Supabase (or in-memory) client that instruments queries.
+    
+    The underlying client is built by ``factory`` on first use, so importing
+    the services does not open connections. Calls go through the deadline,
+    retry and circuit breaker policy of ``app.resilience`` (one breaker per
+    client). ``on_write`` is called after each successful write.
+    """
+
+    def __init__(self, factory: Callable[[], Any], name: str = "primary",
+                 on_write: Optional[Callable[[], None]] = None):
+        self._factory = factory
+        self._client = None
+        self.breaker = new_breaker(name)
+        self.on_write = on_write
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            self._client = self._factory()
+        return self._client
+
+    def __getattr__(self, name: str):
+        return getattr(self.client, name)
+
+    def table(self, table_name: str) -> InstrumentedQuery:
+        return InstrumentedQuery(self.client.table(table_name), table_name, self)
+
+    def from_(self, table_name: str) -> InstrumentedQuery:
+        return self.table(table_name)
+
+    def rpc(self, fn: str, params: Optional[dict] = None, **kwargs) -> InstrumentedQuery:
+        return InstrumentedQuery(self.client.rpc(fn, params or {}, **kwargs), f"rpc:{fn}", self)
+
+
+async def track_db_calls(request: Request, call_next):
+    """HTTP middleware attributing database calls to each request"""
+    stats = RequestDBStats()
+    token = _request_stats.set(stats)
+    deadline_token = start_deadline()
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        _request_stats.reset(token)
+        reset_deadline(deadline_token)
+    total = time.perf_counter() - started
+
+    response.headers["Server-Timing"] = stats.server_timing(total)
+
+    budget = settings.db_query_budget
+    over_budget = bool(budget) and stats.calls > budget
+    record = {
+        "event": "request_db_stats",
+        "method": request.method,
+        "path": request.url.path,
+        "status": response.status_code,
+        "db_calls": stats.calls,
+        "db_ms": round(stats.duration * 1000, 2),
+        "total_ms": round(total * 1000, 2),
+        "over_budget": over_budget,
+    }
+    if over_budget:
+        record["operations"] = {label: count for label, (count, _) in stats.operations.items()}
+        logger.warning(json.dumps(record))
+    else:
+        logger.info(json.dumps(record))
+    return response
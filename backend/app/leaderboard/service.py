@@ -1,6 +1,29 @@
 from typing import Optional
 from datetime import datetime, timedelta
-from app.database import supabase
+from app.database import supabase_read
+from app.cache import SingleFlightCache
+from app.config import get_settings
+
+settings = get_settings()
+
+# Donors ordered by points, shared by every leaderboard request
+leaderboard_cache = SingleFlightCache(
+    "leaderboard", settings.leaderboard_cache_ttl, settings.cache_max_stale
+)
+
+
+def _load_ranked_donors() -> list:
+    return supabase_read.table("users").select(
+        "id, full_name, points, total_donations, avatar_url"
+    ).eq("role", "donor").order("points", desc=True).execute().data
+
+
+async def get_donor_rank(points: int) -> int:
+    """Rank of a donor with ``points``: one more than the donors with more points"""
+    response = await supabase_read.table("users").select("id", count="exact").eq(
+        "role", "donor"
+    ).gt("points", points).limit(1).execute_async()
+    return (response.count or 0) + 1
 
 
 async def get_leaderboard(
@@ -9,11 +32,6 @@ async def get_leaderboard(
     current_user_id: Optional[str] = None
 ) -> dict:
     """Get donor leaderboard"""
-    # Get all donors ordered by points
-    query = supabase.table("users").select(
-        "id, full_name, points, total_donations, avatar_url"
-    ).eq("role", "donor").order("points", desc=True)
-    
     # Note: For period filtering, we'd need to aggregate from donations table
     # This is a simplified implementation
     if period == "week":
@@ -23,16 +41,20 @@ async def get_leaderboard(
         # In production, calculate points from last 30 days of donations
         pass
     
-    response = query.execute()
-    all_users = response.data
+    # Get all donors ordered by points
+    all_users = await leaderboard_cache.get_or_refresh("donors", _load_ranked_donors)
     
     # Build leaderboard with ranks
     leaderboard = []
     current_user_entry = None
     
+    rank = 0
     for idx, user in enumerate(all_users):
+        # Tied donors share a rank, as in get_donor_rank
+        if idx == 0 or user["points"] != all_users[idx - 1]["points"]:
+            rank = idx + 1
         entry = {
-            "rank": idx + 1,
+            "rank": rank,
             "user_id": user["id"],
             "name": user["full_name"],
             "points": user["points"],
@@ -48,7 +70,7 @@ async def get_leaderboard(
             leaderboard. append(entry)
     
     # If current user is not in top N, still include their entry separately
-    if current_user_entry and current_user_entry["rank"] > limit:
+    if current_user_entry and current_user_entry not in leaderboard:
         pass  # current_user_entry already set
     elif current_user_entry:
         # User is in top N, current_user_entry is already part of leaderboard
@@ -1,13 +1,66 @@
-from fastapi import FastAPI
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import get_settings
+from app.instrumentation import track_db_calls
+from app.metrics import MetricsMiddleware, collect as collect_metrics
+from app.admission import AdmissionMiddleware
+from app.resilience import DatabaseUnavailable, DeadlineExceeded
 from app.auth import router as auth_router
 from app.donations import router as donations_router
 from app.ngos import router as ngos_router
 from app.leaderboard import router as leaderboard_router
 from app.admin import router as admin_router
+from app.dashboard import router as dashboard_router
+from app.search import router as search_router
+from app.database import LAST_WRITE_HEADER, connect, ping_database, track_writes
+from app.ngos.service import get_ngos
+from app.leaderboard.service import get_leaderboard
+from app.donations.expiry import expire_stale_donations
+from app.donations.archive import archive_old_donations
+from app.admin.retention import enforce_activity_log_retention
+from app.scheduler import start_jobs, stop_jobs
 
 settings = get_settings()
+logger = logging.getLogger("app")
+
+
+async def warm_up(app: FastAPI) -> bool:
+    """Connect to the database and fill hot caches before taking traffic"""
+    try:
+        await run_in_threadpool(connect)
+        database = await run_in_threadpool(ping_database)
+        if not database["reachable"]:
+            logger.warning("Warm-up skipped, database unreachable: %s", database["error"])
+            return False
+        await get_ngos()
+        await get_leaderboard()
+    except Exception:
+        logger.exception("Warm-up failed")
+        return False
+    app.state.warmed_up = True
+    return True
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.warmed_up = False
+    await warm_up(app)
+    jobs = []
+    if settings.donation_expiry_enabled:
+        jobs.append(("donation_expiry", expire_stale_donations, settings.donation_expiry_interval))
+    if settings.donation_archive_enabled:
+        jobs.append(("donation_archive", archive_old_donations, settings.donation_archive_interval))
+    if settings.activity_log_retention_enabled:
+        jobs.append((
+            "activity_log_retention", enforce_activity_log_retention, settings.activity_log_retention_interval
+        ))
+    tasks = start_jobs(jobs)
+    yield
+    await stop_jobs(tasks)
 
 app = FastAPI(
     title=settings.app_name,
@@ -31,24 +84,61 @@ app = FastAPI(
     """,
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
-# CORS Middleware
+# Load shedding (runs inside the metrics below so shed requests are counted)
+if settings.admission_control_enabled:
+    app.add_middleware(AdmissionMiddleware)
+
+# Per-route request metrics (runs inside the DB call tracking below)
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
+# Last-write marker routing a client's reads to the primary after its writes
+app.middleware("http")(track_writes)
+
+# Per-request database call counting, Server-Timing header and query budget
+app.middleware("http")(track_db_calls)
+
+# CORS Middleware, added last so it wraps everything: responses produced by
+# the middleware above (429/503 from admission control) carry CORS headers
+# too, and preflights are answered before reaching them
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # In production, specify your frontend URL
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After", "ETag", "Idempotent-Replayed", LAST_WRITE_HEADER],
 )
 
+@app.exception_handler(DatabaseUnavailable)
+async def database_unavailable_handler(request: Request, exc: DatabaseUnavailable):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Database temporarily unavailable, try again later"},
+        headers={"Retry-After": str(max(1, round(settings.db_breaker_reset_timeout)))},
+    )
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    return JSONResponse(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        content={"detail": "The database took too long to answer"},
+    )
+
+
 # Include routers
 app.include_router(auth_router.router, prefix="/api")
 app.include_router(donations_router.router, prefix="/api")
 app.include_router(ngos_router.router, prefix="/api")
 app.include_router(leaderboard_router.router, prefix="/api")
 app.include_router(admin_router.router, prefix="/api")
+app.include_router(dashboard_router.router, prefix="/api")
+app.include_router(search_router.router, prefix="/api")
 
 
 @app.get("/")
@@ -62,4 +152,28 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness probe for load balancers.
+    
+    Ready once warm-up has completed and the database currently answers;
+    otherwise 503 (warm-up is retried on each probe until it succeeds).
+    """
+    if not getattr(app.state, "warmed_up", False):
+        await warm_up(app)
+    database = await run_in_threadpool(ping_database)
+    ready = app.state.warmed_up and database["reachable"]
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"status": "ready" if ready else "not_ready", "database": database},
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics in text exposition format"""
+    return PlainTextResponse(collect_metrics(), media_type="text/plain; version=0.0.4")
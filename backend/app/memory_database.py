@@ -0,0 +1,1270 @@
+"""
+In-memory stand-in for the Supabase client.
+
+Implements the subset of the PostgREST query builder used by the services
+(``table().select/insert/update/delete`` with filters, ordering and ranges,
+plus ``rpc()``) on top of plain Python dicts. Table defaults, unique and
+foreign key constraints and the helper functions from
+``supabase/migrations/001_initial_schema.sql`` are mirrored here so the whole
+API can run offline, e.g. for tests and benchmarks.
+"""
+import copy
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+from postgrest import APIError
+
+
+# Column defaults per table (mirrors the DEFAULT clauses in the migrations)
+TABLE_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "ngos": {
+        "phone": None,
+        "latitude": None,
+        "longitude": None,
+        "staff_count": 0,
+        "completed_pickups": 0,
+        "active_pickups": 0,
+    },
+    "users": {
+        "ngo_id": None,
+        "points": 0,
+        "total_donations": 0,
+        "active_donations": 0,
+        "avatar_url": None,
+    },
+    "donations": {
+        "image_url": None,
+        "status": "pending",
+        "points": 0,
+        "description": None,
+        "decline_reason": None,
+        "assigned_ngo_id": None,
+        "completed_by_staff_id": None,
+        "completed_at": None,
+        "version": 1,
+    },
+    "activity_log": {
+        "description": None,
+        "user_id": None,
+        "user_name": None,
+        "target_id": None,
+        "target_type": None,
+    },
+    "idempotency_keys": {
+        "state": "in_progress",
+        "response": None,
+    },
+    "donation_daily_stats": {
+        "ngo_id": None,
+        "donations_created": 0,
+        "donations_completed": 0,
+        "donations_declined": 0,
+        "servings_delivered": 0,
+        "points_awarded": 0,
+    },
+    "donations_archive": {
+        "image_url": None,
+        "description": None,
+        "decline_reason": None,
+        "assigned_ngo_id": None,
+        "completed_by_staff_id": None,
+        "completed_at": None,
+    },
+    "ngo_pickup_stats": {
+        "completed_pickups": 0,
+        "declined_pickups": 0,
+        "servings_delivered": 0,
+        "total_pickup_seconds": 0.0,
+    },
+    "staff_pickup_stats": {
+        "completed_pickups": 0,
+        "servings_delivered": 0,
+        "total_pickup_seconds": 0.0,
+        "last_completed_at": None,
+    },
+}
+
+# Tables that carry an updated_at column
+TIMESTAMPED_TABLES = {
+    "ngos", "users", "donations", "donation_daily_stats", "ngo_pickup_stats", "staff_pickup_stats",
+}
+
+# Tables whose version column is bumped by a BEFORE UPDATE trigger
+VERSIONED_TABLES = {"donations"}
+
+# Views over several tables (UNION ALL of their rows), read-only
+VIEWS: Dict[str, List[str]] = {
+    "all_donations": ["donations", "donations_archive"],
+}
+
+# Generated (computed) columns per table
+PRIORITY_RANKS = {"high": 0, "medium": 1, "low": 2}
+GENERATED_COLUMNS: Dict[str, Dict[str, Callable[[dict], Any]]] = {
+    "donations": {"priority_rank": lambda row: PRIORITY_RANKS.get(row.get("priority"), 2)},
+}
+
+# Unique constraints per table
+UNIQUE_COLUMNS: Dict[str, List[str]] = {
+    "ngos": ["email"],
+    "users": ["email"],
+    "idempotency_keys": ["key"],
+}
+
+# CHECK constraints per table
+CHECK_VALUES: Dict[str, Dict[str, List[str]]] = {
+    "users": {"role": ["donor", "staff", "admin"]},
+    "donations": {
+        "volume": ["small", "medium", "large"],
+        "priority": ["high", "medium", "low"],
+        "status": ["pending", "active", "completed", "declined"],
+    },
+}
+
+# (table, column, referenced table, on delete behaviour)
+FOREIGN_KEYS = [
+    ("users", "ngo_id", "ngos", "set_null"),
+    ("donations", "donor_id", "users", "cascade"),
+    ("donations", "assigned_ngo_id", "ngos", "set_null"),
+    ("donations", "completed_by_staff_id", "users", "set_null"),
+    ("activity_log", "user_id", "users", "set_null"),
+    ("donations_archive", "donor_id", "users", "cascade"),
+    ("donations_archive", "assigned_ngo_id", "ngos", "set_null"),
+    ("donations_archive", "completed_by_staff_id", "users", "set_null"),
+    ("ngo_pickup_stats", "ngo_id", "ngos", "cascade"),
+    ("staff_pickup_stats", "ngo_id", "ngos", "cascade"),
+    ("staff_pickup_stats", "staff_id", "users", "cascade"),
+]
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _resolve_value(value: Any) -> Any:
+    """Translate SQL expressions the services send as literal strings"""
+    if isinstance(value, str) and value.lower() in ("now()", "now"):
+        return _now()
+    return value
+
+
+def _split_columns(columns: str) -> List[str]:
+    """Split a PostgREST select string on top-level commas"""
+    parts, depth, current = [], 0, ""
+    for char in columns:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == "," and depth == 0:
+            parts.append(current.strip())
+            current = ""
+        else:
+            current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+# Embedded resource in a select list: [alias:]table(columns)
+_EMBED = re.compile(r"^(?:(\w+):)?(\w+)\((.*)\)$")
+
+_NO_KEY = object()
+
+
+class InMemoryResponse:
+    """Result of an executed query, shaped like ``postgrest.APIResponse``"""
+
+    __slots__ = ("data", "count")
+
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class _Descending:
+    """Wrapper inverting comparison so mixed asc/desc sorts can share one key"""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+class InMemoryStore:
+    """Thread-safe table storage shared by every in-memory client"""
+
+    def __init__(self):
+        self.tables: Dict[str, List[dict]] = {}
+        # Primary key index: table -> id -> row
+        self.primary: Dict[str, Dict[Any, dict]] = {}
+        self.lock = threading.RLock()
+        # Number of executed queries/RPCs, i.e. database round trips
+        self.round_trips = 0
+        # Fault injection: seconds added to each call, share of calls failing
+        self.latency = 0.0
+        self.failure_rate = 0.0
+        self.functions: Dict[str, Callable[["InMemoryStore", dict], Any]] = dict(RPC_FUNCTIONS)
+
+    def rows(self, table: str) -> List[dict]:
+        if table in VIEWS:
+            return [row for source in VIEWS[table] for row in self.rows(source)]
+        return self.tables.setdefault(table, [])
+
+    def get(self, table: str, key: Any) -> Optional[dict]:
+        if table in VIEWS:
+            return next((row for row in (self.get(source, key) for source in VIEWS[table]) if row), None)
+        return self.primary.get(table, {}).get(key)
+
+    def find(self, table: str, column: str, value: Any) -> Optional[dict]:
+        if column == "id":
+            return self.get(table, value)
+        for row in self.rows(table):
+            if row.get(column) == value:
+                return row
+        return None
+
+    def simulate_network(self):
+        """Apply the configured latency and random connection failures to a call"""
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise httpx.ConnectError("Injected connection failure")
+
+    def reset(self):
+        with self.lock:
+            self.tables.clear()
+            self.primary.clear()
+
+    # ---- constraint helpers -------------------------------------------------
+
+    def _check_row(self, table: str, row: dict, ignore: Optional[dict] = None):
+        for column, allowed in CHECK_VALUES.get(table, {}).items():
+            if column in row and row[column] not in allowed:
+                raise APIError({
+                    "code": "23514",
+                    "message": f'new row for relation "{table}" violates check constraint "{table}_{column}_check"',
+                })
+        for column in UNIQUE_COLUMNS.get(table, []):
+            value = row.get(column)
+            if value is None:
+                continue
+            for other in self.rows(table):
+                if other is not ignore and other.get(column) == value:
+                    raise APIError({
+                        "code": "23505",
+                        "message": f'duplicate key value violates unique constraint "{table}_{column}_key"',
+                        "details": f"Key ({column})=({value}) already exists.",
+                    })
+        for fk_table, column, ref_table, _ in FOREIGN_KEYS:
+            if fk_table != table or row.get(column) is None:
+                continue
+            if self.find(ref_table, "id", row[column]) is None:
+                raise APIError({
+                    "code": "23503",
+                    "message": f'insert or update on table "{table}" violates foreign key constraint "{table}_{column}_fkey"',
+                })
+
+    def insert(self, table: str, values: dict) -> dict:
+        row = dict(TABLE_DEFAULTS.get(table, {}))
+        row.update({key: _resolve_value(value) for key, value in values.items()})
+        row.setdefault("id", str(uuid.uuid4()))
+        row.setdefault("created_at", _now())
+        if table in TIMESTAMPED_TABLES:
+            row.setdefault("updated_at", row["created_at"])
+        for column, compute in GENERATED_COLUMNS.get(table, {}).items():
+            row[column] = compute(row)
+        self._check_row(table, row)
+        if self.get(table, row["id"]) is not None:
+            raise APIError({
+                "code": "23505",
+                "message": f'duplicate key value violates unique constraint "{table}_pkey"',
+            })
+        self.rows(table).append(row)
+        self.primary.setdefault(table, {})[row["id"]] = row
+        return row
+
+    def update(self, row: dict, table: str, values: dict) -> dict:
+        candidate = dict(row)
+        candidate.update({key: _resolve_value(value) for key, value in values.items()})
+        if table in VERSIONED_TABLES:
+            candidate["version"] = row.get("version", 1) + 1
+        for column, compute in GENERATED_COLUMNS.get(table, {}).items():
+            candidate[column] = compute(candidate)
+        self._check_row(table, candidate, ignore=row)
+        row.update(candidate)
+        return row
+
+    def delete(self, table: str, doomed: List[dict]):
+        doomed_ids = {id(row) for row in doomed}
+        self.tables[table] = [row for row in self.rows(table) if id(row) not in doomed_ids]
+        deleted_keys = {row.get("id") for row in doomed}
+        index = self.primary.get(table, {})
+        for key in deleted_keys:
+            index.pop(key, None)
+        for fk_table, column, ref_table, on_delete in FOREIGN_KEYS:
+            if ref_table != table:
+                continue
+            dependants = [row for row in self.rows(fk_table) if row.get(column) in deleted_keys]
+            if not dependants:
+                continue
+            if on_delete == "cascade":
+                self.delete(fk_table, dependants)
+            else:
+                for row in dependants:
+                    row[column] = None
+
+
+class InMemoryQueryBuilder:
+    """Chainable query mirroring the postgrest request builders"""
+
+    def __init__(self, store: InMemoryStore, table: str):
+        self._store = store
+        self._table = table
+        self._operation = "select"
+        self._columns = "*"
+        self._count: Optional[str] = None
+        self._payload: Any = None
+        self._on_conflict: Optional[str] = None
+        self._filters: List[Callable[[dict], bool]] = []
+        self._key: Any = _NO_KEY
+        self._orders: List[tuple] = []
+        self._limit: Optional[int] = None
+        self._offset = 0
+        self._single = False
+        self._maybe_single = False
+
+    # ---- operations ---------------------------------------------------------
+
+    def select(self, *columns: str, count: Optional[str] = None, **kwargs):
+        self._columns = ",".join(columns) if columns else "*"
+        self._count = count
+        return self
+
+    def insert(self, json: Any, count: Optional[str] = None, **kwargs):
+        self._operation = "insert"
+        self._payload = json
+        self._count = count
+        return self
+
+    def upsert(self, json: Any, on_conflict: str = "id", count: Optional[str] = None, **kwargs):
+        self._operation = "upsert"
+        self._payload = json
+        self._on_conflict = on_conflict or "id"
+        self._count = count
+        return self
+
+    def update(self, json: dict, count: Optional[str] = None, **kwargs):
+        self._operation = "update"
+        self._payload = json
+        self._count = count
+        return self
+
+    def delete(self, count: Optional[str] = None, **kwargs):
+        self._operation = "delete"
+        self._count = count
+        return self
+
+    # ---- filters ------------------------------------------------------------
+
+    def _where(self, predicate: Callable[[dict], bool]):
+        self._filters.append(predicate)
+        return self
+
+    def eq(self, column: str, value: Any):
+        if column == "id" and self._key is _NO_KEY:
+            self._key = value
+        return self._where(lambda row: row.get(column) is not None and row.get(column) == value)
+
+    def neq(self, column: str, value: Any):
+        return self._where(lambda row: row.get(column) is not None and row.get(column) != value)
+
+    def gt(self, column: str, value: Any):
+        return self._where(lambda row: row.get(column) is not None and row.get(column) > value)
+
+    def gte(self, column: str, value: Any):
+        return self._where(lambda row: row.get(column) is not None and row.get(column) >= value)
+
+    def lt(self, column: str, value: Any):
+        return self._where(lambda row: row.get(column) is not None and row.get(column) < value)
+
+    def lte(self, column: str, value: Any):
+        return self._where(lambda row: row.get(column) is not None and row.get(column) <= value)
+
+    def in_(self, column: str, values: List[Any]):
+        allowed = set(values)
+        return self._where(lambda row: row.get(column) in allowed)
+
+    def is_(self, column: str, value: Any):
+        if value in (None, "null"):
+            return self._where(lambda row: row.get(column) is None)
+        return self._where(lambda row: row.get(column) is value)
+
+    def ilike(self, column: str, pattern: str):
+        needle = pattern.lower()
+        parts = needle.split("%")
+
+        def matches(row: dict) -> bool:
+            value = row.get(column)
+            if value is None:
+                return False
+            text = str(value).lower()
+            if len(parts) == 1:
+                return text == needle
+            if not text.startswith(parts[0]) or not text.endswith(parts[-1]):
+                return False
+            position = len(parts[0])
+            for part in parts[1:-1]:
+                found = text.find(part, position)
+                if found < 0:
+                    return False
+                position = found + len(part)
+            return position <= len(text) - len(parts[-1])
+
+        return self._where(matches)
+
+    def match(self, query: Dict[str, Any]):
+        for column, value in query.items():
+            self.eq(column, value)
+        return self
+
+    # ---- modifiers ----------------------------------------------------------
+
+    def order(self, column: str, desc: bool = False, nullsfirst: Optional[bool] = None, **kwargs):
+        # Postgres puts NULLs last for ASC and first for DESC by default
+        if nullsfirst is None:
+            nullsfirst = desc
+        self._orders.append((column, desc, nullsfirst))
+        return self
+
+    def limit(self, size: int, **kwargs):
+        self._limit = size
+        return self
+
+    def offset(self, size: int):
+        self._offset = size
+        return self
+
+    def range(self, start: int, end: int, **kwargs):
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    def single(self):
+        self._single = True
+        return self
+
+    def maybe_single(self):
+        self._maybe_single = True
+        return self
+
+    # ---- execution ----------------------------------------------------------
+
+    def _matching(self) -> List[dict]:
+        if self._key is not _NO_KEY:
+            row = self._store.get(self._table, self._key)
+            candidates = [row] if row is not None else []
+        else:
+            candidates = self._store.rows(self._table)
+        return [row for row in candidates if all(f(row) for f in self._filters)]
+
+    def _sorted(self, rows: List[dict]) -> List[dict]:
+        if not self._orders:
+            return rows
+
+        def key(row: dict):
+            parts = []
+            for column, desc, nullsfirst in self._orders:
+                value = row.get(column)
+                null_rank = 0 if (value is None) == nullsfirst else 1
+                parts.append(null_rank)
+                parts.append(_Descending(value) if desc and value is not None else (value if value is not None else 0))
+            return parts
+
+        return sorted(rows, key=key)
+
+    def _project(self, row: dict, table: Optional[str] = None, columns: Optional[str] = None) -> dict:
+        table = table or self._table
+        columns = _split_columns(columns or self._columns)
+        if "*" in columns:
+            projected = copy.deepcopy(row)
+        else:
+            projected = {column: copy.deepcopy(row.get(column)) for column in columns if "(" not in column}
+        for column in columns:
+            embed = _EMBED.match(column)
+            if embed:
+                alias, target, inner = embed.groups()
+                projected[alias or target] = self._embed(row, table, target, inner)
+        return projected
+
+    def _embed(self, row: dict, table: str, target: str, columns: str) -> Optional[dict]:
+        """Many-to-one resource embedding through the foreign key to ``target``"""
+        key = next(
+            (column for source, column, referenced, _ in FOREIGN_KEYS if source == table and referenced == target),
+            None,
+        )
+        if key is None:
+            raise APIError({
+                "code": "PGRST200",
+                "message": f"Could not find a relationship between '{table}' and '{target}' in the schema cache",
+            })
+        referenced = self._store.get(target, row.get(key))
+        return self._project(referenced, target, columns) if referenced is not None else None
+
+    def execute(self) -> InMemoryResponse:
+        self._store.simulate_network()
+        with self._store.lock:
+            self._store.round_trips += 1
+            if self._operation == "insert":
+                payload = self._payload if isinstance(self._payload, list) else [self._payload]
+                rows = [self._store.insert(self._table, values) for values in payload]
+            elif self._operation == "upsert":
+                payload = self._payload if isinstance(self._payload, list) else [self._payload]
+                keys = [key.strip() for key in self._on_conflict.split(",")]
+                rows = []
+                for values in payload:
+                    existing = next(
+                        (row for row in self._store.rows(self._table)
+                         if all(row.get(k) == values.get(k) for k in keys)),
+                        None,
+                    )
+                    if existing is not None:
+                        rows.append(self._store.update(existing, self._table, values))
+                    else:
+                        rows.append(self._store.insert(self._table, values))
+            elif self._operation == "update":
+                rows = [self._store.update(row, self._table, self._payload) for row in self._matching()]
+            elif self._operation == "delete":
+                rows = self._matching()
+                self._store.delete(self._table, rows)
+            else:
+                rows = self._sorted(self._matching())
+
+            total = len(rows) if self._count else None
+            if self._operation == "select":
+                end = None if self._limit is None else self._offset + self._limit
+                rows = rows[self._offset:end]
+            data = [self._project(row) for row in rows]
+
+        if self._single or self._maybe_single:
+            if len(data) > 1 or (self._single and not data):
+                raise APIError({
+                    "code": "PGRST116",
+                    "message": "JSON object requested, multiple (or no) rows returned",
+                })
+            if not data:
+                return None
+            return InMemoryResponse(data=data[0], count=total)
+        return InMemoryResponse(data=data, count=total)
+
+
+class InMemoryRPCBuilder:
+    """Deferred call of a mirrored database function"""
+
+    def __init__(self, store: InMemoryStore, name: str, params: dict):
+        self._store = store
+        self._name = name
+        self._params = params or {}
+
+    def execute(self) -> InMemoryResponse:
+        self._store.simulate_network()
+        function = self._store.functions.get(self._name)
+        if function is None:
+            raise APIError({
+                "code": "PGRST202",
+                "message": f"Could not find the function public.{self._name} in the schema cache",
+            })
+        with self._store.lock:
+            self._store.round_trips += 1
+            result = function(self._store, self._params)
+        if result is None:
+            result = []
+        return InMemoryResponse(data=copy.deepcopy(result))
+
+
+class InMemoryClient:
+    """Drop-in replacement for ``supabase.Client`` backed by an InMemoryStore"""
+
+    def __init__(self, store: Optional[InMemoryStore] = None):
+        self.store = store or InMemoryStore()
+
+    def table(self, table_name: str) -> InMemoryQueryBuilder:
+        return InMemoryQueryBuilder(self.store, table_name)
+
+    def from_(self, table_name: str) -> InMemoryQueryBuilder:
+        return self.table(table_name)
+
+    def rpc(self, fn: str, params: Optional[dict] = None, **kwargs) -> InMemoryRPCBuilder:
+        return InMemoryRPCBuilder(self.store, fn, params or {})
+
+
+# =====================================================
+# HELPER FUNCTIONS FOR ATOMIC UPDATES
+# (Python mirrors of the plpgsql functions in the migrations)
+# =====================================================
+
+def _adjust(table: str, id_param: str, **changes: Callable[[int], int]):
+    def function(store: InMemoryStore, params: dict):
+        row = store.find(table, "id", params.get(id_param))
+        if row is None:
+            return None
+        for column, change in changes.items():
+            row[column] = change(row.get(column) or 0)
+        row["updated_at"] = _now()
+        return None
+    return function
+
+
+def _award_points_to_user(store: InMemoryStore, params: dict):
+    row = store.find("users", "id", params.get("user_id_param"))
+    if row is not None:
+        row["points"] = (row.get("points") or 0) + params.get("points_param", 0)
+        row["updated_at"] = _now()
+    return None
+
+
+# Statuses a donation may be in before moving to the key status
+_PREDECESSORS = {
+    "active": ["pending"],
+    "completed": ["active"],
+    "declined": ["pending", "active"],
+}
+
+
+def _bulk_update_donation_status(store: InMemoryStore, params: dict):
+    staff_id = params.get("staff_id_param")
+    staff_name = params.get("staff_name_param")
+    applied, results = [], []
+
+    for item in params.get("updates") or []:
+        target = item.get("status")
+        version = item.get("version")
+        row = store.get("donations", item.get("id"))
+        if row is None:
+            results.append({"id": item.get("id"), "result": "not_found"})
+            continue
+        if row["status"] in _PREDECESSORS.get(target, []) and (version is None or row["version"] == version):
+            values = {"status": target, "updated_at": _now()}
+            if target == "declined":
+                values["decline_reason"] = item.get("decline_reason")
+            if target == "completed":
+                values["completed_at"] = _now()
+                values["completed_by_staff_id"] = staff_id
+            store.update(row, "donations", values)
+            applied.append(row)
+            results.append({"id": row["id"], "result": "updated", "donation": dict(row)})
+        elif version is not None and row["version"] != version:
+            results.append({"id": item.get("id"), "result": "version_mismatch"})
+        else:
+            results.append({"id": item.get("id"), "result": "conflict", "current_status": row["status"]})
+
+    # Aggregated counter deltas, one adjustment per donor and per NGO
+    donors: Dict[str, list] = {}
+    ngos: Dict[str, list] = {}
+    for row in applied:
+        completed = row["status"] == "completed"
+        closed = row["status"] in ("completed", "declined")
+        donor = donors.setdefault(row["donor_id"], [0, 0, 0])
+        donor[0] += row["points"] if completed else 0
+        donor[1] += int(completed)
+        donor[2] += int(closed)
+        if row.get("assigned_ngo_id"):
+            ngo = ngos.setdefault(row["assigned_ngo_id"], [0, 0])
+            ngo[0] += int(completed)
+            ngo[1] += int(closed)
+
+    for donor_id, (points, completed, closed) in donors.items():
+        user = store.get("users", donor_id)
+        if user is not None and closed:
+            user["points"] += points
+            user["total_donations"] += completed
+            user["active_donations"] = max(user["active_donations"] - closed, 0)
+            user["updated_at"] = _now()
+    for ngo_id, (completed, closed) in ngos.items():
+        ngo = store.get("ngos", ngo_id)
+        if ngo is not None and closed:
+            ngo["active_pickups"] = max(ngo["active_pickups"] - closed, 0)
+            ngo["completed_pickups"] += completed
+            ngo["updated_at"] = _now()
+
+    _record_donation_events(store, {"events": [
+        {"event": row["status"], "donation": row}
+        for row in applied if row["status"] in ("completed", "declined")
+    ]})
+
+    for row in applied:
+        description = f"Donation {row['status']}"
+        if row["status"] == "completed":
+            description = f"Donation completed!  Donor awarded {row['points']} points."
+        store.insert("activity_log", {
+            "action": f"donation_{row['status']}",
+            "description": description,
+            "user_id": staff_id,
+            "user_name": staff_name,
+            "target_id": row["id"],
+            "target_type": "donation",
+        })
+
+    return results
+
+
+def _parse_timestamp(timestamp: str) -> datetime:
+    """Parse a timestamptz value; naive values are taken as UTC"""
+    moment = datetime.fromisoformat(timestamp)
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+def _utc_day(timestamp: str) -> str:
+    return _parse_timestamp(timestamp).date().isoformat()
+
+
+# Rollup counters per event, and the donation timestamp giving its day
+_EVENT_COLUMNS = {
+    "created": ("created_at", "donations_created"),
+    "completed": ("completed_at", "donations_completed"),
+    "declined": ("updated_at", "donations_declined"),
+}
+_ROLLUP_COLUMNS = [
+    "donations_created", "donations_completed", "donations_declined",
+    "servings_delivered", "points_awarded",
+]
+
+
+def _record_donation_events(store: InMemoryStore, params: dict):
+    rollups = {(row["day"], row["ngo_id"]): row for row in store.rows("donation_daily_stats")}
+    for event in params.get("events") or []:
+        donation = event["donation"]
+        timestamp_column, counter = _EVENT_COLUMNS[event["event"]]
+        key = (_utc_day(donation[timestamp_column]), donation.get("assigned_ngo_id"))
+        row = rollups.get(key)
+        if row is None:
+            row = rollups[key] = store.insert("donation_daily_stats", {"day": key[0], "ngo_id": key[1]})
+        row[counter] += 1
+        if event["event"] == "completed":
+            row["servings_delivered"] += donation["volume_servings"]
+            row["points_awarded"] += donation["points"]
+        row["updated_at"] = _now()
+    _record_pickup_stats(store, params)
+    return None
+
+
+def _record_pickup_stats(store: InMemoryStore, params: dict):
+    ngo_totals = {row["ngo_id"]: row for row in store.rows("ngo_pickup_stats")}
+    staff_totals = {(row["ngo_id"], row["staff_id"]): row for row in store.rows("staff_pickup_stats")}
+    for event in params.get("events") or []:
+        donation = event["donation"]
+        ngo_id = donation.get("assigned_ngo_id")
+        if event["event"] not in ("completed", "declined") or ngo_id is None:
+            continue
+        ngo = ngo_totals.get(ngo_id)
+        if ngo is None:
+            ngo = ngo_totals[ngo_id] = store.insert("ngo_pickup_stats", {"ngo_id": ngo_id})
+        ngo["updated_at"] = _now()
+        if event["event"] == "declined":
+            ngo["declined_pickups"] += 1
+            continue
+
+        completed_at = _parse_timestamp(donation["completed_at"])
+        seconds = (completed_at - _parse_timestamp(donation["created_at"])).total_seconds()
+        ngo["completed_pickups"] += 1
+        ngo["servings_delivered"] += donation["volume_servings"]
+        ngo["total_pickup_seconds"] += seconds
+
+        staff_id = donation.get("completed_by_staff_id")
+        if staff_id is None:
+            continue
+        staff = staff_totals.get((ngo_id, staff_id))
+        if staff is None:
+            staff = staff_totals[(ngo_id, staff_id)] = store.insert(
+                "staff_pickup_stats", {"ngo_id": ngo_id, "staff_id": staff_id}
+            )
+        staff["completed_pickups"] += 1
+        staff["servings_delivered"] += donation["volume_servings"]
+        staff["total_pickup_seconds"] += seconds
+        if staff["last_completed_at"] is None or _parse_timestamp(staff["last_completed_at"]) < completed_at:
+            staff["last_completed_at"] = completed_at.isoformat()
+        staff["updated_at"] = _now()
+    return None
+
+
+def _donation_stats_by_day(store: InMemoryStore, params: dict):
+    start, end = params["start_day_param"], params["end_day_param"]
+    ngo_id = params.get("ngo_id_param")
+    days: Dict[str, dict] = {}
+    for row in store.rows("donation_daily_stats"):
+        if not start <= row["day"] <= end or (ngo_id is not None and row["ngo_id"] != ngo_id):
+            continue
+        day = days.setdefault(row["day"], {"day": row["day"], **{column: 0 for column in _ROLLUP_COLUMNS}})
+        for column in _ROLLUP_COLUMNS:
+            day[column] += row[column]
+    return [days[day] for day in sorted(days)]
+
+
+def _expire_pending_donations(store: InMemoryStore, params: dict):
+    cutoffs = {
+        priority: params.get(f"{priority}_cutoff_param") for priority in ("high", "medium", "low")
+    }
+    stale = sorted(
+        (
+            row for row in store.rows("donations")
+            if row["status"] == "pending"
+            and cutoffs.get(row["priority"]) is not None
+            and _parse_timestamp(row["created_at"]) < _parse_timestamp(cutoffs[row["priority"]])
+        ),
+        key=lambda row: row["created_at"],
+    )[:params["batch_size_param"]]
+    if not stale:
+        return 0
+
+    for row in stale:
+        store.update(row, "donations", {
+            "status": "declined", "decline_reason": params["reason_param"], "updated_at": _now(),
+        })
+    for table, column, id_column in (
+        ("users", "active_donations", "donor_id"), ("ngos", "active_pickups", "assigned_ngo_id"),
+    ):
+        closed: Dict[str, int] = {}
+        for row in stale:
+            if row.get(id_column):
+                closed[row[id_column]] = closed.get(row[id_column], 0) + 1
+        for key, count in closed.items():
+            target = store.get(table, key)
+            if target is not None:
+                target[column] = max(target[column] - count, 0)
+                target["updated_at"] = _now()
+
+    _record_donation_events(store, {"events": [{"event": "declined", "donation": row} for row in stale]})
+    store.insert("activity_log", {
+        "action": "donations_expired",
+        "description": f"{len(stale)} pending donations expired",
+        "target_type": "donation",
+    })
+    return len(stale)
+
+
+def _archive_donations(store: InMemoryStore, params: dict):
+    cutoff = _parse_timestamp(params["cutoff_param"])
+    doomed = sorted(
+        (
+            row for row in store.rows("donations")
+            if row["status"] in ("completed", "declined") and _parse_timestamp(row["created_at"]) < cutoff
+        ),
+        key=lambda row: row["created_at"],
+    )[:params["batch_size_param"]]
+    store.delete("donations", doomed)
+    for row in doomed:
+        store.insert("donations_archive", {**row, "archived_at": _now()})
+    return len(doomed)
+
+
+def _donation_status_counts(store: InMemoryStore, params: dict):
+    donor_id = params.get("donor_id_param")
+    tables = ["donations", "donations_archive"] if params.get("include_archived_param") else ["donations"]
+    groups: Dict[str, dict] = {}
+    for table in tables:
+        for row in store.rows(table):
+            if donor_id is not None and row["donor_id"] != donor_id:
+                continue
+            group = groups.setdefault(row["status"], {"status": row["status"], "donations": 0, "points": 0})
+            group["donations"] += 1
+            group["points"] += row["points"]
+    return list(groups.values())
+
+
+# Activity log partitions are implicit here: one per month holding rows
+def _activity_log_month(row: dict) -> str:
+    return _parse_timestamp(row["created_at"]).strftime("%Y-%m-01")
+
+
+def _ensure_activity_log_partitions(store: InMemoryStore, params: dict):
+    return None
+
+
+def _list_activity_log_partitions(store: InMemoryStore, params: dict):
+    months = sorted({_activity_log_month(row) for row in store.rows("activity_log")})
+    return [
+        {"partition_name": f"activity_log_y{month[:4]}m{month[5:7]}", "month": month}
+        for month in months
+    ]
+
+
+def _drop_activity_log_partition(store: InMemoryStore, params: dict):
+    doomed = [row for row in store.rows("activity_log") if _activity_log_month(row) == params["month_param"]]
+    store.delete("activity_log", doomed)
+    return bool(doomed)
+
+
+# pg_trgm: trigrams of each lowercased word padded with two leading and one
+# trailing space; `query <% text` holds at a word similarity of 0.6
+_WORD = re.compile(r"[^\W_]+")
+WORD_SIMILARITY_THRESHOLD = 0.6
+
+
+def _trigrams(text: Optional[str]) -> set:
+    grams = set()
+    for word in _WORD.findall((text or "").lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _word_similarity(query: str, text: Optional[str]) -> float:
+    """Share of the query's trigrams found in text (approximates pg_trgm word_similarity)"""
+    wanted = _trigrams(query)
+    return len(wanted & _trigrams(text)) / len(wanted) if wanted else 0.0
+
+
+def _search_candidates(store: InMemoryStore, params: dict):
+    """(kind, row) for the kinds and donation filters in params"""
+    kinds = params.get("kinds_param") or []
+    statuses = params.get("statuses_param")
+    donor_id = params.get("donor_id_param")
+    if "donation" in kinds:
+        for row in store.rows("donations"):
+            if (statuses is None or row["status"] in statuses) and (donor_id is None or row["donor_id"] == donor_id):
+                yield "donation", row
+    if "ngo" in kinds:
+        for row in store.rows("ngos"):
+            yield "ngo", row
+    if "user" in kinds:
+        for row in store.rows("users"):
+            yield "user", row
+
+
+_SEARCH_COLUMNS = {
+    "donation": ("donor_name", "address", ["address", "description", "donor_name"]),
+    "ngo": ("name", "address", ["name", "address", "email"]),
+    "user": ("full_name", "role", ["full_name"]),
+}
+_AUTOCOMPLETE_COLUMNS = {"donation": "address", "ngo": "name", "user": "full_name"}
+
+
+def _search_entities(store: InMemoryStore, params: dict):
+    query = params["query_param"]
+    results = []
+    for kind, row in _search_candidates(store, params):
+        title, subtitle, columns = _SEARCH_COLUMNS[kind]
+        score = max(_word_similarity(query, row.get(column)) for column in columns)
+        if score >= WORD_SIMILARITY_THRESHOLD:
+            results.append({
+                "kind": kind, "id": row["id"], "title": row[title], "subtitle": row[subtitle], "score": score,
+            })
+    results.sort(key=lambda r: (-r["score"], r["title"], r["id"]))
+    offset = params.get("offset_param", 0)
+    return results[offset:offset + params.get("limit_param", 20)]
+
+
+def _search_autocomplete(store: InMemoryStore, params: dict):
+    prefix = params["prefix_param"].lower()
+    results = []
+    for kind, row in _search_candidates(store, params):
+        label = row[_AUTOCOMPLETE_COLUMNS[kind]]
+        if label.lower().startswith(prefix) or f" {prefix}" in label.lower():
+            results.append({"kind": kind, "id": row["id"], "label": label})
+    results.sort(key=lambda r: (len(r["label"]), r["label"], r["id"]))
+    return results[:params.get("limit_param", 10)]
+
+
+def _pickup_queue_changes(store: InMemoryStore, params: dict):
+    after = (_parse_timestamp(params["after_updated_at_param"]), params["after_id_param"])
+    changed = sorted(
+        (
+            row for row in store.rows("donations")
+            if row.get("assigned_ngo_id") == params["ngo_id_param"]
+            and (_parse_timestamp(row["updated_at"]), row["id"]) > after
+        ),
+        key=lambda row: (_parse_timestamp(row["updated_at"]), row["id"]),
+    )
+    return changed[:params["limit_param"]]
+
+
+def _pickup_queue_page(store: InMemoryStore, params: dict):
+    after = (
+        params["after_priority_rank_param"],
+        _parse_timestamp(params["after_created_at_param"]),
+        params["after_id_param"],
+    )
+    pending = sorted(
+        (
+            row for row in store.rows("donations")
+            if row.get("assigned_ngo_id") == params["ngo_id_param"] and row["status"] == "pending"
+            and (row["priority_rank"], _parse_timestamp(row["created_at"]), row["id"]) > after
+        ),
+        key=lambda row: (row["priority_rank"], _parse_timestamp(row["created_at"]), row["id"]),
+    )
+    return pending[:params["limit_param"]]
+
+
+def _cluster_donations(store: InMemoryStore, params: dict):
+    cell_size = params["cell_size_param"]
+    cells: Dict[tuple, dict] = {}
+    for row in store.rows("donations"):
+        lat, lng = row.get("latitude"), row.get("longitude")
+        if row["status"] not in ("pending", "active") or lat is None or lng is None:
+            continue
+        if not (params["min_lat_param"] <= lat < params["max_lat_param"]
+                and params["min_lng_param"] <= lng < params["max_lng_param"]):
+            continue
+        key = (math.floor(lng / cell_size), math.floor(lat / cell_size))
+        cell = cells.get(key)
+        if cell is None:
+            cell = cells[key] = {
+                "cell_x": key[0], "cell_y": key[1], "count": 0, "volume_servings": 0,
+                "priority_rank": 2, "lat_sum": 0.0, "lng_sum": 0.0,
+            }
+        cell["count"] += 1
+        cell["volume_servings"] += row["volume_servings"]
+        cell["priority_rank"] = min(cell["priority_rank"], row["priority_rank"])
+        cell["lat_sum"] += lat
+        cell["lng_sum"] += lng
+
+    ranked_priorities = sorted(PRIORITY_RANKS, key=PRIORITY_RANKS.get)
+    return [
+        {
+            "cell_x": cell["cell_x"],
+            "cell_y": cell["cell_y"],
+            "count": cell["count"],
+            "volume_servings": cell["volume_servings"],
+            "highest_priority": ranked_priorities[cell["priority_rank"]],
+            "latitude": cell["lat_sum"] / cell["count"],
+            "longitude": cell["lng_sum"] / cell["count"],
+        }
+        for cell in cells.values()
+    ]
+
+
+def _register_user_tx(store: InMemoryStore, params: dict):
+    role = params["role_param"]
+    ngo_id = params.get("ngo_id_param") if role == "staff" else None
+    if role == "staff" and ngo_id is None:
+        raise APIError({"code": "23502", "message": "Staff registration requires an NGO ID"})
+
+    # Constraint checks run before the row is stored, so a failure writes nothing
+    user = store.insert("users", {
+        "email": params["email_param"],
+        "full_name": params["full_name_param"],
+        "password_hash": params["password_hash_param"],
+        "role": role,
+        "ngo_id": ngo_id,
+        "points": 0,
+        "total_donations": 0,
+        "active_donations": 0,
+    })
+    ngo_name = None
+    if ngo_id is not None:
+        ngo = store.get("ngos", ngo_id)
+        ngo["staff_count"] = (ngo.get("staff_count") or 0) + 1
+        ngo["updated_at"] = _now()
+        ngo_name = ngo["name"]
+    store.insert("activity_log", {
+        "action": "user_registered",
+        "description": f"New {role} signup",
+        "user_id": user["id"],
+        "user_name": user["full_name"],
+    })
+    return {**{key: value for key, value in user.items() if key != "password_hash"}, "ngo_name": ngo_name}
+
+
+def _create_donation_tx(store: InMemoryStore, params: dict):
+    donor = store.get("users", params["donor_id_param"])
+    if donor is None:
+        raise APIError({"code": "P0002", "message": "Donor not found"})
+    ngos = store.rows("ngos")
+    ngo = ngos[0] if ngos else None
+
+    # Constraint checks run before the row is stored, so a failure writes nothing
+    donation = store.insert("donations", {
+        "donor_id": donor["id"],
+        "donor_name": donor["full_name"],
+        "image_url": params.get("image_url_param"),
+        "address": params["address_param"],
+        "latitude": params["latitude_param"],
+        "longitude": params["longitude_param"],
+        "volume": params["volume_param"],
+        "volume_servings": params["volume_servings_param"],
+        "priority": params["priority_param"],
+        "status": "pending",
+        "points": params["points_param"],
+        "description": params.get("description_param"),
+        "assigned_ngo_id": ngo["id"] if ngo else None,
+    })
+    donor["active_donations"] = (donor.get("active_donations") or 0) + 1
+    donor["updated_at"] = _now()
+    if ngo is not None:
+        ngo["active_pickups"] = (ngo.get("active_pickups") or 0) + 1
+        ngo["updated_at"] = _now()
+    _record_donation_events(store, {"events": [{"event": "created", "donation": donation}]})
+    store.insert("activity_log", {
+        "action": "donation_created",
+        "description": "New donation created",
+        "user_id": donor["id"],
+        "user_name": donor["full_name"],
+        "target_id": donation["id"],
+        "target_type": "donation",
+    })
+    return donation
+
+
+def _distance_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance (haversine)"""
+    a = (math.sin(math.radians(lat2 - lat1) / 2) ** 2
+         + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2))
+         * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * 6371 * math.asin(math.sqrt(a))
+
+
+_NGO_SORT_COLUMNS = {"created_at": "created_at", "name": "name", "load": "active_pickups", "distance": "distance_km"}
+
+
+def _list_ngos(store: InMemoryStore, params: dict):
+    search = (params.get("search_param") or "").lower()
+    min_active, max_active = params.get("min_active_param"), params.get("max_active_param")
+    lat, lng, radius = params.get("lat_param"), params.get("lng_param"), params.get("radius_km_param")
+
+    matched = []
+    for row in store.rows("ngos"):
+        if search and not any(search in (row.get(column) or "").lower() for column in ("name", "email", "address")):
+            continue
+        if min_active is not None and row["active_pickups"] < min_active:
+            continue
+        if max_active is not None and row["active_pickups"] > max_active:
+            continue
+        located = None not in (lat, lng, row.get("latitude"), row.get("longitude"))
+        distance = _distance_km(lat, lng, row["latitude"], row["longitude"]) if located else None
+        if radius is not None and (distance is None or distance > radius):
+            continue
+        matched.append({**row, "distance_km": distance})
+
+    column = _NGO_SORT_COLUMNS.get(params.get("sort_param", "created_at"), "created_at")
+    matched.sort(key=lambda row: row["id"])
+    # NULLs (no distance without coordinates) sort last either way
+    ordered = sorted(
+        (row for row in matched if row[column] is not None),
+        key=lambda row: row[column], reverse=params.get("descending_param", True),
+    )
+    matched = ordered + [row for row in matched if row[column] is None]
+    offset = params.get("offset_param", 0)
+    page = matched[offset:offset + params.get("limit_param", 20)]
+
+    since = params.get("staff_active_since_param")
+    since = _parse_timestamp(since) if since else None
+    last_completed = {
+        (stats["ngo_id"], stats["staff_id"]): stats.get("last_completed_at")
+        for stats in store.rows("staff_pickup_stats")
+    }
+    ngo_ids = {row["id"] for row in page}
+    staff_totals = dict.fromkeys(ngo_ids, 0)
+    staff_active = dict.fromkeys(ngo_ids, 0)
+    for user in store.rows("users"):
+        ngo_id = user.get("ngo_id")
+        if user["role"] != "staff" or ngo_id not in ngo_ids:
+            continue
+        staff_totals[ngo_id] += 1
+        completed_at = last_completed.get((ngo_id, user["id"]))
+        if since is not None and completed_at and _parse_timestamp(completed_at) >= since:
+            staff_active[ngo_id] += 1
+
+    return [
+        {
+            **{key: value for key, value in row.items() if key != "updated_at"},
+            "staff_total": staff_totals[row["id"]],
+            "staff_active": staff_active[row["id"]],
+            "total_count": len(matched),
+        }
+        for row in page
+    ]
+
+
+RPC_FUNCTIONS: Dict[str, Callable[[InMemoryStore, dict], Any]] = {
+    "increment_user_active_donations": _adjust(
+        "users", "user_id_param", active_donations=lambda v: v + 1
+    ),
+    "decrement_user_active_donations": _adjust(
+        "users", "user_id_param", active_donations=lambda v: max(v - 1, 0)
+    ),
+    "increment_user_total_donations": _adjust(
+        "users", "user_id_param", total_donations=lambda v: v + 1
+    ),
+    "award_points_to_user": _award_points_to_user,
+    "increment_ngo_staff_count": _adjust(
+        "ngos", "ngo_id_param", staff_count=lambda v: v + 1
+    ),
+    "decrement_ngo_staff_count": _adjust(
+        "ngos", "ngo_id_param", staff_count=lambda v: max(v - 1, 0)
+    ),
+    "increment_ngo_active_pickups": _adjust(
+        "ngos", "ngo_id_param", active_pickups=lambda v: v + 1
+    ),
+    "decrement_ngo_active_pickups": _adjust(
+        "ngos", "ngo_id_param", active_pickups=lambda v: max(v - 1, 0)
+    ),
+    "complete_ngo_pickup": _adjust(
+        "ngos", "ngo_id_param",
+        active_pickups=lambda v: max(v - 1, 0),
+        completed_pickups=lambda v: v + 1,
+    ),
+    "bulk_update_donation_status": _bulk_update_donation_status,
+    "cluster_donations": _cluster_donations,
+    "pickup_queue_changes": _pickup_queue_changes,
+    "pickup_queue_page": _pickup_queue_page,
+    "record_donation_events": _record_donation_events,
+    "record_pickup_stats": _record_pickup_stats,
+    "donation_stats_by_day": _donation_stats_by_day,
+    "expire_pending_donations": _expire_pending_donations,
+    "archive_donations": _archive_donations,
+    "donation_status_counts": _donation_status_counts,
+    "ensure_activity_log_partitions": _ensure_activity_log_partitions,
+    "list_activity_log_partitions": _list_activity_log_partitions,
+    "drop_activity_log_partition": _drop_activity_log_partition,
+    "search_entities": _search_entities,
+    "search_autocomplete": _search_autocomplete,
+    "list_ngos": _list_ngos,
+    "register_user_tx": _register_user_tx,
+    "create_donation_tx": _create_donation_tx,
+}
+
+
+# =====================================================
+# SEED DATA (mirrors the migration seed rows)
+# =====================================================
+
+DEFAULT_ADMIN = {
+    "email": "admin@fooddonation.org",
+    "full_name": "Admin User",
+    "password_hash": "$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/X4.G0S9K8XhXwK8Hy",
+    "role": "admin",
+}
+
+DEFAULT_NGOS = [
+    {"name": "Green Hands Foundation", "address": "123 Main St, Tirupati", "email": "contact@greenhands.org",
+     "phone": "+91 98765 43210", "latitude": 13.6288, "longitude": 79.4192},
+    {"name": "Hope Kitchen", "address": "456 Oak Ave, Tirupati", "email": "info@hopekitchen.org",
+     "phone": "+91 98765 43211", "latitude": 13.6350, "longitude": 79.4250},
+    {"name": "Food For All Trust", "address": "789 Temple Road, Tirupati", "email": "help@foodforall.org",
+     "phone": "+91 98765 43212", "latitude": 13.6200, "longitude": 79.4100},
+]
+
+
+def seed_defaults(client: InMemoryClient):
+    """Insert the default admin and sample NGOs from the initial migration"""
+    store = client.store
+    with store.lock:
+        if store.find("users", "email", DEFAULT_ADMIN["email"]) is None:
+            store.insert("users", DEFAULT_ADMIN)
+        for ngo in DEFAULT_NGOS:
+            if store.find("ngos", "email", ngo["email"]) is None:
+                store.insert("ngos", ngo)
@@ -0,0 +1,364 @@
+"""
+Prometheus-style metrics.
+
+A small dependency-free registry of counters, gauges and histograms rendered
+in the Prometheus text exposition format at ``/metrics``. Label values are
+resolved once to a pre-allocated child series (histogram buckets included),
+so recording a request only does a dict lookup on a tuple and a few integer
+increments.
+
+With several worker processes, set ``metrics_dir`` to a directory shared by
+the workers: each one periodically writes a snapshot there and ``/metrics``
+aggregates the snapshots of all live workers.
+"""
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from contextlib import suppress
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+from app.config import get_settings
+from app.instrumentation import current_db_stats
+
+settings = get_settings()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+DB_CALL_BUCKETS = (0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 30)
+DB_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric(ABC):
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values: str):
+        """Child series for the given label values (created once, then reused)"""
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    @abstractmethod
+    def _new_child(self):
+        """A new series of this metric"""
+
+    def snapshot(self) -> dict:
+        return {
+            "type": self.type,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "series": [[list(values), child.snapshot()] for values, child in self._children.items()],
+        }
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+    def snapshot(self) -> float:
+        return self.value
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # One slot per bucket plus +Inf, non-cumulative
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def snapshot(self) -> dict:
+        return {"counts": list(self.counts), "sum": self.sum}
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def snapshot(self) -> dict:
+        data = super().snapshot()
+        data["buckets"] = list(self.buckets)
+        return data
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self) -> Dict[str, dict]:
+        return {metric.name: metric.snapshot() for metric in self.metrics}
+
+
+def merge_snapshots(snapshots: List[Dict[str, dict]]) -> Dict[str, dict]:
+    """Sum counters, gauges and histogram buckets across worker snapshots"""
+    merged: Dict[str, dict] = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, "series": {}})
+            for values, data in metric["series"]:
+                key = tuple(values)
+                current = target["series"].get(key)
+                if metric["type"] == "histogram":
+                    if current is None:
+                        target["series"][key] = {"counts": list(data["counts"]), "sum": data["sum"]}
+                    else:
+                        current["counts"] = [a + b for a, b in zip(current["counts"], data["counts"])]
+                        current["sum"] += data["sum"]
+                else:
+                    target["series"][key] = (current or 0.0) + data
+    for metric in merged.values():
+        metric["series"] = [[list(key), data] for key, data in metric["series"].items()]
+    return merged
+
+
+def render_snapshot(snapshot: Dict[str, dict]) -> str:
+    """Render a snapshot in the Prometheus text exposition format"""
+    lines = []
+    for name, metric in snapshot.items():
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        labelnames = metric["labelnames"]
+        for values, data in metric["series"]:
+            if metric["type"] != "histogram":
+                lines.append(f"{name}{_format_labels(labelnames, values)} {_format_value(data)}")
+                continue
+            cumulative = 0
+            bounds = list(metric["buckets"]) + [float("inf")]
+            for bound, count in zip(bounds, data["counts"]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{name}_bucket{_format_labels(labelnames, values, le)} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labelnames, values)} {_format_value(data['sum'])}")
+            lines.append(f"{name}_count{_format_labels(labelnames, values)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+# =====================================================
+# APPLICATION METRICS
+# =====================================================
+
+REGISTRY = Registry()
+
+http_requests_total = REGISTRY.counter(
+    "app_http_requests_total", "HTTP requests served", ("method", "route", "status")
+)
+http_request_duration = REGISTRY.histogram(
+    "app_http_request_duration_seconds", "HTTP request latency", ("method", "route")
+)
+http_requests_in_flight = REGISTRY.gauge(
+    "app_http_requests_in_flight", "HTTP requests currently being served"
+).labels()
+db_calls_per_request = REGISTRY.histogram(
+    "app_db_calls_per_request", "Database calls issued per HTTP request", ("method", "route"),
+    buckets=DB_CALL_BUCKETS,
+)
+db_time_per_request = REGISTRY.histogram(
+    "app_db_time_per_request_seconds", "Time spent in database calls per HTTP request",
+    ("method", "route"), buckets=DB_TIME_BUCKETS,
+)
+cache_requests_total = REGISTRY.counter(
+    "app_cache_requests_total", "Cache lookups by outcome", ("cache", "result")
+)
+
+
+def record_cache(cache: str, hit: bool):
+    """Count a cache lookup; hit ratios are derived from hit/miss counts"""
+    cache_requests_total.labels(cache, "hit" if hit else "miss").inc()
+
+
+# =====================================================
+# MULTI-WORKER AGGREGATION
+# =====================================================
+
+_last_flush = 0.0
+
+
+def _snapshot_path(pid: int) -> str:
+    return os.path.join(settings.metrics_dir, f"metrics-{pid}.json")
+
+
+def flush_snapshot(force: bool = False):
+    """Write this worker's snapshot to the shared metrics directory"""
+    global _last_flush
+    if not settings.metrics_dir:
+        return
+    now = time.monotonic()
+    if not force and now - _last_flush < settings.metrics_flush_interval:
+        return
+    _last_flush = now
+    os.makedirs(settings.metrics_dir, exist_ok=True)
+    path = _snapshot_path(os.getpid())
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(REGISTRY.snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect() -> str:
+    """Metrics text for this process, or for all workers if metrics_dir is set"""
+    if not settings.metrics_dir:
+        return render_snapshot(REGISTRY.snapshot())
+
+    flush_snapshot(force=True)
+    snapshots = []
+    for filename in os.listdir(settings.metrics_dir):
+        if not (filename.startswith("metrics-") and filename.endswith(".json")):
+            continue
+        try:
+            pid = int(filename[len("metrics-"):-len(".json")])
+        except ValueError:
+            continue
+        path = os.path.join(settings.metrics_dir, filename)
+        if not _pid_alive(pid):
+            # Another worker may be removing it at the same time
+            with suppress(FileNotFoundError):
+                os.remove(path)
+            continue
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return render_snapshot(merge_snapshots(snapshots))
+
+
+# =====================================================
+# MIDDLEWARE
+# =====================================================
+
+def route_template(scope) -> str:
+    """Matched route as a template (``/donations/{donation_id}``) to keep label cardinality bounded"""
+    route = scope.get("route")
+    if route is None or not hasattr(route, "path"):
+        return "unmatched"
+    # The path the route was declared with: it includes its router's prefix
+    # but not the "/api" every router is mounted under
+    return route.path
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route request metrics"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec()
+
+            route_path = route_template(scope)
+            method = scope["method"]
+
+            http_requests_total.labels(method, route_path, str(status_code)).inc()
+            http_request_duration.labels(method, route_path).observe(elapsed)
+            db_stats = current_db_stats()
+            if db_stats is not None:
+                db_calls_per_request.labels(method, route_path).observe(db_stats.calls)
+                db_time_per_request.labels(method, route_path).observe(db_stats.duration)
+            flush_snapshot()
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List, Literal
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
 
 
@@ -116,6 +116,7 @@ class DonationResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
     completed_at: Optional[datetime] = None
+    version: int = 1
 
     class Config:
         from_attributes = True
@@ -126,12 +127,43 @@ class DonationStatusUpdate(BaseModel):
     decline_reason: Optional[str] = None
 
 
+class BulkStatusUpdateItem(DonationStatusUpdate):
+    donation_id: str
+    # Expected donation version (the ETag value), like If-Match on single updates
+    version: Optional[int] = None
+
+
+class BulkStatusUpdate(BaseModel):
+    updates: List[BulkStatusUpdateItem] = Field(..., min_length=1, max_length=100)
+
+
+class BulkStatusUpdateResult(BaseModel):
+    donation_id: str
+    status_code: int
+    detail: Optional[str] = None
+    donation: Optional[DonationResponse] = None
+
+
+class BulkStatusUpdateResponse(BaseModel):
+    results: List[BulkStatusUpdateResult]
+    updated: int
+    failed: int
+
+
 class DonationListResponse(BaseModel):
     donations: List[DonationResponse]
     pagination: dict
     counts: dict
 
 
+class PickupQueueResponse(BaseModel):
+    donations: List[DonationResponse]
+    removed: List[str] = []
+    cursor: Optional[str] = None
+    next_page: Optional[str] = None
+    has_more: bool = False
+
+
 # NGO Schemas
 class NGOBase(BaseModel):
     name: str = Field(..., min_length=2, max_length=255)
@@ -170,6 +202,39 @@ class NGOResponse(BaseModel):
         from_attributes = True
 
 
+class NGOListItem(NGOResponse):
+    distance_km: Optional[float] = None
+    # Staff members, and those with a completed pickup in the last 30 days
+    staff_total: int = 0
+    staff_active: int = 0
+
+
+class NGOListResponse(BaseModel):
+    ngos: List[NGOListItem]
+    pagination: dict
+
+
+class NGOStaffStats(BaseModel):
+    staff_id: str
+    full_name: Optional[str] = None
+    completed_pickups: int
+    servings_delivered: int
+    average_pickup_minutes: Optional[float] = None
+    last_completed_at: Optional[datetime] = None
+
+
+class NGOStats(BaseModel):
+    ngo_id: str
+    name: str
+    active_pickups: int
+    completed_pickups: int
+    declined_pickups: int
+    servings_delivered: int
+    # Creation to completion, over all completed pickups
+    average_pickup_minutes: Optional[float] = None
+    staff: List[NGOStaffStats]
+
+
 # Leaderboard Schemas
 class LeaderboardEntry(BaseModel):
     rank: int
@@ -212,6 +277,58 @@ class ActivityLogResponse(BaseModel):
     activities: List[ActivityLog]
 
 
+class AnalyticsCounts(BaseModel):
+    donations_created: int = 0
+    donations_completed: int = 0
+    donations_declined: int = 0
+    servings_delivered: int = 0
+    points_awarded: int = 0
+
+
+class AnalyticsDay(AnalyticsCounts):
+    day: date
+
+
+class AnalyticsResponse(BaseModel):
+    start: date
+    end: date
+    ngo_id: Optional[str] = None
+    days: List[AnalyticsDay]
+    totals: AnalyticsCounts
+
+
+# Search
+class SearchKind(str, Enum):
+    donation = "donation"
+    ngo = "ngo"
+    user = "user"
+
+
+class SearchResult(BaseModel):
+    kind: SearchKind
+    id: str
+    title: str
+    subtitle: Optional[str] = None
+    score: float
+
+
+class SearchResponse(BaseModel):
+    results: List[SearchResult]
+    page: int
+    limit: int
+    has_more: bool
+
+
+class AutocompleteSuggestion(BaseModel):
+    kind: SearchKind
+    id: str
+    label: str
+
+
+class AutocompleteResponse(BaseModel):
+    suggestions: List[AutocompleteSuggestion]
+
+
 # User Stats
 class UserStats(BaseModel):
     total_donations: int
@@ -222,6 +339,15 @@ class UserStats(BaseModel):
     joined_at: datetime
 
 
+# Dashboard
+class DonorDashboard(BaseModel):
+    profile: UserResponse
+    stats: UserStats
+    counts: dict
+    recent_donations: List[DonationResponse]
+    leaderboard: List[LeaderboardEntry]
+
+
 # Error Response
 class ErrorResponse(BaseModel):
     error: dict
\ No newline at end of file
@@ -1,21 +1,46 @@
-from fastapi import APIRouter, Depends, status
-from typing import List
-from app.models.schemas import NGOCreate, NGOUpdate, NGOResponse, UserRole
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import Optional
+from app.models.schemas import NGOCreate, NGOUpdate, NGOResponse, NGOListResponse, NGOStats, UserRole
 from app.ngos. service import (
-    create_ngo, get_all_ngos, get_ngo_by_id, update_ngo, delete_ngo
+    NGO_SORTS, create_ngo, get_ngos, get_ngo_by_id, get_ngo_stats, update_ngo, delete_ngo
 )
 from app.auth.dependencies import require_role
 
 router = APIRouter(prefix="/ngos", tags=["NGOs"])
 
 
-@router.get("", response_model=List[NGOResponse])
+@router.get("", response_model=NGOListResponse)
 async def list_ngos(
+    q: Optional[str] = Query(None, max_length=100, description="Name, email or address contains"),
+    min_active: Optional[int] = Query(None, ge=0, description="At least this many active pickups"),
+    max_active: Optional[int] = Query(None, ge=0, description="At most this many active pickups"),
+    latitude: Optional[float] = Query(None, ge=-90, le=90, description="Reference point for distance"),
+    longitude: Optional[float] = Query(None, ge=-180, le=180, description="Reference point for distance"),
+    radius_km: Optional[float] = Query(None, gt=0, description="Only NGOs this close to the reference point"),
+    sort: str = Query("created_at", description=f"Sort by {', '.join(NGO_SORTS)}"),
+    order: str = Query("desc", description="Sort order (asc/desc)"),
+    page: int = Query(1, ge=1, description="Page number"),
+    limit: int = Query(20, ge=1, le=100, description="Items per page"),
     current_user: dict = Depends(require_role([UserRole.admin]))
 ):
-    """Get all NGOs (Admin only)."""
-    ngos = await get_all_ngos()
-    return ngos
+    """
+    Get NGOs, a page at a time (Admin only).
+    
+    Each NGO carries its distance from `latitude`/`longitude` (when given),
+    its number of staff members and how many of them completed a pickup in
+    the last 30 days. Sort by `load` for the busiest (or, ascending, the
+    least busy) NGOs.
+    """
+    if sort not in NGO_SORTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"sort must be one of: {', '.join(NGO_SORTS)}"
+        )
+    return await get_ngos(
+        page=page, limit=limit, sort_by=sort, order=order, search=q,
+        min_active=min_active, max_active=max_active,
+        latitude=latitude, longitude=longitude, radius_km=radius_km
+    )
 
 
 @router.post("", response_model=NGOResponse, status_code=status.HTTP_201_CREATED)
@@ -46,6 +71,25 @@ async def get_ngo(
     return ngo
 
 
+@router.get("/{ngo_id}/stats", response_model=NGOStats)
+async def get_ngo_statistics(
+    ngo_id: str,
+    current_user: dict = Depends(require_role([UserRole.staff, UserRole.admin]))
+):
+    """
+    Get pickup statistics of an NGO and its staff (Admin, or staff of that NGO).
+    
+    Includes servings delivered, average time from donation to completed
+    pickup, and completions per staff member.
+    """
+    if current_user["role"] == UserRole.staff.value and current_user.get("ngo_id") != ngo_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only view statistics of your own NGO"
+        )
+    return await get_ngo_stats(ngo_id)
+
+
 @router.put("/{ngo_id}", response_model=NGOResponse)
 async def update_ngo_details(
     ngo_id: str,
@@ -1,13 +1,29 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
 from typing import Optional, List
 from fastapi import HTTPException, status
-from app.database import supabase
+from fastapi.concurrency import run_in_threadpool
+from app.database import supabase, supabase_read
+from app.cache import TTLCache
+from app.config import get_settings
 from app. models.schemas import NGOCreate, NGOUpdate
 
+settings = get_settings()
+
+# Pages of the NGO list shown on the admin page, dropped on NGO changes and
+# on donation writes that change an NGO's active or completed pickups (in
+# this worker; others catch up within the TTL)
+ngo_cache = TTLCache("ngos", settings.ngo_cache_ttl)
+
+NGO_SORTS = ["created_at", "name", "load", "distance"]
+# Staff count as active with a completed pickup this recent
+STAFF_ACTIVE_DAYS = 30
+
 
 async def create_ngo(ngo_data: NGOCreate) -> dict:
     """Create a new NGO"""
     # Check if email already exists
-    existing = supabase.table("ngos").select("id").eq("email", ngo_data.email).execute()
+    existing = await supabase.table("ngos").select("id").eq("email", ngo_data.email).execute_async()
     if existing.data:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -26,7 +42,7 @@ async def create_ngo(ngo_data: NGOCreate) -> dict:
         "active_pickups": 0,
     }
     
-    response = supabase.table("ngos").insert(ngo_dict).execute()
+    response = await supabase.table("ngos").insert(ngo_dict).execute_async()
     
     if not response.data:
         raise HTTPException(
@@ -34,27 +50,92 @@ async def create_ngo(ngo_data: NGOCreate) -> dict:
             detail="Failed to create NGO"
         )
     
+    ngo_cache.invalidate()
+    
     # Log activity
     ngo = response.data[0]
-    supabase.table("activity_log").insert({
+    await supabase.table("activity_log").insert({
         "action": "ngo_created",
         "description": f"New NGO added: {ngo_data.name}",
         "target_id": ngo["id"],
         "target_type": "ngo"
-    }).execute()
+    }).execute_async()
     
     return ngo
 
 
-async def get_all_ngos() -> List[dict]:
-    """Get all NGOs"""
-    response = supabase.table("ngos").select("*").order("created_at", desc=True).execute()
-    return response.data
+def _load_ngo_page(params: dict) -> List[dict]:
+    return supabase_read.rpc("list_ngos", params).execute().data
+
+
+async def get_ngos(
+    page: int = 1,
+    limit: int = 20,
+    sort_by: str = "created_at",
+    order: str = "desc",
+    search: Optional[str] = None,
+    min_active: Optional[int] = None,
+    max_active: Optional[int] = None,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    radius_km: Optional[float] = None
+) -> dict:
+    """
+    One page of NGOs with their staff summary, filtered and sorted.
+    
+    The ``list_ngos`` database function filters, sorts, counts and pages in
+    one query, and counts staff (and staff with a pickup in the last
+    ``STAFF_ACTIVE_DAYS`` days) only for the NGOs on the page.
+    """
+    located = latitude is not None and longitude is not None
+    if (sort_by == "distance" or radius_km is not None) and not located:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="latitude and longitude are required to sort or filter by distance"
+        )
+    
+    params = {
+        "search_param": search or None,
+        "min_active_param": min_active,
+        "max_active_param": max_active,
+        "lat_param": latitude if located else None,
+        "lng_param": longitude if located else None,
+        "radius_km_param": radius_km,
+        "sort_param": sort_by,
+        "descending_param": order == "desc",
+        "limit_param": limit,
+        "offset_param": (page - 1) * limit,
+    }
+    
+    def load() -> List[dict]:
+        active_since = datetime.now(timezone.utc) - timedelta(days=STAFF_ACTIVE_DAYS)
+        return _load_ngo_page({**params, "staff_active_since_param": active_since.isoformat()})
+    
+    key = tuple(sorted(params.items()))
+    rows = ngo_cache.get(key)
+    if rows is None:
+        rows = await run_in_threadpool(load)
+        ngo_cache.set(key, rows)
+    total = rows[0]["total_count"] if rows else 0
+    if not rows and page > 1:
+        # Past the last page: the count comes from the first one
+        first = await get_ngos(1, limit, sort_by, order, search, min_active, max_active, latitude, longitude, radius_km)
+        total = first["pagination"]["total"]
+    
+    return {
+        "ngos": rows,
+        "pagination": {
+            "page": page,
+            "limit": limit,
+            "total": total,
+            "total_pages": (total + limit - 1) // limit
+        }
+    }
 
 
 async def get_ngo_by_id(ngo_id:  str) -> dict:
     """Get NGO by ID"""
-    response = supabase.table("ngos").select("*").eq("id", ngo_id).execute()
+    response = await supabase.table("ngos").select("*").eq("id", ngo_id).execute_async()
     
     if not response.data:
         raise HTTPException(
@@ -68,7 +149,7 @@ async def get_ngo_by_id(ngo_id:  str) -> dict:
 async def update_ngo(ngo_id: str, ngo_update: NGOUpdate) -> dict:
     """Update NGO details"""
     # Check NGO exists
-    existing = supabase.table("ngos").select("id").eq("id", ngo_id).execute()
+    existing = await supabase.table("ngos").select("id").eq("id", ngo_id).execute_async()
     if not existing.data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -77,7 +158,7 @@ async def update_ngo(ngo_id: str, ngo_update: NGOUpdate) -> dict:
     
     # Check email uniqueness if changing email
     if ngo_update.email:
-        email_check = supabase.table("ngos").select("id").eq("email", ngo_update.email).neq("id", ngo_id).execute()
+        email_check = await supabase.table("ngos").select("id").eq("email", ngo_update.email).neq("id", ngo_id).execute_async()
         if email_check.data:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
@@ -88,7 +169,8 @@ async def update_ngo(ngo_id: str, ngo_update: NGOUpdate) -> dict:
     
     if update_data: 
         update_data["updated_at"] = "now()"
-        supabase.table("ngos").update(update_data).eq("id", ngo_id).execute()
+        await supabase.table("ngos").update(update_data).eq("id", ngo_id).execute_async()
+        ngo_cache.invalidate()
     
     return await get_ngo_by_id(ngo_id)
 
@@ -106,6 +188,59 @@ async def delete_ngo(ngo_id: str) -> dict:
         )
     
     # Soft delete or hard delete
-    supabase.table("ngos").delete().eq("id", ngo_id).execute()
+    await supabase.table("ngos").delete().eq("id", ngo_id).execute_async()
+    ngo_cache.invalidate()
+    
+    return {"message": "NGO deleted successfully"}
+
+
+def _average_minutes(total_seconds: float, count: int) -> Optional[float]:
+    return round(total_seconds / count / 60, 1) if count else None
+
+
+async def get_ngo_stats(ngo_id: str) -> dict:
+    """
+    Operational statistics of an NGO and its staff, from the running totals
+    kept as donations are completed and declined. The NGO, its totals and
+    its staff (with their names embedded) are three reads run concurrently.
+    """
+    ngo_response, totals_response, staff_response = await asyncio.gather(
+        supabase_read.table("ngos").select("id, name, active_pickups").eq("id", ngo_id).execute_async(),
+        supabase_read.table("ngo_pickup_stats").select(
+            "completed_pickups, declined_pickups, servings_delivered, total_pickup_seconds"
+        ).eq("ngo_id", ngo_id).execute_async(),
+        supabase_read.table("staff_pickup_stats").select(
+            "staff_id, completed_pickups, servings_delivered, total_pickup_seconds, last_completed_at, "
+            "users(full_name)"
+        ).eq("ngo_id", ngo_id).order("completed_pickups", desc=True).execute_async(),
+    )
+    if not ngo_response.data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="NGO not found"
+        )
+    ngo = ngo_response.data[0]
+    totals = totals_response.data[0] if totals_response.data else {}
+    staff_rows = staff_response.data
     
-    return {"message": "NGO deleted successfully"}
\ No newline at end of file
+    completed = totals.get("completed_pickups", 0)
+    return {
+        "ngo_id": ngo["id"],
+        "name": ngo["name"],
+        "active_pickups": ngo["active_pickups"],
+        "completed_pickups": completed,
+        "declined_pickups": totals.get("declined_pickups", 0),
+        "servings_delivered": totals.get("servings_delivered", 0),
+        "average_pickup_minutes": _average_minutes(totals.get("total_pickup_seconds", 0), completed),
+        "staff": [
+            {
+                "staff_id": row["staff_id"],
+                "full_name": (row["users"] or {}).get("full_name"),
+                "completed_pickups": row["completed_pickups"],
+                "servings_delivered": row["servings_delivered"],
+                "average_pickup_minutes": _average_minutes(row["total_pickup_seconds"], row["completed_pickups"]),
+                "last_completed_at": row["last_completed_at"],
+            }
+            for row in staff_rows
+        ],
+    }
@@ -0,0 +1,208 @@
+"""
+Deadlines, retries and circuit breaking for database calls.
+
+Every request gets a database deadline (``db_request_deadline`` seconds from
+its start); a call that would start after the deadline fails fast instead of
+queueing behind a slow database, and each call is given at most
+``db_call_timeout`` seconds or what is left of the deadline, whichever is
+less. A call that runs out of that time counts as a transient failure (the
+call itself may still complete in the background). Idempotent reads that fail with a transient
+error (network error, timeout, PostgREST connection error) are retried a few
+times with jittered exponential backoff while the deadline allows. Each
+client has a circuit breaker: after ``db_breaker_failure_threshold``
+consecutive transient failures it opens and calls fail immediately for
+``db_breaker_reset_timeout`` seconds, after which one trial call decides
+whether it closes again.
+
+Transient failures that survive the retries surface as
+``DatabaseUnavailable``, which the HTTP layer turns into 503 (and
+``DeadlineExceeded`` into 504).
+
+``call_with_policy`` blocks (including while backing off), so async code
+reaches it through ``InstrumentedQuery.execute_async()`` in the threadpool.
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextvars import ContextVar, copy_context
+from typing import Any, Callable, Optional
+
+import httpx
+from postgrest import APIError
+
+from app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger("app.db")
+
+# PostgREST/Postgres error codes worth retrying: connection errors,
+# serialization failures, deadlocks, statement timeouts, too many connections
+TRANSIENT_ERROR_CODES = {"PGRST000", "PGRST001", "PGRST002", "PGRST003", "40001", "40P01", "57014", "53300"}
+
+
+class DatabaseUnavailable(RuntimeError):
+    """A call failed with a transient error, or was rejected by an open circuit"""
+
+
+class DeadlineExceeded(RuntimeError):
+    """The request ran out of time for database calls"""
+
+
+class CallTimeout(Exception):
+    """A database call did not finish within its time limit"""
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether a failed call might succeed if retried"""
+    if isinstance(exc, (httpx.TransportError, CallTimeout)):
+        return True
+    if isinstance(exc, APIError):
+        return exc.code in TRANSIENT_ERROR_CODES
+    return False
+
+
+# =====================================================
+# REQUEST DEADLINES
+# =====================================================
+
+_deadline: ContextVar[Optional[float]] = ContextVar("db_deadline", default=None)
+
+
+def start_deadline():
+    """Start the database deadline of the current request; returns a reset token"""
+    budget = settings.db_request_deadline
+    return _deadline.set(time.monotonic() + budget if budget else None)
+
+
+def reset_deadline(token):
+    _deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current request's deadline, None without one"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+# =====================================================
+# CIRCUIT BREAKER
+# =====================================================
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker (closed → open → half-open → closed)"""
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def before_call(self):
+        """Raise DatabaseUnavailable unless a call may go through now"""
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return
+        raise DatabaseUnavailable(f"Database circuit '{self.name}' is open")
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info("Database circuit '%s' closed", self.name)
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            trial_failed = self._trial_running
+            self._trial_running = False
+            if trial_failed or (self.opened_at is None and self.failures >= self.failure_threshold):
+                if self.opened_at is None:
+                    logger.warning("Database circuit '%s' opened after %d failures", self.name, self.failures)
+                self.opened_at = time.monotonic()
+
+
+def new_breaker(name: str) -> CircuitBreaker:
+    return CircuitBreaker(name, settings.db_breaker_failure_threshold, settings.db_breaker_reset_timeout)
+
+
+# =====================================================
+# CALL POLICY
+# =====================================================
+
+# Runs calls so they can be abandoned at their timeout; sized above the
+# request threadpool so a saturated pool shows up as timeouts, not deadlock
+_call_executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix="db-call")
+
+
+def _call_with_timeout(call: Callable[[], Any], remaining: Optional[float]) -> Any:
+    """Run ``call`` for at most ``db_call_timeout`` or ``remaining`` seconds"""
+    limits = [limit for limit in (settings.db_call_timeout or None, remaining) if limit is not None]
+    if not limits:
+        return call()
+    timeout = min(limits)
+    future = _call_executor.submit(copy_context().run, call)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        future.cancel()
+        raise CallTimeout(f"Database call timed out after {timeout:.3f}s") from None
+
+
+def call_with_policy(call: Callable[[], Any], breaker: CircuitBreaker, retryable: bool) -> Any:
+    """
+    Run one database call under the request deadline and ``breaker``.
+
+    Each attempt is bounded by ``min(db_call_timeout, remaining_time())``.
+    ``retryable`` calls (idempotent reads) are retried on transient errors.
+    """
+    attempts = 1 + (settings.db_read_retries if retryable else 0)
+    for attempt in range(attempts):
+        remaining = remaining_time()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded("Request deadline for database calls exceeded")
+        breaker.before_call()
+        try:
+            result = _call_with_timeout(call, remaining)
+        except Exception as exc:
+            if not is_transient(exc):
+                # The database answered; the request itself was at fault
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            remaining = remaining_time()
+            if isinstance(exc, CallTimeout) and remaining is not None and remaining <= 0:
+                raise DeadlineExceeded("Request deadline for database calls exceeded") from exc
+            if attempt == attempts - 1:
+                raise DatabaseUnavailable(f"Database call failed: {exc!r}") from exc
+            # Full jitter: spread retries of concurrent requests apart
+            delay = random.uniform(0, settings.db_retry_backoff * 2 ** attempt)
+            if remaining is not None and delay >= remaining:
+                raise DeadlineExceeded("Request deadline for database calls exceeded") from exc
+            logger.info("Retrying database call after %r (attempt %d)", exc, attempt + 1)
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
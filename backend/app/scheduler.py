@@ -0,0 +1,43 @@
+"""
+Periodic maintenance jobs run by each API worker.
+
+Jobs are plain blocking functions (they talk to the database through the
+synchronous clients), run in the threadpool every ``interval`` seconds from
+asyncio tasks started in the app lifespan. A failing run is logged and
+retried at the next interval. Jobs must tolerate running concurrently in
+several workers.
+"""
+import asyncio
+import logging
+from typing import Any, Callable, List
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger("app.scheduler")
+
+
+async def run_periodically(name: str, job: Callable[[], Any], interval: float):
+    """Run ``job`` now and then every ``interval`` seconds until cancelled"""
+    while True:
+        try:
+            await run_in_threadpool(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Scheduled job %s failed", name)
+        await asyncio.sleep(interval)
+
+
+def start_jobs(jobs: List[tuple]) -> List[asyncio.Task]:
+    """Start ``(name, job, interval)`` jobs; returns their tasks"""
+    return [
+        asyncio.create_task(run_periodically(name, job, interval), name=f"job:{name}")
+        for name, job, interval in jobs
+    ]
+
+
+async def stop_jobs(tasks: List[asyncio.Task]):
+    """Cancel job tasks and wait for them to finish"""
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,40 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from app.models.schemas import AutocompleteResponse, SearchKind, SearchResponse
+from app.search.service import autocomplete, search
+from app.auth.dependencies import get_current_active_user
+
+router = APIRouter(prefix="/search", tags=["Search"])
+
+
+@router.get("", response_model=SearchResponse)
+async def search_entities(
+    q: str = Query(..., min_length=3, max_length=100, description="Search text"),
+    type: Optional[SearchKind] = Query(None, description="Only donations, NGOs or users"),
+    page: int = Query(1, ge=1, description="Page number"),
+    limit: int = Query(20, ge=1, le=50, description="Results per page"),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """
+    Fuzzy search, best matches first.
+
+    Matches donation address, description and donor name, NGO name, address
+    and email, and user names, tolerating typos. Admins search everything;
+    staff search pending and active donations and donors their own donations.
+    """
+    return await search(current_user, q, kind=type.value if type else None, page=page, limit=limit)
+
+
+@router.get("/autocomplete", response_model=AutocompleteResponse)
+async def autocomplete_entities(
+    q: str = Query(..., min_length=2, max_length=100, description="Prefix typed so far"),
+    type: Optional[SearchKind] = Query(None, description="Only donations, NGOs or users"),
+    limit: int = Query(10, ge=1, le=20, description="Number of suggestions"),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """
+    Suggestions for a search box: donation addresses, NGO names and user
+    names with a word starting with `q`, shortest first. Same visibility as
+    `/api/search`.
+    """
+    return await autocomplete(current_user, q, kind=type.value if type else None, limit=limit)
@@ -0,0 +1,57 @@
+from typing import List, Optional
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from app.database import supabase_read
+
+SEARCH_KINDS = ["donation", "ngo", "user"]
+
+
+def search_scope(user: dict, kind: Optional[str] = None) -> dict:
+    """
+    The ``search_entities`` / ``search_autocomplete`` restrictions for a user:
+    admins search everything, staff search pending and active donations (as
+    in their donation list) and donors search their own donations.
+    """
+    if user["role"] == "admin":
+        scope = {"kinds_param": SEARCH_KINDS, "statuses_param": None, "donor_id_param": None}
+    elif user["role"] == "staff":
+        scope = {"kinds_param": ["donation"], "statuses_param": ["pending", "active"], "donor_id_param": None}
+    else:
+        scope = {"kinds_param": ["donation"], "statuses_param": None, "donor_id_param": user["id"]}
+
+    if kind is not None:
+        if kind not in scope["kinds_param"]:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Not allowed to search {kind}s"
+            )
+        scope["kinds_param"] = [kind]
+    return scope
+
+
+def _search(params: dict) -> List[dict]:
+    return supabase_read.rpc("search_entities", params).execute().data
+
+
+def _autocomplete(params: dict) -> List[dict]:
+    return supabase_read.rpc("search_autocomplete", params).execute().data
+
+
+async def search(user: dict, query: str, kind: Optional[str] = None, page: int = 1, limit: int = 20) -> dict:
+    """Ranked fuzzy matches for ``query`` among what ``user`` may see"""
+    scope = search_scope(user, kind)
+    # One extra row tells whether there is a next page
+    rows = await run_in_threadpool(_search, {
+        "query_param": query,
+        **scope,
+        "limit_param": limit + 1,
+        "offset_param": (page - 1) * limit,
+    })
+    return {"results": rows[:limit], "page": page, "limit": limit, "has_more": len(rows) > limit}
+
+
+async def autocomplete(user: dict, prefix: str, kind: Optional[str] = None, limit: int = 10) -> dict:
+    """Labels with a word starting with ``prefix``, shortest first"""
+    scope = search_scope(user, kind)
+    rows = await run_in_threadpool(_autocomplete, {"prefix_param": prefix, **scope, "limit_param": limit})
+    return {"suggestions": rows}
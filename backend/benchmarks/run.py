@@ -0,0 +1,390 @@
+"""
+End-to-end API benchmark.
+
+Seeds the in-memory backend with synthetic data, then drives every route with
+concurrent clients through the ASGI app (no network, no Supabase) and reports
+throughput, latency percentiles and database round trips per request.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.run --requests 500 --concurrency 16 --output results.json
+    python -m benchmarks.run --baseline results.json      # compare with a previous run
+    python -m benchmarks.run --only donations.list,admin.stats
+"""
+import os
+
+# The benchmark always runs against the local stand-in database
+os.environ["DATABASE_BACKEND"] = "memory"
+os.environ["MEMORY_SEED_DATA"] = "false"
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret-key")
+# All benchmark requests come from one client; don't rate limit its logins
+os.environ.setdefault("LOGIN_RATE_BURST", "1000000")
+
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from app.main import app
+from app.database import get_memory_client
+from app.auth.service import create_access_token, get_password_hash
+from app.admin.backfill import backfill_aggregates
+from benchmarks.synthetic import BENCH_PASSWORD, SeedConfig, SeedResult, seed_store
+
+
+@dataclass
+class Scenario:
+    """One benchmarked route and how to build a request for it"""
+    name: str
+    method: str
+    route: str
+    build: Callable[["BenchContext", random.Random], dict]
+
+
+class BenchContext:
+    """Seeded ids, auth headers and counters shared by scenarios"""
+
+    def __init__(self, seed: SeedResult):
+        self.seed = seed
+        self.sequence = itertools.count()
+        self.admin = self._headers(seed.admin_id, "admin")
+        self.donors = [self._headers(user_id, "donor") for user_id in seed.donor_ids[:50]]
+        self.staff = [self._headers(user_id, "staff") for user_id in seed.staff_ids[:50]]
+        self.disposable_ngo_ids: List[str] = []
+
+    @staticmethod
+    def _headers(user_id: str, role: str) -> dict:
+        token = create_access_token(data={"sub": user_id, "role": role})
+        return {"Authorization": f"Bearer {token}"}
+
+    def next_transition(self) -> tuple:
+        """Next donation that can legally change status, and its target status"""
+        if self.seed.pending_donation_ids:
+            return self.seed.pending_donation_ids.pop(), "active"
+        if self.seed.active_donation_ids:
+            return self.seed.active_donation_ids.pop(), "completed"
+        return self.seed.donation_ids[0], "active"
+
+
+def _donation_form(rng: random.Random) -> dict:
+    return {
+        "address": f"{rng.randint(1, 999)} Bench Street, Tirupati",
+        "latitude": str(13.6288 + rng.uniform(-0.1, 0.1)),
+        "longitude": str(79.4192 + rng.uniform(-0.1, 0.1)),
+        "volume": rng.choice(["small", "medium", "large"]),
+        "priority": rng.choice(["high", "medium", "low"]),
+        "description": "Benchmark donation",
+    }
+
+
+def _status_update(ctx: BenchContext, rng: random.Random) -> dict:
+    donation_id, target = ctx.next_transition()
+    return {
+        "url": f"/api/donations/{donation_id}/status",
+        "json": {"status": target},
+        "headers": rng.choice(ctx.staff),
+    }
+
+
+def _delete_ngo(ctx: BenchContext, rng: random.Random) -> dict:
+    ngo_id = ctx.disposable_ngo_ids.pop() if ctx.disposable_ngo_ids else ctx.seed.ngo_ids[0]
+    return {"url": f"/api/ngos/{ngo_id}", "headers": ctx.admin}
+
+
+SCENARIOS: List[Scenario] = [
+    Scenario("auth.register", "POST", "/api/auth/register", lambda ctx, rng: {
+        "json": {
+            "email": f"bench{next(ctx.sequence)}-{rng.random():.6f}@bench-donate.org",
+            "full_name": "Bench Registrant", "password": BENCH_PASSWORD,
+        },
+    }),
+    Scenario("auth.login", "POST", "/api/auth/login", lambda ctx, rng: {
+        "json": {
+            "email": f"donor{rng.randrange(len(ctx.seed.donor_ids))}@bench-donate.org",
+            "password": BENCH_PASSWORD,
+        },
+    }),
+    Scenario("auth.logout", "POST", "/api/auth/logout", lambda ctx, rng: {
+        "headers": rng.choice(ctx.donors),
+    }),
+    Scenario("auth.me", "GET", "/api/auth/me", lambda ctx, rng: {
+        "headers": rng.choice(ctx.staff + ctx.donors),
+    }),
+    Scenario("auth.me.update", "PUT", "/api/auth/me", lambda ctx, rng: {
+        "json": {"full_name": f"Renamed Donor {rng.randint(1, 9999)}"},
+        "headers": rng.choice(ctx.donors),
+    }),
+    Scenario("donations.create", "POST", "/api/donations", lambda ctx, rng: {
+        "data": _donation_form(rng), "headers": rng.choice(ctx.donors),
+    }),
+    Scenario("donations.list.donor", "GET", "/api/donations", lambda ctx, rng: {
+        "headers": rng.choice(ctx.donors),
+    }),
+    Scenario("donations.list.staff", "GET", "/api/donations", lambda ctx, rng: {
+        "params": {"status": "pending"}, "headers": rng.choice(ctx.staff),
+    }),
+    Scenario("donations.list.admin", "GET", "/api/donations", lambda ctx, rng: {
+        "params": {"page": rng.randint(1, 5)}, "headers": ctx.admin,
+    }),
+    Scenario("donations.map", "GET", "/api/donations/map", lambda ctx, rng: {
+        "headers": rng.choice(ctx.staff),
+    }),
+    Scenario("donations.map.clusters", "GET", "/api/donations/map", lambda ctx, rng: {
+        "params": {"zoom": rng.randint(8, 12), "bbox": "79.2,13.4,79.7,13.9"},
+        "headers": rng.choice(ctx.staff),
+    }),
+    Scenario("donations.queue", "GET", "/api/donations/queue", lambda ctx, rng: {
+        "headers": rng.choice(ctx.staff),
+    }),
+    Scenario("donations.get", "GET", "/api/donations/{id}", lambda ctx, rng: {
+        "url": f"/api/donations/{rng.choice(ctx.seed.donation_ids)}", "headers": ctx.admin,
+    }),
+    Scenario("donations.status", "PATCH", "/api/donations/{id}/status", _status_update),
+    Scenario("ngos.list", "GET", "/api/ngos", lambda ctx, rng: {"headers": ctx.admin}),
+    Scenario("ngos.list.nearby", "GET", "/api/ngos", lambda ctx, rng: {
+        "params": {
+            "sort": "distance", "order": "asc", "radius_km": rng.choice([2, 5, 10]),
+            "latitude": 13.63 + rng.uniform(-0.05, 0.05), "longitude": 79.42 + rng.uniform(-0.05, 0.05),
+        },
+        "headers": ctx.admin,
+    }),
+    Scenario("ngos.stats", "GET", "/api/ngos/{id}/stats", lambda ctx, rng: {
+        "url": f"/api/ngos/{rng.choice(ctx.seed.ngo_ids)}/stats", "headers": ctx.admin,
+    }),
+    Scenario("ngos.create", "POST", "/api/ngos", lambda ctx, rng: {
+        "json": {
+            "name": "Bench Created NGO", "address": "1 Bench Street, Tirupati",
+            "email": f"created{next(ctx.sequence)}-{rng.random():.6f}@bench-donate.org",
+            "latitude": 13.63, "longitude": 79.42,
+        },
+        "headers": ctx.admin,
+    }),
+    Scenario("ngos.get", "GET", "/api/ngos/{id}", lambda ctx, rng: {
+        "url": f"/api/ngos/{rng.choice(ctx.seed.ngo_ids)}", "headers": ctx.admin,
+    }),
+    Scenario("ngos.update", "PUT", "/api/ngos/{id}", lambda ctx, rng: {
+        "url": f"/api/ngos/{rng.choice(ctx.seed.ngo_ids)}",
+        "json": {"phone": f"+91 {rng.randint(10000, 99999)} {rng.randint(10000, 99999)}"},
+        "headers": ctx.admin,
+    }),
+    Scenario("ngos.delete", "DELETE", "/api/ngos/{id}", _delete_ngo),
+    Scenario("leaderboard", "GET", "/api/leaderboard", lambda ctx, rng: {
+        "headers": rng.choice(ctx.donors),
+    }),
+    Scenario("admin.stats", "GET", "/api/admin/stats", lambda ctx, rng: {"headers": ctx.admin}),
+    Scenario("admin.activity", "GET", "/api/admin/activity", lambda ctx, rng: {
+        "params": {"limit": 20}, "headers": ctx.admin,
+    }),
+    Scenario("admin.analytics", "GET", "/api/admin/analytics", lambda ctx, rng: {
+        "params": {"start": (datetime.now(timezone.utc) - timedelta(days=365)).date().isoformat()},
+        "headers": ctx.admin,
+    }),
+    Scenario("admin.user_stats", "GET", "/api/admin/users/me/stats", lambda ctx, rng: {
+        "headers": rng.choice(ctx.donors),
+    }),
+    Scenario("dashboard.donor", "GET", "/api/dashboard/donor", lambda ctx, rng: {
+        "headers": rng.choice(ctx.donors),
+    }),
+    Scenario("search", "GET", "/api/search", lambda ctx, rng: {
+        "params": {"q": rng.choice(["Statoin Rd", "Markt St", "Temple", "Lake Veiw"])}, "headers": ctx.admin,
+    }),
+    Scenario("search.autocomplete", "GET", "/api/search/autocomplete", lambda ctx, rng: {
+        "params": {"q": rng.choice(["Ma", "Sta", "Tem", "Oa"])}, "headers": rng.choice(ctx.staff),
+    }),
+]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+async def run_scenario(
+    scenario: Scenario,
+    ctx: BenchContext,
+    requests: int,
+    concurrency: int,
+    warmup: int,
+    rng: random.Random,
+) -> dict:
+    """Drive one scenario and summarise its latency and round trips"""
+    store = get_memory_client().store
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def send():
+            spec = scenario.build(ctx, rng)
+            spec.setdefault("url", scenario.route)
+            return await client.request(scenario.method, **spec)
+
+        for _ in range(warmup):
+            await send()
+
+        latencies: List[float] = []
+        statuses: Dict[int, int] = {}
+        remaining = iter(range(requests))
+
+        async def worker():
+            for _ in remaining:
+                started = time.perf_counter()
+                response = await send()
+                latencies.append((time.perf_counter() - started) * 1000)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        trips_before = store.round_trips
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        round_trips = store.round_trips - trips_before
+
+    latencies.sort()
+    errors = sum(count for code, count in statuses.items() if code >= 400)
+    return {
+        "method": scenario.method,
+        "route": scenario.route,
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+        "throughput_rps": round(requests / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(latencies[-1], 3) if latencies else 0.0,
+        },
+        "db_round_trips_per_request": round(round_trips / requests, 2) if requests else 0.0,
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(results: Dict[str, dict], baseline: Optional[Dict[str, dict]] = None):
+    """Print a human readable table, with deltas against a baseline run"""
+    header = f"{'scenario':<24}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'db/req':>8}{'err':>6}"
+    print(header)
+    print("-" * len(header))
+    for name, result in results.items():
+        latency = result["latency_ms"]
+        print(
+            f"{name:<24}{result['throughput_rps']:>10.1f}{latency['p50']:>10.2f}"
+            f"{latency['p95']:>10.2f}{latency['p99']:>10.2f}"
+            f"{result['db_round_trips_per_request']:>8.1f}{result['errors']:>6}"
+        )
+        previous = (baseline or {}).get(name)
+        if previous:
+            def delta(new, old):
+                return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            print(
+                f"{'  vs baseline':<24}{delta(result['throughput_rps'], previous['throughput_rps']):>10}"
+                f"{delta(latency['p50'], previous['latency_ms']['p50']):>10}"
+                f"{delta(latency['p95'], previous['latency_ms']['p95']):>10}"
+                f"{delta(latency['p99'], previous['latency_ms']['p99']):>10}"
+                f"{result['db_round_trips_per_request'] - previous['db_round_trips_per_request']:>+8.1f}"
+            )
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    defaults = SeedConfig()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--donors", type=int, default=defaults.donors)
+    parser.add_argument("--staff", type=int, default=defaults.staff)
+    parser.add_argument("--ngos", type=int, default=defaults.ngos)
+    parser.add_argument("--donations", type=int, default=defaults.donations)
+    parser.add_argument("--activity", type=int, default=defaults.activity)
+    parser.add_argument("--spread-km", type=float, default=defaults.spread_km)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients per scenario")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests per scenario")
+    parser.add_argument("--only", default="", help="Comma separated scenario names to run")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--baseline", help="Previous JSON results to compare against")
+    return parser.parse_args(argv)
+
+
+async def main(argv: Optional[List[str]] = None) -> dict:
+    args = parse_args(argv)
+    config = SeedConfig(
+        donors=args.donors, staff=args.staff, ngos=args.ngos,
+        donations=args.donations, activity=args.activity,
+        spread_km=args.spread_km, seed=args.seed,
+    )
+
+    client = get_memory_client()
+    client.store.reset()
+    seeded_at = time.perf_counter()
+    seed = seed_store(client, config, get_password_hash(BENCH_PASSWORD))
+    backfill_aggregates()
+    seed_seconds = time.perf_counter() - seeded_at
+
+    ctx = BenchContext(seed)
+    selected = [name for name in args.only.split(",") if name]
+    scenarios = [s for s in SCENARIOS if not selected or s.name in selected]
+
+    # Deletable NGOs (no staff) for the delete scenario
+    if any(s.name == "ngos.delete" for s in scenarios):
+        for i in range(args.requests + args.warmup):
+            ngo = client.store.insert("ngos", {
+                "name": f"Disposable NGO {i}", "address": "1 Bench Street, Tirupati",
+                "email": f"disposable{i}@bench-donate.org", "latitude": 13.63, "longitude": 79.42,
+            })
+            ctx.disposable_ngo_ids.append(ngo["id"])
+
+    rng = random.Random(args.seed)
+    results = {}
+    for scenario in scenarios:
+        results[scenario.name] = await run_scenario(
+            scenario, ctx, args.requests, args.concurrency, args.warmup, rng
+        )
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": _git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "seed_seconds": round(seed_seconds, 3),
+            "dataset": asdict(config),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+        },
+        "results": results,
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    print_report(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    return report
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
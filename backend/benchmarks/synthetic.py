@@ -0,0 +1,188 @@
+"""
+Synthetic data generator for benchmarks.
+
+Fills an in-memory store with donors, staff, NGOs, donations spread around a
+city centre and an activity log, writing rows directly (no API calls) so that
+large datasets can be seeded in seconds.
+"""
+import math
+import random
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from app.memory_database import InMemoryClient
+from app.donations.service import calculate_points, calculate_servings
+from app.models.schemas import Priority, Volume
+
+
+# Tirupati, where the sample NGOs of the initial migration are located
+CITY_CENTRE = (13.6288, 79.4192)
+
+BENCH_PASSWORD = "BenchPass123"
+
+FIRST_NAMES = ["Aarav", "Diya", "Ishaan", "Kavya", "Rohan", "Saanvi", "Vihaan", "Anaya", "Arjun", "Meera"]
+LAST_NAMES = ["Reddy", "Sharma", "Naidu", "Iyer", "Patel", "Rao", "Gupta", "Menon", "Das", "Kumar"]
+STREETS = ["Temple Road", "Main St", "Oak Ave", "Station Rd", "Market St", "Lake View", "Hill Rd"]
+
+ACTIVITY_ACTIONS = [
+    "donation_created", "donation_active", "donation_completed",
+    "donation_declined", "user_registered",
+]
+
+
+@dataclass
+class SeedConfig:
+    """Sizes and shape of the generated dataset"""
+    donors: int = 1000
+    staff: int = 100
+    ngos: int = 20
+    donations: int = 10000
+    activity: int = 20000
+    # Standard deviation of donation coordinates around the centre, in km
+    spread_km: float = 8.0
+    # Donations are created uniformly over this many past days
+    history_days: int = 180
+    # Relative share of donations per status
+    status_weights: Dict[str, float] = field(default_factory=lambda: {
+        "pending": 0.1, "active": 0.1, "completed": 0.7, "declined": 0.1,
+    })
+    seed: int = 42
+
+
+@dataclass
+class SeedResult:
+    """Ids of generated rows, used by benchmark scenarios"""
+    admin_id: str = ""
+    donor_ids: List[str] = field(default_factory=list)
+    staff_ids: List[str] = field(default_factory=list)
+    ngo_ids: List[str] = field(default_factory=list)
+    donation_ids: List[str] = field(default_factory=list)
+    pending_donation_ids: List[str] = field(default_factory=list)
+    active_donation_ids: List[str] = field(default_factory=list)
+
+
+def _iso(moment: datetime) -> str:
+    return moment.isoformat()
+
+
+def _name(rng: random.Random) -> str:
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def _address(rng: random.Random) -> str:
+    return f"{rng.randint(1, 999)} {rng.choice(STREETS)}, Tirupati"
+
+
+def _scatter(rng: random.Random, spread_km: float) -> tuple:
+    """Random coordinate normally distributed around the city centre"""
+    lat, lng = CITY_CENTRE
+    d_lat = rng.gauss(0, spread_km) / 111.0
+    d_lng = rng.gauss(0, spread_km) / (111.0 * math.cos(math.radians(lat)))
+    return round(lat + d_lat, 6), round(lng + d_lng, 6)
+
+
+def seed_store(client: InMemoryClient, config: SeedConfig, password_hash: str) -> SeedResult:
+    """Populate the store behind ``client`` according to ``config``"""
+    rng = random.Random(config.seed)
+    store = client.store
+    result = SeedResult()
+    now = datetime.now(timezone.utc)
+
+    with store.lock:
+        admin = store.find("users", "role", "admin")
+        if admin is None:
+            admin = store.insert("users", {
+                "email": "admin@bench-donate.org", "full_name": "Bench Admin",
+                "password_hash": password_hash, "role": "admin",
+            })
+        else:
+            admin["password_hash"] = password_hash
+        result.admin_id = admin["id"]
+
+        for i in range(config.ngos):
+            lat, lng = _scatter(rng, config.spread_km / 2)
+            ngo = store.insert("ngos", {
+                "name": f"Bench NGO {i}", "address": _address(rng),
+                "email": f"ngo{i}@bench-donate.org", "phone": None,
+                "latitude": lat, "longitude": lng,
+            })
+            result.ngo_ids.append(ngo["id"])
+
+        for i in range(config.staff):
+            ngo_id = result.ngo_ids[i % len(result.ngo_ids)] if result.ngo_ids else None
+            staff = store.insert("users", {
+                "email": f"staff{i}@bench-donate.org", "full_name": _name(rng),
+                "password_hash": password_hash, "role": "staff", "ngo_id": ngo_id,
+            })
+            if ngo_id:
+                store.get("ngos", ngo_id)["staff_count"] += 1
+            result.staff_ids.append(staff["id"])
+
+        for i in range(config.donors):
+            donor = store.insert("users", {
+                "email": f"donor{i}@bench-donate.org", "full_name": _name(rng),
+                "password_hash": password_hash, "role": "donor",
+            })
+            result.donor_ids.append(donor["id"])
+
+        statuses = list(config.status_weights)
+        weights = [config.status_weights[s] for s in statuses]
+        for _ in range(config.donations if result.donor_ids else 0):
+            donor = store.get("users", rng.choice(result.donor_ids))
+            volume = rng.choice(list(Volume))
+            priority = rng.choice(list(Priority))
+            status = rng.choices(statuses, weights)[0]
+            created = now - timedelta(seconds=rng.uniform(0, config.history_days * 86400))
+            lat, lng = _scatter(rng, config.spread_km)
+            ngo_id = rng.choice(result.ngo_ids) if result.ngo_ids else None
+            points = calculate_points(volume, priority)
+            row = {
+                "id": str(uuid.uuid4()),
+                "donor_id": donor["id"], "donor_name": donor["full_name"],
+                "address": _address(rng), "latitude": lat, "longitude": lng,
+                "volume": volume.value, "volume_servings": calculate_servings(volume),
+                "priority": priority.value, "status": status, "points": points,
+                "assigned_ngo_id": ngo_id,
+                "created_at": _iso(created), "updated_at": _iso(created),
+            }
+            if status == "completed":
+                done = min(created + timedelta(hours=rng.uniform(0.5, 48)), now)
+                row["completed_at"] = _iso(done)
+                row["updated_at"] = _iso(done)
+                if result.staff_ids:
+                    row["completed_by_staff_id"] = rng.choice(result.staff_ids)
+                donor["points"] += points
+                donor["total_donations"] += 1
+            elif status == "declined":
+                row["decline_reason"] = "Synthetic decline"
+            store.insert("donations", row)
+
+            ngo = store.get("ngos", ngo_id) if ngo_id else None
+            if status in ("pending", "active"):
+                donor["active_donations"] += 1
+                if ngo:
+                    ngo["active_pickups"] += 1
+            elif status == "completed" and ngo:
+                ngo["completed_pickups"] += 1
+
+            result.donation_ids.append(row["id"])
+            if status == "pending":
+                result.pending_donation_ids.append(row["id"])
+            elif status == "active":
+                result.active_donation_ids.append(row["id"])
+
+        user_pool = result.donor_ids + result.staff_ids
+        for _ in range(config.activity if user_pool else 0):
+            user = store.get("users", rng.choice(user_pool))
+            created = now - timedelta(seconds=rng.uniform(0, config.history_days * 86400))
+            action = rng.choice(ACTIVITY_ACTIONS)
+            store.insert("activity_log", {
+                "action": action, "description": action.replace("_", " ").capitalize(),
+                "user_id": user["id"], "user_name": user["full_name"],
+                "target_id": rng.choice(result.donation_ids) if result.donation_ids else None,
+                "target_type": "donation", "created_at": _iso(created),
+            })
+
+    return result
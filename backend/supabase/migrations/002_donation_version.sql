@@ -0,0 +1,22 @@
+-- =====================================================
+-- OPTIMISTIC CONCURRENCY FOR DONATION STATUS UPDATES
+-- =====================================================
+
+-- Row version, exposed as the ETag of a donation
+ALTER TABLE donations ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+
+-- Bump the version on every update so conditional updates can detect
+-- concurrent modifications
+CREATE OR REPLACE FUNCTION bump_donation_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.version := OLD.version + 1;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS donations_bump_version ON donations;
+CREATE TRIGGER donations_bump_version
+    BEFORE UPDATE ON donations
+    FOR EACH ROW
+    EXECUTE FUNCTION bump_donation_version();
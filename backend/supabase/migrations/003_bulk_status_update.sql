@@ -0,0 +1,124 @@
+-- =====================================================
+-- BULK DONATION STATUS UPDATES
+-- =====================================================
+
+-- Apply many status transitions in one call and one transaction.
+--
+-- updates: [{"id": uuid, "status": text, "decline_reason": text, "version": int}]
+--   ("decline_reason" and "version" are optional; with "version" the row
+--   must still be at that version)
+--
+-- Each donation is updated only if its current status allows the
+-- transition, exactly like the single-donation update. Donor and NGO
+-- counters are then adjusted once per donor/NGO with aggregated deltas and
+-- one activity entry is written per applied transition.
+--
+-- Returns one result per item: {"id", "result", ...} where result is
+-- "updated" (with "donation"), "not_found", "version_mismatch" or
+-- "conflict" (with "current_status").
+CREATE OR REPLACE FUNCTION bulk_update_donation_status(
+    updates JSONB,
+    staff_id_param UUID,
+    staff_name_param TEXT
+)
+RETURNS JSONB AS $$
+DECLARE
+    item JSONB;
+    target TEXT;
+    updated donations%ROWTYPE;
+    applied JSONB := '[]'::JSONB;
+    results JSONB := '[]'::JSONB;
+BEGIN
+    FOR item IN SELECT * FROM jsonb_array_elements(updates) LOOP
+        target := item->>'status';
+
+        UPDATE donations
+        SET status = target,
+            updated_at = NOW(),
+            decline_reason = CASE WHEN target = 'declined' THEN item->>'decline_reason' ELSE decline_reason END,
+            completed_at = CASE WHEN target = 'completed' THEN NOW() ELSE completed_at END,
+            completed_by_staff_id = CASE WHEN target = 'completed' THEN staff_id_param ELSE completed_by_staff_id END
+        WHERE id = (item->>'id')::UUID
+          AND status = ANY (CASE target
+                WHEN 'active' THEN ARRAY['pending']
+                WHEN 'completed' THEN ARRAY['active']
+                WHEN 'declined' THEN ARRAY['pending', 'active']
+                ELSE ARRAY[]::TEXT[]
+              END)
+          AND (item->>'version' IS NULL OR version = (item->>'version')::INTEGER)
+        RETURNING * INTO updated;
+
+        IF FOUND THEN
+            applied := applied || jsonb_build_object(
+                'id', updated.id,
+                'donor_id', updated.donor_id,
+                'ngo_id', updated.assigned_ngo_id,
+                'status', target,
+                'points', updated.points
+            );
+            results := results || jsonb_build_object(
+                'id', updated.id, 'result', 'updated', 'donation', to_jsonb(updated)
+            );
+        ELSE
+            SELECT * INTO updated FROM donations WHERE id = (item->>'id')::UUID;
+            IF NOT FOUND THEN
+                results := results || jsonb_build_object('id', item->>'id', 'result', 'not_found');
+            ELSIF item->>'version' IS NOT NULL AND updated.version <> (item->>'version')::INTEGER THEN
+                results := results || jsonb_build_object('id', item->>'id', 'result', 'version_mismatch');
+            ELSE
+                results := results || jsonb_build_object(
+                    'id', item->>'id', 'result', 'conflict', 'current_status', updated.status
+                );
+            END IF;
+        END IF;
+    END LOOP;
+
+    -- Donor counters, one update per donor
+    UPDATE users u
+    SET points = u.points + d.points,
+        total_donations = u.total_donations + d.completed,
+        active_donations = GREATEST(u.active_donations - d.closed, 0),
+        updated_at = NOW()
+    FROM (
+        SELECT a.donor_id,
+               SUM(CASE WHEN a.status = 'completed' THEN a.points ELSE 0 END) AS points,
+               COUNT(*) FILTER (WHERE a.status = 'completed') AS completed,
+               COUNT(*) FILTER (WHERE a.status IN ('completed', 'declined')) AS closed
+        FROM jsonb_to_recordset(applied) AS a(donor_id UUID, status TEXT, points INTEGER)
+        GROUP BY a.donor_id
+    ) d
+    WHERE u.id = d.donor_id
+      AND d.closed > 0;
+
+    -- NGO counters, one update per NGO
+    UPDATE ngos n
+    SET active_pickups = GREATEST(n.active_pickups - d.closed, 0),
+        completed_pickups = n.completed_pickups + d.completed,
+        updated_at = NOW()
+    FROM (
+        SELECT a.ngo_id,
+               COUNT(*) FILTER (WHERE a.status = 'completed') AS completed,
+               COUNT(*) FILTER (WHERE a.status IN ('completed', 'declined')) AS closed
+        FROM jsonb_to_recordset(applied) AS a(ngo_id UUID, status TEXT)
+        WHERE a.ngo_id IS NOT NULL
+        GROUP BY a.ngo_id
+    ) d
+    WHERE n.id = d.ngo_id
+      AND d.closed > 0;
+
+    -- Activity log, one entry per applied transition
+    INSERT INTO activity_log (action, description, user_id, user_name, target_id, target_type)
+    SELECT 'donation_' || a.status,
+           CASE WHEN a.status = 'completed'
+                THEN 'Donation completed!  Donor awarded ' || a.points || ' points.'
+                ELSE 'Donation ' || a.status
+           END,
+           staff_id_param,
+           staff_name_param,
+           a.id,
+           'donation'
+    FROM jsonb_to_recordset(applied) AS a(id UUID, status TEXT, points INTEGER);
+
+    RETURN results;
+END;
+$$ LANGUAGE plpgsql;
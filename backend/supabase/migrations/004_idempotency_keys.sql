@@ -0,0 +1,30 @@
+-- =====================================================
+-- IDEMPOTENCY KEYS
+-- =====================================================
+
+-- Responses of writes sent with an Idempotency-Key header, shared by all
+-- API workers (used when IDEMPOTENCY_BACKEND=database).
+--
+-- key is "<user id>:<operation>:<client key>"; fingerprint is a hash of the
+-- request payload so a key cannot be reused for a different request.
+-- state is "in_progress" until the first request finishes, then
+-- "completed" with the stored response, or "failed" with the stored error
+-- when it failed after writing. An in-progress key is leased until
+-- locked_until; if its worker dies, a retry can claim it once that passes.
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'in_progress' CHECK (state IN ('in_progress', 'completed', 'failed')),
+    response JSONB,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    expires_at TIMESTAMPTZ NOT NULL,
+    locked_until TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Expired keys are purged periodically by the API
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at ON idempotency_keys(expires_at);
+
+ALTER TABLE idempotency_keys ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY idempotency_keys_service_all ON idempotency_keys
+    FOR ALL USING (true);
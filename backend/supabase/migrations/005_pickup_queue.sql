@@ -0,0 +1,56 @@
+-- =====================================================
+-- PER-NGO PICKUP QUEUE
+-- =====================================================
+
+-- Sortable priority (high first); the text column sorts alphabetically
+ALTER TABLE donations ADD COLUMN IF NOT EXISTS priority_rank SMALLINT
+    GENERATED ALWAYS AS (
+        CASE priority WHEN 'high' THEN 0 WHEN 'medium' THEN 1 ELSE 2 END
+    ) STORED;
+
+-- Serves an NGO's pending donations in queue order straight from the index:
+-- WHERE assigned_ngo_id = ? AND status = 'pending' ORDER BY priority_rank, created_at, id
+CREATE INDEX IF NOT EXISTS idx_donations_ngo_queue
+    ON donations(assigned_ngo_id, status, priority_rank, created_at, id);
+
+-- Incremental fetching: an NGO's donations changed after a cursor
+CREATE INDEX IF NOT EXISTS idx_donations_ngo_updated
+    ON donations(assigned_ngo_id, updated_at, id);
+
+-- An NGO's donations changed after the (updated_at, id) cursor, in cursor
+-- order. Batch updates stamp many rows with the same updated_at, so the id
+-- breaks ties and paging always moves forward.
+CREATE OR REPLACE FUNCTION pickup_queue_changes(
+    ngo_id_param UUID,
+    after_updated_at_param TIMESTAMPTZ,
+    after_id_param UUID,
+    limit_param INTEGER
+)
+RETURNS SETOF donations AS $$
+    SELECT *
+    FROM donations
+    WHERE assigned_ngo_id = ngo_id_param
+      AND (updated_at, id) > (after_updated_at_param, after_id_param)
+    ORDER BY updated_at, id
+    LIMIT limit_param;
+$$ LANGUAGE sql STABLE;
+
+-- The page of an NGO's pending donations after the (priority_rank,
+-- created_at, id) keyset, in queue order. The id breaks ties between
+-- donations created at the same time.
+CREATE OR REPLACE FUNCTION pickup_queue_page(
+    ngo_id_param UUID,
+    after_priority_rank_param SMALLINT,
+    after_created_at_param TIMESTAMPTZ,
+    after_id_param UUID,
+    limit_param INTEGER
+)
+RETURNS SETOF donations AS $$
+    SELECT *
+    FROM donations
+    WHERE assigned_ngo_id = ngo_id_param
+      AND status = 'pending'
+      AND (priority_rank, created_at, id) > (after_priority_rank_param, after_created_at_param, after_id_param)
+    ORDER BY priority_rank, created_at, id
+    LIMIT limit_param;
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,43 @@
+-- =====================================================
+-- SERVER-SIDE MAP CLUSTERING
+-- =====================================================
+
+-- Aggregate pending/active donations inside a bounding box into square grid
+-- cells of cell_size_param degrees. Cells are identified by
+-- (floor(longitude / cell_size), floor(latitude / cell_size)); each row
+-- carries the number of donations, their total servings, the highest
+-- priority among them and their centroid (where to draw the cluster).
+CREATE OR REPLACE FUNCTION cluster_donations(
+    cell_size_param DOUBLE PRECISION,
+    min_lat_param DOUBLE PRECISION,
+    min_lng_param DOUBLE PRECISION,
+    max_lat_param DOUBLE PRECISION,
+    max_lng_param DOUBLE PRECISION
+)
+RETURNS TABLE (
+    cell_x BIGINT,
+    cell_y BIGINT,
+    count BIGINT,
+    volume_servings BIGINT,
+    highest_priority TEXT,
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION
+) AS $$
+    SELECT
+        FLOOR(d.longitude / cell_size_param)::BIGINT AS cell_x,
+        FLOOR(d.latitude / cell_size_param)::BIGINT AS cell_y,
+        COUNT(*) AS count,
+        SUM(d.volume_servings)::BIGINT AS volume_servings,
+        (ARRAY['high', 'medium', 'low'])[MIN(d.priority_rank) + 1] AS highest_priority,
+        AVG(d.latitude)::DOUBLE PRECISION AS latitude,
+        AVG(d.longitude)::DOUBLE PRECISION AS longitude
+    FROM donations d
+    WHERE d.status IN ('pending', 'active')
+      AND d.latitude >= min_lat_param AND d.latitude < max_lat_param
+      AND d.longitude >= min_lng_param AND d.longitude < max_lng_param
+    GROUP BY 1, 2;
+$$ LANGUAGE sql STABLE;
+
+-- Map queries only look at open donations
+CREATE INDEX IF NOT EXISTS idx_donations_open_location
+    ON donations(latitude, longitude) WHERE status IN ('pending', 'active');
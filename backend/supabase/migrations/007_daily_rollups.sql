@@ -0,0 +1,205 @@
+-- =====================================================
+-- DAILY DONATION ROLLUPS
+-- =====================================================
+
+-- Donation activity per day and NGO, for analytics over any date range
+-- without scanning donations. Rows are updated incrementally by
+-- record_donation_events() on every create and closing status transition;
+-- `python -m app.admin.backfill` rebuilds them from history.
+--
+-- day is the UTC date of the event: creation for donations_created,
+-- completion for donations_completed/servings_delivered/points_awarded,
+-- the status change for donations_declined. ngo_id is deliberately not a
+-- foreign key so history survives NGO deletion.
+CREATE TABLE IF NOT EXISTS donation_daily_stats (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    day DATE NOT NULL,
+    ngo_id UUID,
+    donations_created INTEGER NOT NULL DEFAULT 0,
+    donations_completed INTEGER NOT NULL DEFAULT 0,
+    donations_declined INTEGER NOT NULL DEFAULT 0,
+    servings_delivered INTEGER NOT NULL DEFAULT 0,
+    points_awarded INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    -- Also serves date range scans
+    UNIQUE NULLS NOT DISTINCT (day, ngo_id)
+);
+
+ALTER TABLE donation_daily_stats ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY donation_daily_stats_service_all ON donation_daily_stats
+    FOR ALL USING (true);
+
+-- Add donation events to the rollups.
+--
+-- events: [{"event": "created" | "completed" | "declined", "donation": <donations row>}]
+CREATE OR REPLACE FUNCTION record_donation_events(events JSONB)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO donation_daily_stats AS s (
+        day, ngo_id, donations_created, donations_completed, donations_declined,
+        servings_delivered, points_awarded
+    )
+    SELECT (CASE e.event
+                WHEN 'created' THEN (e.donation->>'created_at')::TIMESTAMPTZ
+                WHEN 'completed' THEN (e.donation->>'completed_at')::TIMESTAMPTZ
+                ELSE (e.donation->>'updated_at')::TIMESTAMPTZ
+            END AT TIME ZONE 'UTC')::DATE AS day,
+           (e.donation->>'assigned_ngo_id')::UUID AS ngo_id,
+           COUNT(*) FILTER (WHERE e.event = 'created'),
+           COUNT(*) FILTER (WHERE e.event = 'completed'),
+           COUNT(*) FILTER (WHERE e.event = 'declined'),
+           COALESCE(SUM((e.donation->>'volume_servings')::INTEGER) FILTER (WHERE e.event = 'completed'), 0),
+           COALESCE(SUM((e.donation->>'points')::INTEGER) FILTER (WHERE e.event = 'completed'), 0)
+    FROM jsonb_to_recordset(events) AS e(event TEXT, donation JSONB)
+    GROUP BY 1, 2
+    ON CONFLICT (day, ngo_id) DO UPDATE
+    SET donations_created = s.donations_created + EXCLUDED.donations_created,
+        donations_completed = s.donations_completed + EXCLUDED.donations_completed,
+        donations_declined = s.donations_declined + EXCLUDED.donations_declined,
+        servings_delivered = s.servings_delivered + EXCLUDED.servings_delivered,
+        points_awarded = s.points_awarded + EXCLUDED.points_awarded,
+        updated_at = NOW();
+END;
+$$ LANGUAGE plpgsql;
+
+-- Rollups summed per day over a date range, optionally for one NGO
+CREATE OR REPLACE FUNCTION donation_stats_by_day(
+    start_day_param DATE,
+    end_day_param DATE,
+    ngo_id_param UUID DEFAULT NULL
+)
+RETURNS TABLE (
+    day DATE,
+    donations_created BIGINT,
+    donations_completed BIGINT,
+    donations_declined BIGINT,
+    servings_delivered BIGINT,
+    points_awarded BIGINT
+) AS $$
+    SELECT s.day,
+           SUM(s.donations_created),
+           SUM(s.donations_completed),
+           SUM(s.donations_declined),
+           SUM(s.servings_delivered),
+           SUM(s.points_awarded)
+    FROM donation_daily_stats s
+    WHERE s.day BETWEEN start_day_param AND end_day_param
+      AND (ngo_id_param IS NULL OR s.ngo_id = ngo_id_param)
+    GROUP BY s.day
+    ORDER BY s.day;
+$$ LANGUAGE sql STABLE;
+
+-- Bulk status updates (003) also record their completions and declines
+CREATE OR REPLACE FUNCTION bulk_update_donation_status(
+    updates JSONB,
+    staff_id_param UUID,
+    staff_name_param TEXT
+)
+RETURNS JSONB AS $$
+DECLARE
+    item JSONB;
+    target TEXT;
+    updated donations%ROWTYPE;
+    applied JSONB := '[]'::JSONB;
+    results JSONB := '[]'::JSONB;
+    events JSONB := '[]'::JSONB;
+BEGIN
+    FOR item IN SELECT * FROM jsonb_array_elements(updates) LOOP
+        target := item->>'status';
+
+        UPDATE donations
+        SET status = target,
+            updated_at = NOW(),
+            decline_reason = CASE WHEN target = 'declined' THEN item->>'decline_reason' ELSE decline_reason END,
+            completed_at = CASE WHEN target = 'completed' THEN NOW() ELSE completed_at END,
+            completed_by_staff_id = CASE WHEN target = 'completed' THEN staff_id_param ELSE completed_by_staff_id END
+        WHERE id = (item->>'id')::UUID
+          AND status = ANY (CASE target
+                WHEN 'active' THEN ARRAY['pending']
+                WHEN 'completed' THEN ARRAY['active']
+                WHEN 'declined' THEN ARRAY['pending', 'active']
+                ELSE ARRAY[]::TEXT[]
+              END)
+          AND (item->>'version' IS NULL OR version = (item->>'version')::INTEGER)
+        RETURNING * INTO updated;
+
+        IF FOUND THEN
+            applied := applied || jsonb_build_object(
+                'id', updated.id,
+                'donor_id', updated.donor_id,
+                'ngo_id', updated.assigned_ngo_id,
+                'status', target,
+                'points', updated.points
+            );
+            results := results || jsonb_build_object(
+                'id', updated.id, 'result', 'updated', 'donation', to_jsonb(updated)
+            );
+            IF target IN ('completed', 'declined') THEN
+                events := events || jsonb_build_object('event', target, 'donation', to_jsonb(updated));
+            END IF;
+        ELSE
+            SELECT * INTO updated FROM donations WHERE id = (item->>'id')::UUID;
+            IF NOT FOUND THEN
+                results := results || jsonb_build_object('id', item->>'id', 'result', 'not_found');
+            ELSIF item->>'version' IS NOT NULL AND updated.version <> (item->>'version')::INTEGER THEN
+                results := results || jsonb_build_object('id', item->>'id', 'result', 'version_mismatch');
+            ELSE
+                results := results || jsonb_build_object(
+                    'id', item->>'id', 'result', 'conflict', 'current_status', updated.status
+                );
+            END IF;
+        END IF;
+    END LOOP;
+
+    -- Donor counters, one update per donor
+    UPDATE users u
+    SET points = u.points + d.points,
+        total_donations = u.total_donations + d.completed,
+        active_donations = GREATEST(u.active_donations - d.closed, 0),
+        updated_at = NOW()
+    FROM (
+        SELECT a.donor_id,
+               SUM(CASE WHEN a.status = 'completed' THEN a.points ELSE 0 END) AS points,
+               COUNT(*) FILTER (WHERE a.status = 'completed') AS completed,
+               COUNT(*) FILTER (WHERE a.status IN ('completed', 'declined')) AS closed
+        FROM jsonb_to_recordset(applied) AS a(donor_id UUID, status TEXT, points INTEGER)
+        GROUP BY a.donor_id
+    ) d
+    WHERE u.id = d.donor_id
+      AND d.closed > 0;
+
+    -- NGO counters, one update per NGO
+    UPDATE ngos n
+    SET active_pickups = GREATEST(n.active_pickups - d.closed, 0),
+        completed_pickups = n.completed_pickups + d.completed,
+        updated_at = NOW()
+    FROM (
+        SELECT a.ngo_id,
+               COUNT(*) FILTER (WHERE a.status = 'completed') AS completed,
+               COUNT(*) FILTER (WHERE a.status IN ('completed', 'declined')) AS closed
+        FROM jsonb_to_recordset(applied) AS a(ngo_id UUID, status TEXT)
+        WHERE a.ngo_id IS NOT NULL
+        GROUP BY a.ngo_id
+    ) d
+    WHERE n.id = d.ngo_id
+      AND d.closed > 0;
+
+    -- Activity log, one entry per applied transition
+    INSERT INTO activity_log (action, description, user_id, user_name, target_id, target_type)
+    SELECT 'donation_' || a.status,
+           CASE WHEN a.status = 'completed'
+                THEN 'Donation completed!  Donor awarded ' || a.points || ' points.'
+                ELSE 'Donation ' || a.status
+           END,
+           staff_id_param,
+           staff_name_param,
+           a.id,
+           'donation'
+    FROM jsonb_to_recordset(applied) AS a(id UUID, status TEXT, points INTEGER);
+
+    PERFORM record_donation_events(events);
+
+    RETURN results;
+END;
+$$ LANGUAGE plpgsql;
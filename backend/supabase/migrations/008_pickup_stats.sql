@@ -0,0 +1,120 @@
+-- =====================================================
+-- NGO AND STAFF PICKUP PERFORMANCE
+-- =====================================================
+
+-- Running totals per NGO, updated as its donations are completed or
+-- declined. Average time to pickup (creation to completion) is
+-- total_pickup_seconds / completed_pickups.
+CREATE TABLE IF NOT EXISTS ngo_pickup_stats (
+    ngo_id UUID PRIMARY KEY REFERENCES ngos(id) ON DELETE CASCADE,
+    completed_pickups INTEGER NOT NULL DEFAULT 0,
+    declined_pickups INTEGER NOT NULL DEFAULT 0,
+    servings_delivered INTEGER NOT NULL DEFAULT 0,
+    total_pickup_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Running totals per staff member and NGO, from completed_by_staff_id
+CREATE TABLE IF NOT EXISTS staff_pickup_stats (
+    ngo_id UUID NOT NULL REFERENCES ngos(id) ON DELETE CASCADE,
+    staff_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    completed_pickups INTEGER NOT NULL DEFAULT 0,
+    servings_delivered INTEGER NOT NULL DEFAULT 0,
+    total_pickup_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    last_completed_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (ngo_id, staff_id)
+);
+
+ALTER TABLE ngo_pickup_stats ENABLE ROW LEVEL SECURITY;
+ALTER TABLE staff_pickup_stats ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY ngo_pickup_stats_service_all ON ngo_pickup_stats
+    FOR ALL USING (true);
+CREATE POLICY staff_pickup_stats_service_all ON staff_pickup_stats
+    FOR ALL USING (true);
+
+-- Add completions and declines to the NGO and staff totals.
+--
+-- events: as for record_donation_events(); "created" events and donations
+-- without an NGO are ignored.
+CREATE OR REPLACE FUNCTION record_pickup_stats(events JSONB)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO ngo_pickup_stats AS s (
+        ngo_id, completed_pickups, declined_pickups, servings_delivered, total_pickup_seconds
+    )
+    SELECT (e.donation->>'assigned_ngo_id')::UUID,
+           COUNT(*) FILTER (WHERE e.event = 'completed'),
+           COUNT(*) FILTER (WHERE e.event = 'declined'),
+           COALESCE(SUM((e.donation->>'volume_servings')::INTEGER) FILTER (WHERE e.event = 'completed'), 0),
+           COALESCE(SUM(EXTRACT(EPOCH FROM (e.donation->>'completed_at')::TIMESTAMPTZ
+                                         - (e.donation->>'created_at')::TIMESTAMPTZ))
+                    FILTER (WHERE e.event = 'completed'), 0)
+    FROM jsonb_to_recordset(events) AS e(event TEXT, donation JSONB)
+    WHERE e.event IN ('completed', 'declined')
+      AND e.donation->>'assigned_ngo_id' IS NOT NULL
+    GROUP BY 1
+    ON CONFLICT (ngo_id) DO UPDATE
+    SET completed_pickups = s.completed_pickups + EXCLUDED.completed_pickups,
+        declined_pickups = s.declined_pickups + EXCLUDED.declined_pickups,
+        servings_delivered = s.servings_delivered + EXCLUDED.servings_delivered,
+        total_pickup_seconds = s.total_pickup_seconds + EXCLUDED.total_pickup_seconds,
+        updated_at = NOW();
+
+    INSERT INTO staff_pickup_stats AS s (
+        ngo_id, staff_id, completed_pickups, servings_delivered, total_pickup_seconds, last_completed_at
+    )
+    SELECT (e.donation->>'assigned_ngo_id')::UUID,
+           (e.donation->>'completed_by_staff_id')::UUID,
+           COUNT(*),
+           SUM((e.donation->>'volume_servings')::INTEGER),
+           SUM(EXTRACT(EPOCH FROM (e.donation->>'completed_at')::TIMESTAMPTZ
+                               - (e.donation->>'created_at')::TIMESTAMPTZ)),
+           MAX((e.donation->>'completed_at')::TIMESTAMPTZ)
+    FROM jsonb_to_recordset(events) AS e(event TEXT, donation JSONB)
+    WHERE e.event = 'completed'
+      AND e.donation->>'assigned_ngo_id' IS NOT NULL
+      AND e.donation->>'completed_by_staff_id' IS NOT NULL
+    GROUP BY 1, 2
+    ON CONFLICT (ngo_id, staff_id) DO UPDATE
+    SET completed_pickups = s.completed_pickups + EXCLUDED.completed_pickups,
+        servings_delivered = s.servings_delivered + EXCLUDED.servings_delivered,
+        total_pickup_seconds = s.total_pickup_seconds + EXCLUDED.total_pickup_seconds,
+        last_completed_at = GREATEST(s.last_completed_at, EXCLUDED.last_completed_at),
+        updated_at = NOW();
+END;
+$$ LANGUAGE plpgsql;
+
+-- Donation events (007) now also feed the NGO and staff totals
+CREATE OR REPLACE FUNCTION record_donation_events(events JSONB)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO donation_daily_stats AS s (
+        day, ngo_id, donations_created, donations_completed, donations_declined,
+        servings_delivered, points_awarded
+    )
+    SELECT (CASE e.event
+                WHEN 'created' THEN (e.donation->>'created_at')::TIMESTAMPTZ
+                WHEN 'completed' THEN (e.donation->>'completed_at')::TIMESTAMPTZ
+                ELSE (e.donation->>'updated_at')::TIMESTAMPTZ
+            END AT TIME ZONE 'UTC')::DATE AS day,
+           (e.donation->>'assigned_ngo_id')::UUID AS ngo_id,
+           COUNT(*) FILTER (WHERE e.event = 'created'),
+           COUNT(*) FILTER (WHERE e.event = 'completed'),
+           COUNT(*) FILTER (WHERE e.event = 'declined'),
+           COALESCE(SUM((e.donation->>'volume_servings')::INTEGER) FILTER (WHERE e.event = 'completed'), 0),
+           COALESCE(SUM((e.donation->>'points')::INTEGER) FILTER (WHERE e.event = 'completed'), 0)
+    FROM jsonb_to_recordset(events) AS e(event TEXT, donation JSONB)
+    GROUP BY 1, 2
+    ON CONFLICT (day, ngo_id) DO UPDATE
+    SET donations_created = s.donations_created + EXCLUDED.donations_created,
+        donations_completed = s.donations_completed + EXCLUDED.donations_completed,
+        donations_declined = s.donations_declined + EXCLUDED.donations_declined,
+        servings_delivered = s.servings_delivered + EXCLUDED.servings_delivered,
+        points_awarded = s.points_awarded + EXCLUDED.points_awarded,
+        updated_at = NOW();
+
+    PERFORM record_pickup_stats(events);
+END;
+$$ LANGUAGE plpgsql;
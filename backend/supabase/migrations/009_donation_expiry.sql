@@ -0,0 +1,91 @@
+-- =====================================================
+-- EXPIRY OF STALE PENDING DONATIONS
+-- =====================================================
+
+-- Finds the oldest pending donations without scanning closed ones
+CREATE INDEX IF NOT EXISTS idx_donations_status_created ON donations(status, created_at);
+
+-- Decline up to batch_size_param pending donations created before their
+-- priority's cutoff (a NULL cutoff keeps that priority), in one statement.
+--
+-- Donor and NGO counters are adjusted once per donor/NGO, the rollups and
+-- pickup totals are updated, and one activity entry covers the batch.
+-- Rows locked by a concurrent transaction are skipped, so several workers
+-- can run this at once. Returns the number of donations declined.
+CREATE OR REPLACE FUNCTION expire_pending_donations(
+    high_cutoff_param TIMESTAMPTZ,
+    medium_cutoff_param TIMESTAMPTZ,
+    low_cutoff_param TIMESTAMPTZ,
+    batch_size_param INTEGER,
+    reason_param TEXT
+)
+RETURNS INTEGER AS $$
+DECLARE
+    expired JSONB;
+    expired_count INTEGER;
+BEGIN
+    WITH stale AS (
+        SELECT id
+        FROM donations
+        WHERE status = 'pending'
+          AND created_at < GREATEST(high_cutoff_param, medium_cutoff_param, low_cutoff_param)
+          AND created_at < CASE priority
+                WHEN 'high' THEN high_cutoff_param
+                WHEN 'medium' THEN medium_cutoff_param
+                ELSE low_cutoff_param
+              END
+        ORDER BY created_at
+        LIMIT batch_size_param
+        FOR UPDATE SKIP LOCKED
+    ), declined AS (
+        UPDATE donations d
+        SET status = 'declined',
+            decline_reason = reason_param,
+            updated_at = NOW()
+        FROM stale
+        WHERE d.id = stale.id
+        RETURNING d.*
+    )
+    SELECT COALESCE(jsonb_agg(to_jsonb(declined)), '[]'::JSONB) INTO expired FROM declined;
+
+    expired_count := jsonb_array_length(expired);
+    IF expired_count = 0 THEN
+        RETURN 0;
+    END IF;
+
+    UPDATE users u
+    SET active_donations = GREATEST(u.active_donations - d.closed, 0),
+        updated_at = NOW()
+    FROM (
+        SELECT e.donor_id, COUNT(*) AS closed
+        FROM jsonb_to_recordset(expired) AS e(donor_id UUID)
+        GROUP BY e.donor_id
+    ) d
+    WHERE u.id = d.donor_id;
+
+    UPDATE ngos n
+    SET active_pickups = GREATEST(n.active_pickups - d.closed, 0),
+        updated_at = NOW()
+    FROM (
+        SELECT e.assigned_ngo_id, COUNT(*) AS closed
+        FROM jsonb_to_recordset(expired) AS e(assigned_ngo_id UUID)
+        WHERE e.assigned_ngo_id IS NOT NULL
+        GROUP BY e.assigned_ngo_id
+    ) d
+    WHERE n.id = d.assigned_ngo_id;
+
+    PERFORM record_donation_events((
+        SELECT jsonb_agg(jsonb_build_object('event', 'declined', 'donation', e.donation))
+        FROM jsonb_array_elements(expired) AS e(donation)
+    ));
+
+    INSERT INTO activity_log (action, description, target_type)
+    VALUES (
+        'donations_expired',
+        expired_count || ' pending donations expired',
+        'donation'
+    );
+
+    RETURN expired_count;
+END;
+$$ LANGUAGE plpgsql;
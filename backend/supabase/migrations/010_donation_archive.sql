@@ -0,0 +1,116 @@
+-- =====================================================
+-- DONATION ARCHIVE
+-- =====================================================
+
+-- Completed and declined donations older than DONATION_ARCHIVE_AFTER_DAYS
+-- are moved here by archive_donations(), so the donations table only holds
+-- recent activity. Same columns as donations (priority_rank becomes a plain
+-- column), plus archived_at.
+CREATE TABLE IF NOT EXISTS donations_archive (LIKE donations INCLUDING DEFAULTS);
+
+ALTER TABLE donations_archive ADD COLUMN IF NOT EXISTS archived_at TIMESTAMPTZ DEFAULT NOW();
+ALTER TABLE donations_archive ADD PRIMARY KEY (id);
+ALTER TABLE donations_archive
+    ADD FOREIGN KEY (donor_id) REFERENCES users(id) ON DELETE CASCADE,
+    ADD FOREIGN KEY (assigned_ngo_id) REFERENCES ngos(id) ON DELETE SET NULL,
+    ADD FOREIGN KEY (completed_by_staff_id) REFERENCES users(id) ON DELETE SET NULL;
+
+-- Donor history pages
+CREATE INDEX IF NOT EXISTS idx_donations_archive_donor ON donations_archive(donor_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_donations_archive_created ON donations_archive(created_at);
+
+ALTER TABLE donations_archive ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY donations_archive_service_all ON donations_archive
+    FOR ALL USING (true);
+
+-- Hot and archived donations together, for history reads (lists, counts,
+-- details). Filters on donor_id, status or created_at are pushed down into
+-- both tables. Columns are listed by name, so the two tables may order them
+-- differently; add new donations columns here and in archive_donations().
+CREATE OR REPLACE VIEW all_donations AS
+    SELECT id, donor_id, donor_name, image_url, address, latitude, longitude,
+           volume, volume_servings, priority, status, points, description,
+           decline_reason, assigned_ngo_id, completed_by_staff_id,
+           created_at, updated_at, completed_at, version, priority_rank,
+           NULL::TIMESTAMPTZ AS archived_at
+    FROM donations
+    UNION ALL
+    SELECT id, donor_id, donor_name, image_url, address, latitude, longitude,
+           volume, volume_servings, priority, status, points, description,
+           decline_reason, assigned_ngo_id, completed_by_staff_id,
+           created_at, updated_at, completed_at, version, priority_rank,
+           archived_at
+    FROM donations_archive;
+
+-- Number of donations and sum of their points per status, optionally for
+-- one donor. Only the hot table is read unless include_archived_param is
+-- set (lifetime totals), so list badges stay cheap as the archive grows.
+CREATE OR REPLACE FUNCTION donation_status_counts(
+    donor_id_param UUID DEFAULT NULL,
+    include_archived_param BOOLEAN DEFAULT FALSE
+)
+RETURNS TABLE (
+    status VARCHAR,
+    donations BIGINT,
+    points BIGINT
+) AS $$
+    SELECT s.status, SUM(s.donations)::BIGINT, SUM(s.points)::BIGINT
+    FROM (
+        SELECT d.status, COUNT(*) AS donations, COALESCE(SUM(d.points), 0) AS points
+        FROM donations d
+        WHERE donor_id_param IS NULL OR d.donor_id = donor_id_param
+        GROUP BY d.status
+        UNION ALL
+        SELECT a.status, COUNT(*), COALESCE(SUM(a.points), 0)
+        FROM donations_archive a
+        WHERE include_archived_param
+          AND (donor_id_param IS NULL OR a.donor_id = donor_id_param)
+        GROUP BY a.status
+    ) s
+    GROUP BY s.status;
+$$ LANGUAGE sql STABLE;
+
+-- Move up to batch_size_param completed/declined donations created before
+-- cutoff_param to the archive, oldest first, in one statement. Rows locked
+-- by a concurrent transaction are skipped. Returns the number moved.
+CREATE OR REPLACE FUNCTION archive_donations(
+    cutoff_param TIMESTAMPTZ,
+    batch_size_param INTEGER
+)
+RETURNS INTEGER AS $$
+DECLARE
+    moved_count INTEGER;
+BEGIN
+    WITH doomed AS (
+        SELECT id
+        FROM donations
+        WHERE status IN ('completed', 'declined')
+          AND created_at < cutoff_param
+        ORDER BY created_at
+        LIMIT batch_size_param
+        FOR UPDATE SKIP LOCKED
+    ), moved AS (
+        DELETE FROM donations d
+        USING doomed
+        WHERE d.id = doomed.id
+        RETURNING d.*
+    )
+    INSERT INTO donations_archive (
+        id, donor_id, donor_name, image_url, address, latitude, longitude,
+        volume, volume_servings, priority, status, points, description,
+        decline_reason, assigned_ngo_id, completed_by_staff_id,
+        created_at, updated_at, completed_at, version, priority_rank,
+        archived_at
+    )
+    SELECT id, donor_id, donor_name, image_url, address, latitude, longitude,
+           volume, volume_servings, priority, status, points, description,
+           decline_reason, assigned_ngo_id, completed_by_staff_id,
+           created_at, updated_at, completed_at, version, priority_rank,
+           NOW()
+    FROM moved;
+
+    GET DIAGNOSTICS moved_count = ROW_COUNT;
+    RETURN moved_count;
+END;
+$$ LANGUAGE plpgsql;
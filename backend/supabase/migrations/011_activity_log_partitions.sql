@@ -0,0 +1,128 @@
+-- =====================================================
+-- MONTHLY ACTIVITY LOG PARTITIONS
+-- =====================================================
+
+-- activity_log becomes a table partitioned by month of created_at
+-- (partitions named activity_log_yYYYYmMM). Inserts only touch the current
+-- month's small indexes, and old months are removed by dropping their
+-- partition instead of a DELETE. The retention job
+-- (app/admin/retention.py) creates partitions ahead of time and drops
+-- those older than ACTIVITY_LOG_RETENTION_MONTHS.
+
+-- Create the monthly partitions from from_month_param (default: this month)
+-- through months_ahead_param months from now. Entries of a new month that
+-- already landed in activity_log_default are moved into its partition.
+--
+-- The partition functions run DDL, so they execute as their owner
+-- (SECURITY DEFINER) with a fixed search_path.
+CREATE OR REPLACE FUNCTION ensure_activity_log_partitions(
+    months_ahead_param INTEGER DEFAULT 2,
+    from_month_param DATE DEFAULT NULL
+)
+RETURNS VOID AS $$
+DECLARE
+    month DATE;
+    last_month DATE;
+    partition TEXT;
+    month_start TIMESTAMPTZ;
+    month_end TIMESTAMPTZ;
+BEGIN
+    month := date_trunc('month', COALESCE(from_month_param, (NOW() AT TIME ZONE 'UTC')::DATE))::DATE;
+    last_month := (date_trunc('month', NOW() AT TIME ZONE 'UTC') + make_interval(months => months_ahead_param))::DATE;
+    WHILE month <= last_month LOOP
+        partition := 'activity_log_y' || to_char(month, 'YYYY') || 'm' || to_char(month, 'MM');
+        month_start := month::TIMESTAMP AT TIME ZONE 'UTC';
+        month_end := (month + INTERVAL '1 month')::TIMESTAMP AT TIME ZONE 'UTC';
+        IF to_regclass(partition) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I (LIKE activity_log INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', partition
+            );
+            EXECUTE format(
+                'WITH moved AS (
+                     DELETE FROM activity_log_default WHERE created_at >= %L AND created_at < %L RETURNING *
+                 )
+                 INSERT INTO %I (id, action, description, user_id, user_name, target_id, target_type, created_at)
+                 SELECT id, action, description, user_id, user_name, target_id, target_type, created_at FROM moved',
+                month_start, month_end, partition
+            );
+            EXECUTE format(
+                'ALTER TABLE activity_log ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                partition, month_start, month_end
+            );
+        END IF;
+        month := (month + INTERVAL '1 month')::DATE;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public, pg_temp;
+
+-- Existing monthly partitions with the month they hold (the default
+-- partition is not listed)
+CREATE OR REPLACE FUNCTION list_activity_log_partitions()
+RETURNS TABLE (partition_name TEXT, month DATE) AS $$
+    SELECT c.relname::TEXT, to_date(right(c.relname, 7), 'YYYY"m"MM')
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'activity_log'::REGCLASS
+      AND c.relname ~ '^activity_log_y[0-9]{4}m[0-9]{2}$'
+    ORDER BY 2;
+$$ LANGUAGE sql STABLE;
+
+-- Detach and drop one month's partition; returns false if it did not exist
+CREATE OR REPLACE FUNCTION drop_activity_log_partition(month_param DATE)
+RETURNS BOOLEAN AS $$
+DECLARE
+    partition TEXT := 'activity_log_y' || to_char(month_param, 'YYYY') || 'm' || to_char(month_param, 'MM');
+BEGIN
+    IF to_regclass(partition) IS NULL THEN
+        RETURN FALSE;
+    END IF;
+    EXECUTE format('ALTER TABLE activity_log DETACH PARTITION %I', partition);
+    EXECUTE format('DROP TABLE %I', partition);
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public, pg_temp;
+
+-- Only the service role maintains partitions
+REVOKE EXECUTE ON FUNCTION ensure_activity_log_partitions(INTEGER, DATE) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION drop_activity_log_partition(DATE) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION ensure_activity_log_partitions(INTEGER, DATE) TO service_role;
+GRANT EXECUTE ON FUNCTION drop_activity_log_partition(DATE) TO service_role;
+
+-- Move the existing log into a partitioned table of the same shape (the
+-- partition key has to be part of the primary key)
+ALTER TABLE activity_log RENAME TO activity_log_legacy;
+ALTER TABLE activity_log_legacy RENAME CONSTRAINT activity_log_pkey TO activity_log_legacy_pkey;
+ALTER INDEX idx_activity_created RENAME TO idx_activity_legacy_created;
+
+CREATE TABLE activity_log (
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    action VARCHAR(50) NOT NULL,
+    description TEXT,
+    user_id UUID REFERENCES users(id) ON DELETE SET NULL,
+    user_name VARCHAR(255),
+    target_id UUID,
+    target_type VARCHAR(50),
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE INDEX IF NOT EXISTS idx_activity_created ON activity_log(created_at DESC);
+
+-- Catches entries of months without a partition (e.g. when the retention
+-- job has not run), so inserts never fail for lack of one
+CREATE TABLE IF NOT EXISTS activity_log_default PARTITION OF activity_log DEFAULT;
+
+SELECT ensure_activity_log_partitions(
+    2, (SELECT MIN(created_at) AT TIME ZONE 'UTC' FROM activity_log_legacy)::DATE
+);
+
+INSERT INTO activity_log (id, action, description, user_id, user_name, target_id, target_type, created_at)
+SELECT id, action, description, user_id, user_name, target_id, target_type, COALESCE(created_at, NOW())
+FROM activity_log_legacy;
+
+DROP TABLE activity_log_legacy;
+
+ALTER TABLE activity_log ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY activity_log_service_all ON activity_log
+    FOR ALL USING (true);
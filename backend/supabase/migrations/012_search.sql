@@ -0,0 +1,108 @@
+-- =====================================================
+-- SEARCH
+-- =====================================================
+
+-- Fuzzy matching with trigrams: `query <% text` matches when the query is
+-- similar to some part of text (word_similarity above
+-- pg_trgm.word_similarity_threshold, 0.6 by default), and is answered from
+-- the GIN trigram indexes below, as are the ILIKE prefix lookups used for
+-- autocomplete.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_donations_address_trgm ON donations USING GIN (address gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_donations_description_trgm ON donations USING GIN (description gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_donations_donor_name_trgm ON donations USING GIN (donor_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_ngos_name_trgm ON ngos USING GIN (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_ngos_address_trgm ON ngos USING GIN (address gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_ngos_email_trgm ON ngos USING GIN (email gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_users_full_name_trgm ON users USING GIN (full_name gin_trgm_ops);
+
+-- Ranked fuzzy search over donations (address, description, donor name),
+-- NGOs (name, address, email) and users (full name).
+--
+-- kinds_param selects "donation", "ngo" and/or "user"; donations can be
+-- restricted to statuses_param and to one donor (NULL: no restriction).
+-- Results are ordered by best word similarity of any searched column.
+CREATE OR REPLACE FUNCTION search_entities(
+    query_param TEXT,
+    kinds_param TEXT[],
+    statuses_param TEXT[] DEFAULT NULL,
+    donor_id_param UUID DEFAULT NULL,
+    limit_param INTEGER DEFAULT 20,
+    offset_param INTEGER DEFAULT 0
+)
+RETURNS TABLE (kind TEXT, id UUID, title TEXT, subtitle TEXT, score REAL) AS $$
+    SELECT r.kind, r.id, r.title, r.subtitle, r.score
+    FROM (
+        SELECT 'donation' AS kind, d.id, d.donor_name::TEXT AS title, d.address AS subtitle,
+               GREATEST(
+                   word_similarity(query_param, d.address),
+                   word_similarity(query_param, COALESCE(d.description, '')),
+                   word_similarity(query_param, d.donor_name)
+               ) AS score
+        FROM donations d
+        WHERE 'donation' = ANY (kinds_param)
+          AND (query_param <% d.address OR query_param <% d.description OR query_param <% d.donor_name)
+          AND (statuses_param IS NULL OR d.status = ANY (statuses_param))
+          AND (donor_id_param IS NULL OR d.donor_id = donor_id_param)
+        UNION ALL
+        SELECT 'ngo', n.id, n.name::TEXT, n.address,
+               GREATEST(
+                   word_similarity(query_param, n.name),
+                   word_similarity(query_param, n.address),
+                   word_similarity(query_param, n.email)
+               )
+        FROM ngos n
+        WHERE 'ngo' = ANY (kinds_param)
+          AND (query_param <% n.name OR query_param <% n.address OR query_param <% n.email)
+        UNION ALL
+        SELECT 'user', u.id, u.full_name::TEXT, u.role::TEXT, word_similarity(query_param, u.full_name)
+        FROM users u
+        WHERE 'user' = ANY (kinds_param)
+          AND query_param <% u.full_name
+    ) r
+    ORDER BY r.score DESC, r.title, r.id
+    LIMIT limit_param
+    OFFSET offset_param;
+$$ LANGUAGE sql STABLE;
+
+-- LIKE pattern matching value literally
+CREATE OR REPLACE FUNCTION escape_like(value TEXT)
+RETURNS TEXT AS $$
+    SELECT replace(replace(replace(value, '\', '\\'), '%', '\%'), '_', '\_');
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Labels with a word starting with prefix_param, shortest first, for
+-- autocomplete: donation addresses, NGO names and user names, with the
+-- same kind/status/donor restrictions as search_entities(). Wildcards in
+-- the prefix are matched literally.
+CREATE OR REPLACE FUNCTION search_autocomplete(
+    prefix_param TEXT,
+    kinds_param TEXT[],
+    statuses_param TEXT[] DEFAULT NULL,
+    donor_id_param UUID DEFAULT NULL,
+    limit_param INTEGER DEFAULT 10
+)
+RETURNS TABLE (kind TEXT, id UUID, label TEXT) AS $$
+    SELECT r.kind, r.id, r.label
+    FROM (
+        SELECT 'donation' AS kind, d.id, d.address AS label
+        FROM donations d
+        WHERE 'donation' = ANY (kinds_param)
+          AND (d.address ILIKE escape_like(prefix_param) || '%' OR d.address ILIKE '% ' || escape_like(prefix_param) || '%')
+          AND (statuses_param IS NULL OR d.status = ANY (statuses_param))
+          AND (donor_id_param IS NULL OR d.donor_id = donor_id_param)
+        UNION ALL
+        SELECT 'ngo', n.id, n.name::TEXT
+        FROM ngos n
+        WHERE 'ngo' = ANY (kinds_param)
+          AND (n.name ILIKE escape_like(prefix_param) || '%' OR n.name ILIKE '% ' || escape_like(prefix_param) || '%')
+        UNION ALL
+        SELECT 'user', u.id, u.full_name::TEXT
+        FROM users u
+        WHERE 'user' = ANY (kinds_param)
+          AND (u.full_name ILIKE escape_like(prefix_param) || '%' OR u.full_name ILIKE '% ' || escape_like(prefix_param) || '%')
+    ) r
+    ORDER BY length(r.label), r.label, r.id
+    LIMIT limit_param;
+$$ LANGUAGE sql STABLE;
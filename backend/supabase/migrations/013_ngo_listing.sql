@@ -0,0 +1,116 @@
+-- =====================================================
+-- PAGINATED NGO LISTING
+-- =====================================================
+
+-- Great-circle distance in kilometres between two points
+CREATE OR REPLACE FUNCTION distance_km(
+    lat1 DOUBLE PRECISION,
+    lng1 DOUBLE PRECISION,
+    lat2 DOUBLE PRECISION,
+    lng2 DOUBLE PRECISION
+)
+RETURNS DOUBLE PRECISION AS $$
+    SELECT 2 * 6371 * asin(sqrt(
+        power(sin(radians(lat2 - lat1) / 2), 2)
+        + cos(radians(lat1)) * cos(radians(lat2)) * power(sin(radians(lng2 - lng1) / 2), 2)
+    ));
+$$ LANGUAGE sql IMMUTABLE;
+
+-- One page of NGOs for the admin NGO page, with the size of the whole
+-- filtered list (total_count) and, for the NGOs on the page only, their
+-- number of staff members and of staff who completed a pickup since
+-- staff_active_since_param.
+--
+-- Filters (NULL: not applied): search_param matches name, email or address
+-- anywhere (served by the trigram indexes of 012); active pickups between
+-- min_active_param and max_active_param; within radius_km_param of
+-- (lat_param, lng_param). distance_km is set when lat_param/lng_param are.
+--
+-- sort_param is 'created_at', 'name', 'load' (active_pickups) or
+-- 'distance'; ties are broken by id so pages are stable. NGOs without
+-- coordinates have no distance and come last when sorting by it.
+CREATE OR REPLACE FUNCTION list_ngos(
+    search_param TEXT DEFAULT NULL,
+    min_active_param INTEGER DEFAULT NULL,
+    max_active_param INTEGER DEFAULT NULL,
+    lat_param DOUBLE PRECISION DEFAULT NULL,
+    lng_param DOUBLE PRECISION DEFAULT NULL,
+    radius_km_param DOUBLE PRECISION DEFAULT NULL,
+    staff_active_since_param TIMESTAMPTZ DEFAULT NULL,
+    sort_param TEXT DEFAULT 'created_at',
+    descending_param BOOLEAN DEFAULT TRUE,
+    limit_param INTEGER DEFAULT 20,
+    offset_param INTEGER DEFAULT 0
+)
+RETURNS TABLE (
+    id UUID,
+    name VARCHAR,
+    address TEXT,
+    email VARCHAR,
+    phone VARCHAR,
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION,
+    staff_count INTEGER,
+    completed_pickups INTEGER,
+    active_pickups INTEGER,
+    created_at TIMESTAMPTZ,
+    distance_km DOUBLE PRECISION,
+    staff_total BIGINT,
+    staff_active BIGINT,
+    total_count BIGINT
+) AS $$
+    WITH matched AS (
+        SELECT n.*,
+               CASE WHEN lat_param IS NOT NULL AND lng_param IS NOT NULL
+                    THEN distance_km(lat_param, lng_param, n.latitude, n.longitude)
+               END AS distance
+        FROM ngos n
+        WHERE (search_param IS NULL
+               OR n.name ILIKE '%' || escape_like(search_param) || '%'
+               OR n.email ILIKE '%' || escape_like(search_param) || '%'
+               OR n.address ILIKE '%' || escape_like(search_param) || '%')
+          AND (min_active_param IS NULL OR n.active_pickups >= min_active_param)
+          AND (max_active_param IS NULL OR n.active_pickups <= max_active_param)
+          -- Latitude band around the radius (111 km per degree) for the index
+          AND (radius_km_param IS NULL
+               OR n.latitude BETWEEN lat_param - radius_km_param / 111.0 AND lat_param + radius_km_param / 111.0)
+    ),
+    page AS (
+        SELECT m.*,
+               COUNT(*) OVER () AS total_count,
+               ROW_NUMBER() OVER (ORDER BY
+                   CASE WHEN sort_param = 'load' AND NOT descending_param THEN m.active_pickups END ASC,
+                   CASE WHEN sort_param = 'load' AND descending_param THEN m.active_pickups END DESC,
+                   CASE WHEN sort_param = 'distance' AND NOT descending_param THEN m.distance END ASC NULLS LAST,
+                   CASE WHEN sort_param = 'distance' AND descending_param THEN m.distance END DESC NULLS LAST,
+                   CASE WHEN sort_param = 'name' AND NOT descending_param THEN m.name END ASC,
+                   CASE WHEN sort_param = 'name' AND descending_param THEN m.name END DESC,
+                   CASE WHEN NOT descending_param THEN m.created_at END ASC,
+                   CASE WHEN descending_param THEN m.created_at END DESC,
+                   m.id
+               ) AS position
+        FROM matched m
+        WHERE radius_km_param IS NULL OR m.distance <= radius_km_param
+        ORDER BY position
+        LIMIT limit_param
+        OFFSET offset_param
+    )
+    SELECT p.id, p.name, p.address, p.email, p.phone,
+           p.latitude::DOUBLE PRECISION, p.longitude::DOUBLE PRECISION,
+           p.staff_count, p.completed_pickups, p.active_pickups, p.created_at,
+           p.distance, COALESCE(s.staff_total, 0), COALESCE(s.staff_active, 0), p.total_count
+    FROM page p
+    LEFT JOIN LATERAL (
+        SELECT COUNT(*) AS staff_total,
+               COUNT(*) FILTER (WHERE sp.last_completed_at >= staff_active_since_param) AS staff_active
+        FROM users u
+        LEFT JOIN staff_pickup_stats sp ON sp.ngo_id = p.id AND sp.staff_id = u.id
+        WHERE u.ngo_id = p.id AND u.role = 'staff'
+    ) s ON TRUE
+    ORDER BY p.position;
+$$ LANGUAGE sql STABLE;
+
+-- Sorting by load and the radius filter
+CREATE INDEX IF NOT EXISTS idx_ngos_active_pickups ON ngos(active_pickups);
+CREATE INDEX IF NOT EXISTS idx_ngos_location ON ngos(latitude, longitude);
+CREATE INDEX IF NOT EXISTS idx_ngos_created ON ngos(created_at DESC);
@@ -0,0 +1,48 @@
+-- =====================================================
+-- SINGLE-CALL USER REGISTRATION
+-- =====================================================
+
+-- Create a user, and for staff add them to their NGO's staff count, and log
+-- the signup, in one transaction. Returns the new user (without the
+-- password hash) plus ngo_name.
+--
+-- A taken email fails on the users.email unique constraint (23505) and an
+-- unknown NGO on the users.ngo_id foreign key (23503); either way nothing is
+-- written. Staff must have ngo_id_param, other roles are stored without one.
+CREATE OR REPLACE FUNCTION register_user_tx(
+    email_param TEXT,
+    full_name_param TEXT,
+    password_hash_param TEXT,
+    role_param TEXT,
+    ngo_id_param UUID DEFAULT NULL
+)
+RETURNS JSONB AS $$
+DECLARE
+    new_user users%ROWTYPE;
+    ngo_name_value TEXT;
+BEGIN
+    IF role_param = 'staff' AND ngo_id_param IS NULL THEN
+        RAISE EXCEPTION 'Staff registration requires an NGO ID' USING ERRCODE = '23502';
+    END IF;
+
+    INSERT INTO users (email, full_name, password_hash, role, ngo_id, points, total_donations, active_donations)
+    VALUES (
+        email_param, full_name_param, password_hash_param, role_param,
+        CASE WHEN role_param = 'staff' THEN ngo_id_param END, 0, 0, 0
+    )
+    RETURNING * INTO new_user;
+
+    IF role_param = 'staff' THEN
+        UPDATE ngos
+        SET staff_count = staff_count + 1,
+            updated_at = NOW()
+        WHERE id = ngo_id_param
+        RETURNING name INTO ngo_name_value;
+    END IF;
+
+    INSERT INTO activity_log (action, description, user_id, user_name)
+    VALUES ('user_registered', 'New ' || role_param || ' signup', new_user.id, new_user.full_name);
+
+    RETURN (to_jsonb(new_user) - 'password_hash') || jsonb_build_object('ngo_name', ngo_name_value);
+END;
+$$ LANGUAGE plpgsql;
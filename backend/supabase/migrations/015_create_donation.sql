@@ -0,0 +1,70 @@
+-- =====================================================
+-- SINGLE-CALL DONATION CREATION
+-- =====================================================
+
+-- Create a donation and apply its side effects in one transaction: the
+-- donor's active donation count, the assigned NGO's active pickups, the
+-- daily rollup and the activity log entry. Returns the new donation.
+--
+-- The donor name is copied from users; an unknown donor raises P0002 and
+-- nothing is written. The donation is assigned to the first NGO, if any.
+CREATE OR REPLACE FUNCTION create_donation_tx(
+    donor_id_param UUID,
+    address_param TEXT,
+    latitude_param DOUBLE PRECISION,
+    longitude_param DOUBLE PRECISION,
+    volume_param TEXT,
+    volume_servings_param INTEGER,
+    priority_param TEXT,
+    points_param INTEGER,
+    description_param TEXT DEFAULT NULL,
+    image_url_param TEXT DEFAULT NULL
+)
+RETURNS JSONB AS $$
+DECLARE
+    donor_name_value TEXT;
+    ngo_id_value UUID;
+    new_donation donations%ROWTYPE;
+BEGIN
+    SELECT full_name INTO donor_name_value FROM users WHERE id = donor_id_param;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Donor not found' USING ERRCODE = 'P0002';
+    END IF;
+
+    SELECT id INTO ngo_id_value FROM ngos LIMIT 1;
+
+    INSERT INTO donations (
+        donor_id, donor_name, image_url, address, latitude, longitude,
+        volume, volume_servings, priority, status, points, description,
+        assigned_ngo_id
+    )
+    VALUES (
+        donor_id_param, donor_name_value, image_url_param, address_param,
+        latitude_param, longitude_param, volume_param, volume_servings_param,
+        priority_param, 'pending', points_param, description_param,
+        ngo_id_value
+    )
+    RETURNING * INTO new_donation;
+
+    UPDATE users
+    SET active_donations = active_donations + 1,
+        updated_at = NOW()
+    WHERE id = donor_id_param;
+
+    IF ngo_id_value IS NOT NULL THEN
+        UPDATE ngos
+        SET active_pickups = active_pickups + 1,
+            updated_at = NOW()
+        WHERE id = ngo_id_value;
+    END IF;
+
+    PERFORM record_donation_events(jsonb_build_array(
+        jsonb_build_object('event', 'created', 'donation', to_jsonb(new_donation))
+    ));
+
+    INSERT INTO activity_log (action, description, user_id, user_name, target_id, target_type)
+    VALUES ('donation_created', 'New donation created', donor_id_param, donor_name_value, new_donation.id, 'donation');
+
+    RETURN to_jsonb(new_donation);
+END;
+$$ LANGUAGE plpgsql;